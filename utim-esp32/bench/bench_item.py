@@ -0,0 +1,135 @@
+"""
+Message record benchmark
+
+Runs a message through five stages, as ProcessUhost does with unsign, decrypt,
+a command worker, encrypt and sign, once with the [source, destination, status,
+body] lists indexed through SubprocessorIndex and once with utilities.item.Item
+updated in place, and prints messages per second and bytes allocated per
+message of both.
+
+Runs on CPython and on MicroPython:
+
+    python3 bench/bench_item.py
+    micropython bench/bench_item.py
+"""
+
+import gc
+import sys
+
+try:
+    import utime as time
+except ImportError:
+    import time
+
+sys.path.append(sys.path[0] + '/../modules/utim/utilities')
+
+from item import Item
+from data_indexes import SubprocessorIndex
+
+_SubprocessorIndex = SubprocessorIndex()
+
+# Stages of a message
+STAGES = 5
+# Messages per timed run
+MESSAGES = 20000
+# Messages per allocation run, all of them are kept alive while measured
+KEPT = 1000
+
+BODY = b'\x9e\x00\x00'
+
+
+def stage_list(data):
+    if (data[_SubprocessorIndex.source] == 1 and
+            data[_SubprocessorIndex.status] == 1):
+        return [data[_SubprocessorIndex.source],
+                data[_SubprocessorIndex.destination],
+                1,
+                data[_SubprocessorIndex.body]]
+    return [data[0], data[1], 2, data[3]]
+
+
+def stage_item(data):
+    if data.source == 1 and data.status == 1:
+        return data.set(data.source, data.destination, 1, data.body)
+    data.status = 2
+    return data
+
+
+def message_list():
+    data = [1, 0, 1, BODY]
+    for _ in range(STAGES):
+        data = stage_list(data)
+    return data
+
+
+def message_item():
+    data = Item(1, 0, 1, BODY)
+    for _ in range(STAGES):
+        data = stage_item(data)
+    return data
+
+
+def ticks_ms():
+    if hasattr(time, 'ticks_ms'):
+        return time.ticks_ms()
+    return int(time.perf_counter() * 1000)
+
+
+def rate(message):
+    """
+    :return int: Messages per second
+    """
+    start = ticks_ms()
+    for _ in range(MESSAGES):
+        message()
+    return MESSAGES * 1000 // max(ticks_ms() - start, 1)
+
+
+def allocated(stages):
+    """
+    :return int: Bytes allocated per message, the stage results are kept alive
+    """
+    kept = [None] * (KEPT * STAGES)
+    gc.collect()
+    if hasattr(gc, 'mem_alloc'):
+        before = gc.mem_alloc()
+    else:
+        import tracemalloc
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+
+    index = 0
+    for _ in range(KEPT):
+        for data in stages():
+            kept[index] = data
+            index += 1
+
+    after = gc.mem_alloc() if hasattr(gc, 'mem_alloc') else tracemalloc.get_traced_memory()[0]
+    if not hasattr(gc, 'mem_alloc'):
+        tracemalloc.stop()
+    return (after - before) // KEPT
+
+
+def stages_list():
+    data = [1, 0, 1, BODY]
+    for _ in range(STAGES):
+        data = stage_list(data)
+        yield data
+
+
+def stages_item():
+    data = Item(1, 0, 1, BODY)
+    for _ in range(STAGES):
+        data = stage_item(data)
+        yield data
+
+
+def main():
+    for name, message, stages in (('list', message_list, stages_list),
+                                  ('item', message_item, stages_item)):
+        print('{:5} {:8} messages/s {:6} bytes/message'.format(
+            name, rate(message), allocated(stages)))
+
+
+if __name__ == '__main__':
+    main()
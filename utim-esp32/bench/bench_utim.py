@@ -0,0 +1,297 @@
+"""
+utim benchmark suite
+
+Runs the utim modules on a host, under CPython through the shim modules of
+host/ and under the unix port of MicroPython, and prints a JSON report with
+operations per second and bytes allocated per operation of every benchmark:
+
+    python3 bench/bench_utim.py [-o report.json] [-t ms] [name prefix...]
+    micropython bench/bench_utim.py [-o report.json] [-t ms] [name prefix...]
+
+A benchmark runs for at least the -t milliseconds, 200 by default. MicroPython
+counts all bytes allocated by an operation with gc.mem_alloc() while the
+collector is disabled. CPython frees temporaries at once, the peak of
+tracemalloc over an operation is reported there. The "alloc" field of the
+report names the method, reports of the same implementation compare. AES runs
+in the pure Python ucryptolib of host/ under CPython, the AES figures are of the
+shim there.
+
+Log messages are dropped, the callers still format them.
+"""
+
+import gc
+import sys
+
+sys.path.insert(0, sys.path[0] + '/../host')
+
+import hostenv
+
+hostenv.setup(quiet=True)
+
+import json
+import utime
+import queue
+import ringbuffer
+from utim.connectivity import ttnd_manager
+from utim.utilities import srp
+from utim.utilities.cryptography import CryptoLayer
+from utim.utilities.tag import Tag
+
+# Minimum duration of a timed run
+MIN_TIME_MS = 200
+# Operations of an allocation run
+ALLOC_OPS = 16
+
+KEY = b'0123456789abcdef0123456789abcdef'
+PAYLOAD = bytes(range(64))
+# Readings of a JSON payload, compressible as the real ones are
+PAYLOAD_LONG = ''.join('{{"sensor": {}, "value": 21.5}}'.format(i) for i in range(40)).encode()[:1024]
+
+BENCHMARKS = []
+
+
+def benchmark(name):
+    """
+    Register benchmark, the decorated function prepares it and returns the
+    operation to measure
+    """
+
+    def register(function):
+        BENCHMARKS.append((name, function))
+        return function
+
+    return register
+
+
+@benchmark('tag.assemble_for_utim')
+def tag_assemble_for_utim():
+    return lambda: Tag.INBOUND.assemble_for_utim(PAYLOAD)
+
+
+@benchmark('tag.assemble_for_network')
+def tag_assemble_for_network():
+    return lambda: Tag.OUTBOUND.assemble_for_network(PAYLOAD)
+
+
+@benchmark('tag.assemble_batch.16')
+def tag_assemble_batch():
+    readings = [PAYLOAD[:32]] * 16
+    return lambda: Tag.OUTBOUND.assemble_batch(readings)
+
+
+@benchmark('tag.assemble_hello')
+def tag_assemble_hello():
+    return lambda: Tag.UCOMMAND.assemble_hello(PAYLOAD[:32])
+
+
+@benchmark('tag.assemble_try')
+def tag_assemble_try():
+    return lambda: Tag.UCOMMAND.assemble_try(PAYLOAD[:4], PAYLOAD)
+
+
+@benchmark('tag.assemble_signed')
+def tag_assemble_signed():
+    return lambda: Tag.UCOMMAND.assemble_signed(PAYLOAD, PAYLOAD[:32])
+
+
+def _manager():
+    """
+    Manager with its loops stopped, the benchmarks call the layers directly
+    """
+    tx = ringbuffer.RingBuffer(4096)
+    manager = ttnd_manager.Manager(tx=tx, rx=queue.Queue())
+    manager.stop()
+    return manager, tx
+
+
+@benchmark('manager.outbound')
+def manager_outbound():
+    manager, tx = _manager()
+    item = [ttnd_manager.DataType.DEVICE, PAYLOAD]
+
+    def operation():
+        manager._Manager__process_outbound_item(item)
+        tx.get_nowait()
+
+    return operation
+
+
+@benchmark('manager.inbound')
+def manager_inbound():
+    manager, tx = _manager()
+    manager._Manager__process_outbound_item([ttnd_manager.DataType.DEVICE, PAYLOAD])
+    frames = [bytes(tx.get_nowait())]
+    return lambda: manager._Manager__process_inbound_frames(frames)
+
+
+def _crypto_benchmarks():
+    layer = CryptoLayer(KEY)
+    for size, payload in ((64, PAYLOAD), (1024, PAYLOAD_LONG)):
+        modes = [('aes', CryptoLayer.CRYPTO_MODE_AES), ('aes_ctr', CryptoLayer.CRYPTO_MODE_AES_CTR)]
+        if size > 64:
+            modes.append(('aes_compressed', CryptoLayer.CRYPTO_MODE_AES_COMPRESSED))
+        for name, mode in modes:
+            encrypted = layer.encrypt(mode, payload)
+            benchmark('crypto.encrypt.{}.{}'.format(name, size))(
+                lambda mode=mode, payload=payload: lambda: layer.encrypt(mode, payload))
+            benchmark('crypto.decrypt.{}.{}'.format(name, size))(
+                lambda encrypted=encrypted: lambda: layer.decrypt(encrypted))
+
+        for name, mode in (('aes', CryptoLayer.CRYPTO_MODE_AES), ('aes_ctr', CryptoLayer.CRYPTO_MODE_AES_CTR)):
+            sealed = layer.seal(mode, payload)
+            benchmark('crypto.seal.{}.{}'.format(name, size))(
+                lambda mode=mode, payload=payload: lambda: layer.seal(mode, payload))
+            benchmark('crypto.open.{}.{}'.format(name, size))(
+                lambda sealed=sealed: lambda: layer.open(sealed))
+            benchmark('crypto.encrypt_sign.{}.{}'.format(name, size))(
+                lambda mode=mode, payload=payload: lambda: layer.sign(
+                    CryptoLayer.SIGN_MODE_SHA256, layer.encrypt(mode, payload)))
+            benchmark('crypto.unsign_decrypt.{}.{}'.format(name, size))(
+                lambda sealed=sealed: lambda: layer.decrypt(layer.unsign(sealed)))
+
+        signed = layer.sign(CryptoLayer.SIGN_MODE_SHA256, payload)
+        benchmark('crypto.sign.{}'.format(size))(
+            lambda payload=payload: lambda: layer.sign(CryptoLayer.SIGN_MODE_SHA256, payload))
+        benchmark('crypto.unsign.{}'.format(size))(
+            lambda signed=signed: lambda: layer.unsign(signed))
+
+
+_crypto_benchmarks()
+
+
+@benchmark('srp.process_challenge')
+def srp_process_challenge():
+    salt, verifier = srp.create_salted_verification_key(b'utim', b'password')
+    user = srp.User(b'utim', b'password')
+    challenge = srp.Verifier(b'utim', salt, verifier, user.start_authentication()[1]).get_challenge()
+    return lambda: user.process_challenge(*challenge)
+
+
+@benchmark('queue.put_get')
+def queue_put_get():
+    items = queue.Queue()
+
+    def operation():
+        items.put_nowait(PAYLOAD)
+        items.get_nowait()
+
+    return operation
+
+
+@benchmark('queue.put_many_get_many.16')
+def queue_put_many_get_many():
+    items = queue.Queue()
+    batch = [PAYLOAD] * 16
+
+    def operation():
+        items.put_many(batch, False)
+        items.get_many(16, False)
+
+    return operation
+
+
+def rate(operation, min_time_ms):
+    """
+    :return tuple: Operations per second and number of operations run
+    """
+    count = 1
+    while True:
+        start = utime.ticks_us()
+        for _ in range(count):
+            operation()
+        elapsed = utime.ticks_diff(utime.ticks_us(), start)
+        if elapsed >= min_time_ms * 1000:
+            return count * 1000000 / elapsed, count
+        count *= 2
+
+
+def allocated(operation):
+    """
+    :return int|None: Bytes allocated per operation, None - if the heap is
+                      exhausted while the collector is disabled
+    """
+    if not hasattr(gc, 'mem_alloc'):
+        import tracemalloc
+        tracemalloc.start()
+        try:
+            operation()
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            operation()
+            return tracemalloc.get_traced_memory()[1] - before
+        finally:
+            tracemalloc.stop()
+
+    for count in (ALLOC_OPS, 1):
+        gc.collect()
+        gc.disable()
+        try:
+            before = gc.mem_alloc()
+            for _ in range(count):
+                operation()
+            return (gc.mem_alloc() - before) // count
+        except MemoryError:
+            pass
+        finally:
+            gc.enable()
+    return None
+
+
+def run(prefixes=(), min_time_ms=MIN_TIME_MS):
+    """
+    Run benchmarks
+
+    :param prefixes: Name prefixes of the benchmarks to run, all by default
+    :return dict: Report
+    """
+    version = sys.implementation.version
+    report = {
+        'suite': 'utim',
+        'implementation': sys.implementation.name,
+        'version': '.'.join(str(x) for x in version[:3]),
+        'platform': sys.platform,
+        'alloc': 'gc.mem_alloc' if hasattr(gc, 'mem_alloc') else 'tracemalloc.peak',
+        'min_time_ms': min_time_ms,
+        'results': []
+    }
+    for name, prepare in BENCHMARKS:
+        if prefixes and not [prefix for prefix in prefixes if name.startswith(prefix)]:
+            continue
+        operation = prepare()
+        # Warm up caches and lazy imports
+        operation()
+        ops, count = rate(operation, min_time_ms)
+        report['results'].append({
+            'name': name,
+            'ops_per_s': round(ops, 1),
+            'us_per_op': round(1000000 / ops, 2),
+            'operations': count,
+            'alloc_bytes_per_op': allocated(operation)
+        })
+    return report
+
+
+def main(args):
+    output = None
+    min_time_ms = MIN_TIME_MS
+    prefixes = []
+    while args:
+        arg = args.pop(0)
+        if arg == '-o':
+            output = args.pop(0)
+        elif arg == '-t':
+            min_time_ms = int(args.pop(0))
+        else:
+            prefixes.append(arg)
+
+    report = json.dumps(run(prefixes, min_time_ms))
+    if output is None:
+        print(report)
+    else:
+        with open(output, 'w') as f:
+            f.write(report)
+            f.write('\n')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -25,13 +25,15 @@
  *
  *  Parameters:
  *      args[0]: [in]
- *          The secret shared key.
+ *          The secret shared key, any object with the buffer protocol.
  *      args[1]: [in]
- *          The length of the secret shared key.
+ *          The length of the secret shared key, the key object length
+ *          is used.
  *      args[2]: [in]
- *          An array of characters representing the message.
+ *          The message, any object with the buffer protocol.
  *      args[3]: [in]
- *          The length of the message in message_array
+ *          The length of the message, at most the message object length
+ *          is used.
  *
  *  Returns:
  *      the HMAC digest for given message and key.
@@ -39,19 +41,109 @@
  */
 STATIC mp_obj_t chmac_hmac(mp_uint_t n_args, const mp_obj_t *args)
 {
-    size_t key_len         = mp_obj_get_int(args[1]);
-    const unsigned char* key  = (unsigned char*)(mp_obj_str_get_data(args[0], &key_len));
-    const unsigned char* text = (unsigned char*)(mp_obj_str_get_str(args[2]));
-    const size_t text_len        = mp_obj_get_int(args[3]);
-    byte* digest = malloc(SHA256HashSize);
-    hmac(SHA256, text, text_len, key, key_len, digest);
+    mp_buffer_info_t key;
+    mp_buffer_info_t text;
+    mp_get_buffer_raise(args[0], &key, MP_BUFFER_READ);
+    mp_get_buffer_raise(args[2], &text, MP_BUFFER_READ);
+    size_t text_len = mp_obj_get_int(args[3]);
+    if (text_len > text.len) {
+        text_len = text.len;
+    }
+    uint8_t digest[SHA256HashSize];
+    hmac(SHA256, text.buf, text_len, key.buf, key.len, digest);
     return mp_obj_new_bytes(digest, SHA256HashSize);
 }
 STATIC MP_DEFINE_CONST_FUN_OBJ_VAR_BETWEEN(chmac_hmac_obj, 4, 4, chmac_hmac);
 
+/*
+ *  HMAC
+ *
+ *  Description:
+ *      Incremental HMAC-SHA256 object. The key pads are hashed once when
+ *      the object is created, update() takes the message in parts of any
+ *      objects with the buffer protocol and copy() duplicates the state,
+ *      so a keyed object is the start of every message of the key:
+ *
+ *          mac = chmac.HMAC(key)
+ *          message_mac = mac.copy()
+ *          message_mac.update(header)
+ *          message_mac.update(payload)
+ *          signature = message_mac.digest()
+ *
+ *      digest() does not finish the object, it may be updated further.
+ */
+typedef struct _chmac_hmac_obj_t {
+    mp_obj_base_t base;
+    HMACContext ctx;
+} chmac_hmac_obj_t;
+
+const mp_obj_type_t chmac_hmac_type;
+
+STATIC mp_obj_t chmac_hmac_update(mp_obj_t self_in, mp_obj_t data)
+{
+    chmac_hmac_obj_t *self = MP_OBJ_TO_PTR(self_in);
+    mp_buffer_info_t buf;
+    mp_get_buffer_raise(data, &buf, MP_BUFFER_READ);
+    hmacInput(&self->ctx, buf.buf, buf.len);
+    return mp_const_none;
+}
+STATIC MP_DEFINE_CONST_FUN_OBJ_2(chmac_hmac_update_obj, chmac_hmac_update);
+
+STATIC mp_obj_t chmac_hmac_make_new(const mp_obj_type_t *type, size_t n_args, size_t n_kw, const mp_obj_t *args)
+{
+    mp_arg_check_num(n_args, n_kw, 1, 2, false);
+    mp_buffer_info_t key;
+    mp_get_buffer_raise(args[0], &key, MP_BUFFER_READ);
+    chmac_hmac_obj_t *self = m_new_obj(chmac_hmac_obj_t);
+    self->base.type = &chmac_hmac_type;
+    if (hmacReset(&self->ctx, SHA256, key.buf, key.len) != shaSuccess) {
+        mp_raise_ValueError("invalid key");
+    }
+    if (n_args == 2) {
+        chmac_hmac_update(MP_OBJ_FROM_PTR(self), args[1]);
+    }
+    return MP_OBJ_FROM_PTR(self);
+}
+
+STATIC mp_obj_t chmac_hmac_digest(mp_obj_t self_in)
+{
+    chmac_hmac_obj_t *self = MP_OBJ_TO_PTR(self_in);
+    /* The result is computed from a copy, the object stays open */
+    HMACContext ctx = self->ctx;
+    uint8_t digest[SHA256HashSize];
+    hmacResult(&ctx, digest);
+    return mp_obj_new_bytes(digest, SHA256HashSize);
+}
+STATIC MP_DEFINE_CONST_FUN_OBJ_1(chmac_hmac_digest_obj, chmac_hmac_digest);
+
+STATIC mp_obj_t chmac_hmac_copy(mp_obj_t self_in)
+{
+    chmac_hmac_obj_t *self = MP_OBJ_TO_PTR(self_in);
+    chmac_hmac_obj_t *copy = m_new_obj(chmac_hmac_obj_t);
+    copy->base.type = &chmac_hmac_type;
+    copy->ctx = self->ctx;
+    return MP_OBJ_FROM_PTR(copy);
+}
+STATIC MP_DEFINE_CONST_FUN_OBJ_1(chmac_hmac_copy_obj, chmac_hmac_copy);
+
+STATIC const mp_rom_map_elem_t chmac_hmac_locals_dict_table[] = {
+    { MP_ROM_QSTR(MP_QSTR_update), MP_ROM_PTR(&chmac_hmac_update_obj) },
+    { MP_ROM_QSTR(MP_QSTR_digest), MP_ROM_PTR(&chmac_hmac_digest_obj) },
+    { MP_ROM_QSTR(MP_QSTR_copy), MP_ROM_PTR(&chmac_hmac_copy_obj) },
+};
+STATIC MP_DEFINE_CONST_DICT(chmac_hmac_locals_dict, chmac_hmac_locals_dict_table);
+
+const mp_obj_type_t chmac_hmac_type = {
+    { &mp_type_type },
+    .name = MP_QSTR_HMAC,
+    .make_new = chmac_hmac_make_new,
+    .locals_dict = (mp_obj_t)&chmac_hmac_locals_dict,
+};
+
 STATIC const mp_map_elem_t chmac_globals_table[] = {
     { MP_OBJ_NEW_QSTR(MP_QSTR___name__), MP_OBJ_NEW_QSTR(MP_QSTR_chmac) },
     { MP_OBJ_NEW_QSTR(MP_QSTR_hmac), (mp_obj_t)&chmac_hmac_obj },
+    { MP_OBJ_NEW_QSTR(MP_QSTR_HMAC), (mp_obj_t)&chmac_hmac_type },
 };
 
 STATIC MP_DEFINE_CONST_DICT (
@@ -0,0 +1,76 @@
+"""
+chmac for CPython and the unix port of MicroPython
+
+HMAC-SHA256 of RFC 2104 over uhashlib.sha256, the firmware computes it in
+chmac.c. Arguments are taken as the C module takes them: keys and texts are any
+objects with the buffer protocol or str, the key length is the length of the
+key object whatever key_len is and at most text_len bytes of the text are
+authenticated.
+"""
+import uhashlib
+
+__all__ = ['HMAC', 'hmac']
+
+_BLOCK_SIZE = 64
+
+_IPAD = bytes(x ^ 0x36 for x in range(256))
+_OPAD = bytes(x ^ 0x5c for x in range(256))
+
+
+def _data(value):
+    if isinstance(value, str):
+        return value.encode()
+    # TypeError for objects without the buffer protocol, as in chmac.c
+    return memoryview(value)
+
+
+def _pad(key, table):
+    return bytes(table[x] for x in key) + bytes([table[0]]) * (_BLOCK_SIZE - len(key))
+
+
+class HMAC(object):
+    """
+    Incremental HMAC-SHA256, the key pads are hashed once:
+
+        mac = chmac.HMAC(key)
+        message_mac = mac.copy()
+        message_mac.update(header)
+        message_mac.update(payload)
+        signature = message_mac.digest()
+
+    digest() does not finish the object, it may be updated further.
+    """
+
+    def __init__(self, key, msg=None):
+        key = bytes(_data(key))
+        if len(key) > _BLOCK_SIZE:
+            key = uhashlib.sha256(key).digest()
+        self.__inner = uhashlib.sha256(_pad(key, _IPAD))
+        self.__outer = uhashlib.sha256(_pad(key, _OPAD))
+        if msg is not None:
+            self.update(msg)
+
+    def update(self, data):
+        self.__inner.update(_data(data))
+
+    def digest(self):
+        outer = self.__outer.copy()
+        outer.update(self.__inner.digest())
+        return outer.digest()
+
+    def copy(self):
+        mac = HMAC.__new__(HMAC)
+        mac.__inner = self.__inner.copy()
+        mac.__outer = self.__outer
+        return mac
+
+
+def hmac(key, key_len, text, text_len):
+    """
+    :param key: str or buffer
+    :param int key_len: Ignored, as in chmac.c
+    :param text: str or buffer
+    :param int text_len: Number of bytes of text
+    :return bytes: 32 bytes digest
+    """
+    return HMAC(key, _data(text)[:text_len]).digest()
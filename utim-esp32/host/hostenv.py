@@ -0,0 +1,63 @@
+"""
+Host environment of the frozen modules
+
+Puts the shim modules of this directory and the frozen modules on sys.path, so
+the utim modules run unchanged on a host, under CPython or under the unix port
+of MicroPython:
+
+    sys.path.insert(0, 'utim-esp32/host')
+    import hostenv
+    hostenv.setup()
+
+The frozen modules include micropython-lib ports of hashlib, os, random, socket
+and other standard modules. Under CPython the standard modules are imported
+first and keep their sys.modules entries, only queue and logging are taken from
+the frozen modules, as utim needs their firmware interface. MicroPython finds
+its built-in modules before sys.path, so the shims are used only for the
+modules it lacks.
+
+_thread is the CPython built-in one. Its start_new_thread(), allocate_lock() and
+exit(), which raises SystemExit and ends the thread quietly, behave as on the
+firmware. Its locks honour the acquire() timeout, which event.py uses on the
+host, so timed waits do not poll there as they do on the firmware.
+"""
+import sys
+
+__all__ = ['setup', 'HOST_PATH', 'MODULES_PATH']
+
+HOST_PATH = __file__.rsplit('/', 1)[0] if '/' in __file__ else '.'
+MODULES_PATH = HOST_PATH + '/../modules'
+
+# Standard modules the frozen modules would shadow and the modules importing them
+_STANDARD = ('asyncio', 'binascii', 'collections', 'errno', 'hashlib', 'hmac',
+             'itertools', 'json', 'os', 'random', 'select', 'selectors', 'socket',
+             'stat', 'struct', 'threading', 'time', 'traceback', 'tracemalloc',
+             'warnings', 'zlib')
+# Frozen modules used instead of the standard ones
+_FROZEN = ('queue', 'logging')
+
+
+def setup(quiet=False):
+    """
+    Prepare sys.path and sys.modules, it must be called before any utim import
+
+    :param bool quiet: True - drop the log messages, they are printed
+                       whatever the level is otherwise
+    """
+    if MODULES_PATH in sys.path:
+        return
+    if sys.implementation.name == 'cpython':
+        for name in _STANDARD:
+            __import__(name)
+        for name in _FROZEN:
+            sys.modules.pop(name, None)
+    sys.path.insert(0, HOST_PATH)
+    sys.path.insert(0, MODULES_PATH)
+
+    if quiet:
+        import logging
+        logging.Logger.log = _drop
+
+
+def _drop(self, level, msg, *args):
+    pass
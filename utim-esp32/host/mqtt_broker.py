@@ -0,0 +1,299 @@
+"""
+MQTT broker stand-in
+
+A small MQTT 3.1.1 broker for host runs of utim, so no real broker is needed:
+
+    python3 host/mqtt_broker.py [port]
+
+Clients connect without credentials check and subscribe with the + and #
+wildcards. QoS 0 and 1 publishes are acknowledged as the protocol requires and
+delivered at QoS 0 to every matching subscription. There are no persistent
+sessions, retained messages or wills. Code in the broker process may publish
+and subscribe directly with publish() and subscribe(), e.g. to stand in for
+Uhost.
+"""
+import socket
+import struct
+import sys
+import threading
+
+__all__ = ['Broker', 'matches']
+
+CONNECT = 0x10
+CONNACK = 0x20
+PUBLISH = 0x30
+PUBACK = 0x40
+SUBSCRIBE = 0x80
+SUBACK = 0x90
+UNSUBSCRIBE = 0xA0
+UNSUBACK = 0xB0
+PINGREQ = 0xC0
+PINGRESP = 0xD0
+DISCONNECT = 0xE0
+
+
+def matches(topic_filter, topic):
+    """
+    :param str topic_filter: Filter, + matches a level, # all the next ones
+    :param str topic: Topic name
+    :return bool:
+    """
+    levels = topic.split('/')
+    filters = topic_filter.split('/')
+    for index, level in enumerate(filters):
+        if level == '#':
+            return True
+        if index >= len(levels) or (level != '+' and level != levels[index]):
+            return False
+    return len(filters) == len(levels)
+
+
+def _length(length):
+    """
+    Encode remaining length
+    """
+    encoded = bytearray()
+    while True:
+        byte = length & 0x7F
+        length >>= 7
+        encoded.append(byte | 0x80 if length else byte)
+        if not length:
+            return bytes(encoded)
+
+
+def _string(data, offset):
+    """
+    :return tuple: String bytes and the offset after it
+    """
+    length = struct.unpack_from('!H', data, offset)[0]
+    offset += 2
+    return data[offset:offset + length], offset + length
+
+
+class _Client(object):
+    def __init__(self, broker, sock, address):
+        self.broker = broker
+        self.sock = sock
+        self.address = address
+        self.filters = set()
+        self.__lock = threading.Lock()
+
+    def send(self, packet):
+        with self.__lock:
+            try:
+                self.sock.sendall(packet)
+            except OSError:
+                pass
+
+    def deliver(self, topic, message):
+        topic = topic.encode()
+        body = struct.pack('!H', len(topic)) + topic + message
+        self.send(bytes([PUBLISH]) + _length(len(body)) + body)
+
+    def run(self):
+        try:
+            while True:
+                packet = self.__read_packet()
+                if packet is None or not self.__handle(*packet):
+                    break
+        except OSError:
+            pass
+        finally:
+            self.broker.remove(self)
+            self.sock.close()
+
+    def __read(self, count):
+        data = b''
+        while len(data) < count:
+            chunk = self.sock.recv(count - len(data))
+            if not chunk:
+                return None
+            data += chunk
+        return data
+
+    def __read_packet(self):
+        header = self.__read(1)
+        if header is None:
+            return None
+        length = 0
+        shift = 0
+        while True:
+            byte = self.__read(1)
+            if byte is None:
+                return None
+            length |= (byte[0] & 0x7F) << shift
+            if not byte[0] & 0x80:
+                break
+            shift += 7
+        body = self.__read(length) if length else b''
+        if body is None:
+            return None
+        return header[0], body
+
+    def __handle(self, header, body):
+        """
+        :return bool: False - if the connection must be closed
+        """
+        kind = header & 0xF0
+        if kind == CONNECT:
+            self.send(bytes([CONNACK, 2, 0, 0]))
+        elif kind == PUBLISH:
+            qos = (header >> 1) & 0x03
+            topic, offset = _string(body, 0)
+            if qos:
+                packet_id = body[offset:offset + 2]
+                offset += 2
+                if qos == 1:
+                    self.send(bytes([PUBACK, 2]) + packet_id)
+            self.broker.publish(topic.decode(), body[offset:])
+        elif kind == SUBSCRIBE:
+            packet_id = body[0:2]
+            granted = bytearray()
+            offset = 2
+            filters = []
+            while offset < len(body):
+                topic_filter, offset = _string(body, offset)
+                offset += 1
+                filters.append(topic_filter.decode())
+                granted.append(0)
+            self.broker.add_filters(self, filters)
+            self.send(bytes([SUBACK]) + _length(2 + len(granted)) + packet_id + granted)
+        elif kind == UNSUBSCRIBE:
+            offset = 2
+            while offset < len(body):
+                topic_filter, offset = _string(body, offset)
+                self.filters.discard(topic_filter.decode())
+            self.send(bytes([UNSUBACK, 2]) + body[0:2])
+        elif kind == PINGREQ:
+            self.send(bytes([PINGRESP, 0]))
+        elif kind == DISCONNECT:
+            return False
+        return True
+
+
+class Broker(object):
+    def __init__(self, host='127.0.0.1', port=1883):
+        self.host = host
+        self.port = port
+        self.published = 0
+        self.__clients = []
+        # Subscriptions of the broker process: (filter, callback)
+        self.__local = []
+        self.__lock = threading.Lock()
+        self.__subscribed = threading.Condition(self.__lock)
+        self.__server = None
+
+    def start(self):
+        """
+        Listen and serve clients in background threads
+
+        :return Broker: self
+        """
+        self.__server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.__server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.__server.bind((self.host, self.port))
+        self.__server.listen(8)
+        # The port is chosen by the system if it is 0
+        self.port = self.__server.getsockname()[1]
+        thread = threading.Thread(target=self.__accept, name='mqtt-broker')
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def stop(self):
+        """
+        Close the listening socket and the client connections
+        """
+        if self.__server is not None:
+            self.__server.close()
+            self.__server = None
+        with self.__lock:
+            clients = list(self.__clients)
+        for client in clients:
+            try:
+                client.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def publish(self, topic, message):
+        """
+        Deliver message to the subscribers of topic
+
+        :param str topic:
+        :param bytes message:
+        """
+        self.published += 1
+        with self.__lock:
+            clients = [client for client in self.__clients
+                       if [f for f in client.filters if matches(f, topic)]]
+            callbacks = [callback for topic_filter, callback in self.__local
+                         if matches(topic_filter, topic)]
+        for client in clients:
+            client.deliver(topic, message)
+        for callback in callbacks:
+            callback(topic, message)
+
+    def subscribe(self, topic_filter, callback):
+        """
+        Subscribe in the broker process
+
+        :param str topic_filter:
+        :param callback: Function of (topic, message), it is called in the
+                         thread of the publishing client
+        """
+        with self.__lock:
+            self.__local.append((topic_filter, callback))
+
+    def add_filters(self, client, filters):
+        """
+        Subscribe client to the topic filters
+
+        :param _Client client:
+        :param list filters:
+        """
+        with self.__lock:
+            client.filters.update(filters)
+            self.__subscribed.notify_all()
+
+    def wait_subscriber(self, topic, timeout=None):
+        """
+        Wait until a client is subscribed to topic
+
+        :param str topic:
+        :param timeout: Seconds to wait, None - wait forever
+        :return bool: False - if no client is subscribed in time
+        """
+        with self.__lock:
+            return self.__subscribed.wait_for(
+                lambda: [client for client in self.__clients
+                         if [f for f in client.filters if matches(f, topic)]],
+                timeout)
+
+    def remove(self, client):
+        with self.__lock:
+            if client in self.__clients:
+                self.__clients.remove(client)
+
+    def __accept(self):
+        server = self.__server
+        while True:
+            try:
+                sock, address = server.accept()
+            except OSError:
+                break
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            client = _Client(self, sock, address)
+            with self.__lock:
+                self.__clients.append(client)
+            thread = threading.Thread(target=client.run, name='mqtt-client')
+            thread.daemon = True
+            thread.start()
+
+
+if __name__ == '__main__':
+    broker = Broker('0.0.0.0', int(sys.argv[1]) if len(sys.argv) > 1 else 1883).start()
+    print('MQTT broker stand-in on port {}'.format(broker.port))
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        broker.stop()
@@ -0,0 +1,73 @@
+"""
+Run utim_launcher on a host
+
+Starts the MQTT broker stand-in on port 1883, points Config.mqtt at it and runs
+utim_launcher.main() unchanged in the main thread, so the usual CPython tools
+apply:
+
+    python3 host/run_launcher.py [-r thread|asyncio] [-t seconds] [-q] [-b host]
+    python3 -m cProfile -o utim.prof host/run_launcher.py -t 30
+
+-t stops the launcher after the seconds given as Ctrl-C does, -b uses the broker
+on host instead of the stand-in and -q drops the log messages.
+"""
+import argparse
+import os
+import signal
+import sys
+import threading
+
+import hostenv
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run utim_launcher on a host')
+    parser.add_argument('-r', '--runtime', choices=('thread', 'asyncio'),
+                        help='Config.runtime, the configured one by default')
+    parser.add_argument('-t', '--time', type=float,
+                        help='seconds to run, until Ctrl-C by default')
+    parser.add_argument('-b', '--broker', help='host of the broker to use instead of the stand-in')
+    parser.add_argument('-q', '--quiet', action='store_true', help='drop the log messages')
+    args = parser.parse_args(argv)
+
+    hostenv.setup(quiet=args.quiet)
+
+    import mqtt_broker
+    from utim.utilities import config
+
+    broker = None
+    host = args.broker
+    if host is None:
+        broker = mqtt_broker.Broker('127.0.0.1', 1883).start()
+        host = broker.host
+
+    configure = config.Config.__init__
+
+    def host_config(self):
+        configure(self)
+        self.mqtt['host'] = host
+        # Measurements are not cached on the host
+        self.crypto['cache'] = None
+        if args.runtime:
+            self.runtime = args.runtime
+
+    config.Config.__init__ = host_config
+
+    if args.time:
+        # A signal interrupts the blocking socket reads too
+        timer = threading.Timer(args.time, os.kill, (os.getpid(), signal.SIGINT))
+        timer.daemon = True
+        timer.start()
+
+    import utim_launcher
+    try:
+        utim_launcher.main()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if broker is not None:
+            broker.stop()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
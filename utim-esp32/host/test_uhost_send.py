@@ -0,0 +1,162 @@
+"""
+Host test of sending sealed envelopes to Uhost
+
+    python3 host/test_uhost_send.py
+    python3 -m pytest host/test_uhost_send.py
+
+UtimConnection runs against the broker stand-in, which stands in for Uhost too.
+"""
+import sys
+import unittest
+
+sys.path.insert(0, __file__.rsplit('/', 1)[0] if '/' in __file__ else '.')
+
+import hostenv
+
+hostenv.setup(quiet=True)
+
+import queue
+import ringbuffer
+import mqtt_broker
+from utim.connectivity import ttnd_manager
+from utim.connectivity import utim_connection
+from utim.utilities import config
+from utim.utilities.cryptography import CryptoLayer
+
+KEY = b'0123456789abcdef0123456789abcdef'
+MODES = (CryptoLayer.CRYPTO_MODE_AES, CryptoLayer.CRYPTO_MODE_AES_COMPRESSED,
+         CryptoLayer.CRYPTO_MODE_AES_CTR)
+UTIM_TOPIC = '7574696d'
+# Topic of the connection which receives, no earlier connection is subscribed to it
+RECEIVE_TOPIC = '7574696d-receive'
+# Seconds an expected item is waited for at most
+WAIT = 5
+
+_broker = None
+_configure = config.Config.__init__
+
+
+def _host_config(self):
+    _configure(self)
+    self.mqtt['host'] = _broker.host
+
+
+def setUpModule():
+    global _broker
+    _broker = mqtt_broker.Broker('127.0.0.1', 1883).start()
+    config.Config.__init__ = _host_config
+
+
+def tearDownModule():
+    config.Config.__init__ = _configure
+    _broker.stop()
+
+
+class Uhost(object):
+    """
+    Uhost end of the broker, messages are [sender][space][\x01][id][envelope]
+    """
+
+    def __init__(self, broker):
+        self.__broker = broker
+        self.__id = 0
+        self.received = queue.Queue()
+        broker.subscribe(bytes.fromhex(config.Config().uhost_name).decode(), self.__on_message)
+
+    def __on_message(self, topic, message):
+        body = message.partition(b' ')[2]
+        if body[:1] == b'\x01':
+            self.received.put(body[3:])
+
+    def publish(self, topic, envelope):
+        self.__id += 1
+        self.__broker.publish(topic, b'uhost \x01' + self.__id.to_bytes(2, 'big') + envelope)
+
+
+class StubConnection(object):
+    """
+    Uhost connection of the Manager, it keeps what it is sent
+    """
+
+    def __init__(self):
+        self.sent = queue.Queue()
+        self.__inbound = queue.Queue()
+
+    def connect(self):
+        pass
+
+    def run(self):
+        pass
+
+    def stop(self):
+        self.__inbound.close()
+
+    def send(self, data, block=False):
+        self.sent.put(data)
+        return True
+
+    def receive_many(self, max_items, timeout=0):
+        try:
+            return self.__inbound.get_many(max_items, timeout != 0, timeout)
+        except queue.Empty:
+            return []
+
+    def get_queue_stats(self):
+        return {}
+
+
+class SealedSendTest(unittest.TestCase):
+
+    def setUp(self):
+        self.layer = CryptoLayer(KEY)
+        self.connection = utim_connection.UtimConnection(UTIM_TOPIC, 'utim', 'mqtt')
+
+    def sealed(self):
+        return [self.layer.seal(mode, b'message to Uhost') for mode in MODES]
+
+    def test_connection_send(self):
+        uhost = Uhost(_broker)
+        self.connection.connect()
+        self.connection.run()
+        try:
+            for envelope in self.sealed():
+                self.assertTrue(self.connection.send(envelope))
+                self.assertEqual(uhost.received.get(timeout=WAIT), envelope)
+                # CBC pads the message with spaces
+                self.assertEqual(bytes(self.layer.open(envelope)).rstrip(b' '), b'message to Uhost')
+        finally:
+            self.connection.stop()
+
+    def test_connection_receive(self):
+        uhost = Uhost(_broker)
+        connection = utim_connection.UtimConnection(RECEIVE_TOPIC, 'utim', 'mqtt')
+        connection.connect()
+        connection.run()
+        try:
+            self.assertTrue(_broker.wait_subscriber(RECEIVE_TOPIC, WAIT))
+            for envelope in self.sealed():
+                uhost.publish(RECEIVE_TOPIC, envelope)
+                self.assertEqual(connection.receive_many(16, WAIT), [envelope])
+        finally:
+            connection.stop()
+
+    def test_connection_send_invalid(self):
+        with self.assertRaises(utim_connection.UtimConnectionInvalidDataException):
+            self.connection.send('message to Uhost')
+
+    def test_manager_send(self):
+        manager = ttnd_manager.Manager(tx=ringbuffer.RingBuffer(4096), rx=queue.Queue())
+        connection = StubConnection()
+        try:
+            self.assertEqual(manager.run_uhost_connection({}, connection),
+                             ttnd_manager.ManagerConnectionStatus.SUCCESS)
+            sealed = self.sealed()
+            for envelope in sealed:
+                self.assertTrue(manager.send([ttnd_manager.DataType.UHOST, envelope]))
+            self.assertEqual([connection.sent.get(timeout=WAIT) for _ in sealed], sealed)
+        finally:
+            manager.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
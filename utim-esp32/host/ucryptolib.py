@@ -0,0 +1,264 @@
+"""
+ucryptolib for CPython
+
+AES of FIPS-197 in ECB, CBC and CTR modes with the firmware interface and
+checks: a 16 or 32 bytes key, data of whole blocks in ECB and CBC and one
+direction per object. CBC keeps chaining and CTR the counter and the unused key
+stream across calls as the firmware does, CTR takes data of any length. The
+counter is the IV, a 128-bit big endian number. Rounds run on 32-bit words
+through lookup tables built at import.
+"""
+
+__all__ = ['aes', 'MODE_ECB', 'MODE_CBC', 'MODE_CTR']
+
+MODE_ECB = 1
+MODE_CBC = 2
+MODE_CTR = 6
+
+_BLOCK_SIZE = 16
+
+
+def _tables():
+    """
+    Build S-boxes and round tables, a table entry is the column of MixColumns
+    (or InvMixColumns) of a substituted byte
+    """
+    def mul(a, b):
+        result = 0
+        while b:
+            if b & 1:
+                result ^= a
+            a = ((a << 1) ^ 0x11b) if a & 0x80 else a << 1
+            b >>= 1
+        return result
+
+    sbox = bytearray(256)
+    inv_sbox = bytearray(256)
+    # Inverses in GF(2^8) through the generator 3
+    power = [1] * 255
+    for i in range(1, 255):
+        power[i] = mul(power[i - 1], 3)
+    log = [0] * 256
+    for i in range(255):
+        log[power[i]] = i
+    for x in range(256):
+        inverse = power[(255 - log[x]) % 255] if x else 0
+        s = inverse
+        for shift in range(1, 5):
+            s ^= ((inverse << shift) | (inverse >> (8 - shift))) & 0xFF
+        s ^= 0x63
+        sbox[x] = s
+        inv_sbox[s] = x
+
+    enc = [[0] * 256 for _ in range(4)]
+    dec = [[0] * 256 for _ in range(4)]
+    for x in range(256):
+        s = sbox[x]
+        word = mul(s, 2) << 24 | s << 16 | s << 8 | mul(s, 3)
+        s = inv_sbox[x]
+        inv_word = mul(s, 14) << 24 | mul(s, 9) << 16 | mul(s, 13) << 8 | mul(s, 11)
+        for i in range(4):
+            enc[i][x] = word
+            dec[i][x] = inv_word
+            word = (word >> 8) | ((word & 0xFF) << 24)
+            inv_word = (inv_word >> 8) | ((inv_word & 0xFF) << 24)
+
+    return bytes(sbox), bytes(inv_sbox), enc, dec
+
+
+_SBOX, _INV_SBOX, _ENC, _DEC = _tables()
+
+
+def _expand_key(key):
+    """
+    :return tuple: Encryption and decryption round keys, 4 words per round
+    """
+    words = len(key) // 4
+    rounds = words + 6
+    keys = [int.from_bytes(key[i:i + 4], 'big') for i in range(0, len(key), 4)]
+    rcon = 1
+    sbox = _SBOX
+    for i in range(words, 4 * (rounds + 1)):
+        word = keys[i - 1]
+        if i % words == 0:
+            word = (sbox[(word >> 16) & 0xFF] << 24 | sbox[(word >> 8) & 0xFF] << 16 |
+                    sbox[word & 0xFF] << 8 | sbox[word >> 24]) ^ (rcon << 24)
+            rcon = ((rcon << 1) ^ 0x11b) if rcon & 0x80 else rcon << 1
+        elif words > 6 and i % words == 4:
+            word = (sbox[word >> 24] << 24 | sbox[(word >> 16) & 0xFF] << 16 |
+                    sbox[(word >> 8) & 0xFF] << 8 | sbox[word & 0xFF])
+        keys.append(keys[i - words] ^ word)
+
+    # Equivalent inverse cipher: rounds in reverse order, InvMixColumns applied
+    # to the inner ones
+    d0, d1, d2, d3 = _DEC
+    inv_keys = []
+    for r in range(rounds, -1, -1):
+        for word in keys[4 * r:4 * r + 4]:
+            if 0 < r < rounds:
+                word = (d0[sbox[word >> 24]] ^ d1[sbox[(word >> 16) & 0xFF]] ^
+                        d2[sbox[(word >> 8) & 0xFF]] ^ d3[sbox[word & 0xFF]])
+            inv_keys.append(word)
+
+    return rounds, keys, inv_keys
+
+
+def _encrypt_block(rounds, keys, s0, s1, s2, s3):
+    e0, e1, e2, e3 = _ENC
+    s0 ^= keys[0]
+    s1 ^= keys[1]
+    s2 ^= keys[2]
+    s3 ^= keys[3]
+    k = 4
+    for _ in range(rounds - 1):
+        s0, s1, s2, s3 = (
+            e0[s0 >> 24] ^ e1[(s1 >> 16) & 0xFF] ^ e2[(s2 >> 8) & 0xFF] ^ e3[s3 & 0xFF] ^ keys[k],
+            e0[s1 >> 24] ^ e1[(s2 >> 16) & 0xFF] ^ e2[(s3 >> 8) & 0xFF] ^ e3[s0 & 0xFF] ^ keys[k + 1],
+            e0[s2 >> 24] ^ e1[(s3 >> 16) & 0xFF] ^ e2[(s0 >> 8) & 0xFF] ^ e3[s1 & 0xFF] ^ keys[k + 2],
+            e0[s3 >> 24] ^ e1[(s0 >> 16) & 0xFF] ^ e2[(s1 >> 8) & 0xFF] ^ e3[s2 & 0xFF] ^ keys[k + 3])
+        k += 4
+    sbox = _SBOX
+    return (
+        (sbox[s0 >> 24] << 24 | sbox[(s1 >> 16) & 0xFF] << 16 |
+         sbox[(s2 >> 8) & 0xFF] << 8 | sbox[s3 & 0xFF]) ^ keys[k],
+        (sbox[s1 >> 24] << 24 | sbox[(s2 >> 16) & 0xFF] << 16 |
+         sbox[(s3 >> 8) & 0xFF] << 8 | sbox[s0 & 0xFF]) ^ keys[k + 1],
+        (sbox[s2 >> 24] << 24 | sbox[(s3 >> 16) & 0xFF] << 16 |
+         sbox[(s0 >> 8) & 0xFF] << 8 | sbox[s1 & 0xFF]) ^ keys[k + 2],
+        (sbox[s3 >> 24] << 24 | sbox[(s0 >> 16) & 0xFF] << 16 |
+         sbox[(s1 >> 8) & 0xFF] << 8 | sbox[s2 & 0xFF]) ^ keys[k + 3])
+
+
+def _decrypt_block(rounds, keys, s0, s1, s2, s3):
+    d0, d1, d2, d3 = _DEC
+    s0 ^= keys[0]
+    s1 ^= keys[1]
+    s2 ^= keys[2]
+    s3 ^= keys[3]
+    k = 4
+    for _ in range(rounds - 1):
+        s0, s1, s2, s3 = (
+            d0[s0 >> 24] ^ d1[(s3 >> 16) & 0xFF] ^ d2[(s2 >> 8) & 0xFF] ^ d3[s1 & 0xFF] ^ keys[k],
+            d0[s1 >> 24] ^ d1[(s0 >> 16) & 0xFF] ^ d2[(s3 >> 8) & 0xFF] ^ d3[s2 & 0xFF] ^ keys[k + 1],
+            d0[s2 >> 24] ^ d1[(s1 >> 16) & 0xFF] ^ d2[(s0 >> 8) & 0xFF] ^ d3[s3 & 0xFF] ^ keys[k + 2],
+            d0[s3 >> 24] ^ d1[(s2 >> 16) & 0xFF] ^ d2[(s1 >> 8) & 0xFF] ^ d3[s0 & 0xFF] ^ keys[k + 3])
+        k += 4
+    # The rows shift to the right when decrypting
+    sbox = _INV_SBOX
+    return (
+        (sbox[s0 >> 24] << 24 | sbox[(s3 >> 16) & 0xFF] << 16 |
+         sbox[(s2 >> 8) & 0xFF] << 8 | sbox[s1 & 0xFF]) ^ keys[k],
+        (sbox[s1 >> 24] << 24 | sbox[(s0 >> 16) & 0xFF] << 16 |
+         sbox[(s3 >> 8) & 0xFF] << 8 | sbox[s2 & 0xFF]) ^ keys[k + 1],
+        (sbox[s2 >> 24] << 24 | sbox[(s1 >> 16) & 0xFF] << 16 |
+         sbox[(s0 >> 8) & 0xFF] << 8 | sbox[s3 & 0xFF]) ^ keys[k + 2],
+        (sbox[s3 >> 24] << 24 | sbox[(s2 >> 16) & 0xFF] << 16 |
+         sbox[(s1 >> 8) & 0xFF] << 8 | sbox[s0 & 0xFF]) ^ keys[k + 3])
+
+
+class aes(object):
+    def __init__(self, key, mode, IV=None):
+        """
+        :param key: 16 or 32 bytes key
+        :param int mode: MODE_ECB, MODE_CBC or MODE_CTR
+        :param IV: 16 bytes initialization vector of CBC or initial counter of
+                   CTR, zeros by default
+        """
+        if len(key) not in (16, 32):
+            raise ValueError('key')
+        if mode not in (MODE_ECB, MODE_CBC, MODE_CTR):
+            raise ValueError('mode')
+        if IV is not None and len(IV) != _BLOCK_SIZE:
+            raise ValueError('IV')
+        self.__rounds, self.__keys, self.__inv_keys = _expand_key(bytes(key))
+        self.__mode = mode
+        self.__chain = self.__words(bytes(IV) if IV is not None else bytes(_BLOCK_SIZE), 0)
+        # Unused key stream of the last CTR block
+        self.__stream = b''
+        # The first call fixes the direction
+        self.__encrypting = None
+
+    def encrypt(self, in_buf, out_buf=None):
+        """
+        :param in_buf: Data, of whole blocks in ECB and CBC
+        :param out_buf: Buffer of the data length for the result, may be in_buf
+        :return bytes|None: Result, None - if out_buf is given
+        """
+        return self.__process(True, in_buf, out_buf)
+
+    def decrypt(self, in_buf, out_buf=None):
+        return self.__process(False, in_buf, out_buf)
+
+    def __process(self, encrypting, in_buf, out_buf):
+        if self.__encrypting is None:
+            self.__encrypting = encrypting
+        elif self.__encrypting is not encrypting:
+            raise ValueError("can't encrypt & decrypt")
+        length = len(in_buf)
+        if length % _BLOCK_SIZE and self.__mode != MODE_CTR:
+            raise ValueError('blksize % 16')
+        if out_buf is not None and len(out_buf) < length:
+            raise ValueError('output too small')
+
+        data = bytes(in_buf)
+        if self.__mode == MODE_CTR:
+            result = self.__counter_mode(data)
+        else:
+            result = self.__block_mode(encrypting, data)
+
+        if out_buf is None:
+            return bytes(result)
+        out_buf[:length] = result
+        return None
+
+    def __counter_mode(self, data):
+        length = len(data)
+        stream = bytearray(self.__stream)
+        c0, c1, c2, c3 = self.__chain
+        while len(stream) < length:
+            s0, s1, s2, s3 = _encrypt_block(self.__rounds, self.__keys, c0, c1, c2, c3)
+            stream += (s0.to_bytes(4, 'big') + s1.to_bytes(4, 'big') +
+                       s2.to_bytes(4, 'big') + s3.to_bytes(4, 'big'))
+            counter = ((c0 << 96 | c1 << 64 | c2 << 32 | c3) + 1) & ((1 << 128) - 1)
+            c0, c1, c2, c3 = self.__words(counter.to_bytes(_BLOCK_SIZE, 'big'), 0)
+        self.__chain = (c0, c1, c2, c3)
+        self.__stream = bytes(stream[length:])
+        return bytes(x ^ y for x, y in zip(data, stream))
+
+    def __block_mode(self, encrypting, data):
+        length = len(data)
+        result = bytearray(length)
+        rounds = self.__rounds
+        cbc = self.__mode == MODE_CBC
+        c0, c1, c2, c3 = self.__chain
+        for offset in range(0, length, _BLOCK_SIZE):
+            s0, s1, s2, s3 = self.__words(data, offset)
+            if encrypting:
+                if cbc:
+                    s0 ^= c0
+                    s1 ^= c1
+                    s2 ^= c2
+                    s3 ^= c3
+                c0, c1, c2, c3 = s0, s1, s2, s3 = _encrypt_block(
+                    rounds, self.__keys, s0, s1, s2, s3)
+            else:
+                o0, o1, o2, o3 = _decrypt_block(rounds, self.__inv_keys, s0, s1, s2, s3)
+                if cbc:
+                    o0 ^= c0
+                    o1 ^= c1
+                    o2 ^= c2
+                    o3 ^= c3
+                c0, c1, c2, c3 = s0, s1, s2, s3
+                s0, s1, s2, s3 = o0, o1, o2, o3
+            result[offset:offset + _BLOCK_SIZE] = (
+                s0.to_bytes(4, 'big') + s1.to_bytes(4, 'big') +
+                s2.to_bytes(4, 'big') + s3.to_bytes(4, 'big'))
+        self.__chain = (c0, c1, c2, c3)
+        return result
+
+    @staticmethod
+    def __words(data, offset):
+        return (int.from_bytes(data[offset:offset + 4], 'big'),
+                int.from_bytes(data[offset + 4:offset + 8], 'big'),
+                int.from_bytes(data[offset + 8:offset + 12], 'big'),
+                int.from_bytes(data[offset + 12:offset + 16], 'big'))
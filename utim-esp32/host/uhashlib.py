@@ -0,0 +1,6 @@
+"""
+uhashlib for CPython
+"""
+from hashlib import sha1, sha256
+
+__all__ = ['sha1', 'sha256']
@@ -0,0 +1,17 @@
+"""
+uos for CPython
+"""
+import os as _os
+from os import (chdir, getcwd, listdir, mkdir, remove, rename, rmdir, stat,
+                statvfs, uname, urandom)
+
+__all__ = ['chdir', 'getcwd', 'ilistdir', 'listdir', 'mkdir', 'remove', 'rename',
+           'rmdir', 'stat', 'statvfs', 'uname', 'urandom']
+
+
+def ilistdir(path='.'):
+    """
+    Iterate (name, type, inode) of directory entries as the firmware does
+    """
+    for entry in _os.scandir(path):
+        yield (entry.name, 0x4000 if entry.is_dir() else 0x8000, entry.inode())
@@ -0,0 +1,6 @@
+"""
+urandom for CPython
+"""
+from random import choice, getrandbits, randint, random, randrange, seed, uniform
+
+__all__ = ['choice', 'getrandbits', 'randint', 'random', 'randrange', 'seed', 'uniform']
@@ -0,0 +1,44 @@
+"""
+uselect for CPython
+
+poll() returns (object, event) tuples of the registered objects as on the
+firmware, the standard one returns file descriptors.
+"""
+import select as _select
+from select import POLLERR, POLLHUP, POLLIN, POLLOUT, select
+
+__all__ = ['POLLERR', 'POLLHUP', 'POLLIN', 'POLLOUT', 'poll', 'select']
+
+
+class _Poll(object):
+    def __init__(self):
+        self.__poll = _select.poll()
+        # Registered objects by file descriptor
+        self.__objects = {}
+
+    def register(self, obj, eventmask=POLLIN | POLLOUT):
+        fd = obj if isinstance(obj, int) else obj.fileno()
+        self.__poll.register(fd, eventmask)
+        self.__objects[fd] = obj
+
+    def unregister(self, obj):
+        fd = obj if isinstance(obj, int) else obj.fileno()
+        self.__poll.unregister(fd)
+        del self.__objects[fd]
+
+    def modify(self, obj, eventmask):
+        self.__poll.modify(obj if isinstance(obj, int) else obj.fileno(), eventmask)
+
+    def poll(self, timeout=-1):
+        """
+        :param int timeout: Milliseconds, -1 - wait forever
+        :return list: (object, event) tuples
+        """
+        return [(self.__objects[fd], event) for fd, event in self.__poll.poll(timeout)]
+
+    def ipoll(self, timeout=-1, flags=0):
+        return iter(self.poll(timeout))
+
+
+def poll():
+    return _Poll()
@@ -0,0 +1,147 @@
+"""
+usocket for CPython
+
+Sockets are streams as on the firmware: read() and readinto() of a blocking
+socket wait for all requested bytes or the end of the stream, a non-blocking one
+returns what has arrived or None if nothing has, and write() of a blocking
+socket sends all bytes. A timeout raises OSError, socket.timeout is one.
+"""
+import socket as _socket
+from socket import (AF_INET, AF_INET6, IPPROTO_TCP, IPPROTO_UDP, SOCK_DGRAM,
+                    SOCK_RAW, SOCK_STREAM, SOL_SOCKET, SO_REUSEADDR, getaddrinfo)
+
+__all__ = ['AF_INET', 'AF_INET6', 'IPPROTO_TCP', 'IPPROTO_UDP', 'SOCK_DGRAM',
+           'SOCK_RAW', 'SOCK_STREAM', 'SOL_SOCKET', 'SO_REUSEADDR', 'error',
+           'getaddrinfo', 'socket']
+
+error = OSError
+
+# Bytes read at once by read() of the whole stream
+_CHUNK_SIZE = 1024
+
+
+class socket(object):
+    def __init__(self, af=AF_INET, type=SOCK_STREAM, proto=0, sock=None):
+        """
+        :param sock: CPython socket to wrap, a new one is created by default
+        """
+        self.__sock = sock if sock is not None else _socket.socket(af, type, proto)
+
+    def fileno(self):
+        return self.__sock.fileno()
+
+    def bind(self, address):
+        self.__sock.bind(address)
+
+    def listen(self, backlog=5):
+        self.__sock.listen(backlog)
+
+    def accept(self):
+        sock, address = self.__sock.accept()
+        return socket(sock=sock), address
+
+    def connect(self, address):
+        self.__sock.connect(address)
+
+    def close(self):
+        self.__sock.close()
+
+    def setblocking(self, flag):
+        self.__sock.setblocking(flag)
+
+    def settimeout(self, value):
+        self.__sock.settimeout(value)
+
+    def setsockopt(self, level, option, value):
+        self.__sock.setsockopt(level, option, value)
+
+    def send(self, data):
+        return self.__sock.send(data)
+
+    def sendall(self, data):
+        self.__sock.sendall(data)
+
+    def sendto(self, data, address):
+        return self.__sock.sendto(data, address)
+
+    def recv(self, size):
+        return self.__sock.recv(size)
+
+    def recvfrom(self, size):
+        return self.__sock.recvfrom(size)
+
+    def makefile(self, mode='rb', buffering=0):
+        # The socket is a stream itself
+        return self
+
+    def read(self, size=-1):
+        """
+        :param int size: Number of bytes, -1 - read until the end of the stream
+        :return bytes|None: None - if a non-blocking socket has no data
+        """
+        if size < 0:
+            chunks = []
+            while True:
+                chunk = self.read(_CHUNK_SIZE)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+            if chunk is None and not chunks:
+                return None
+            return b''.join(chunks)
+
+        buffer = bytearray(size)
+        count = self.readinto(buffer)
+        if count is None:
+            return None
+        return bytes(buffer[:count])
+
+    def readinto(self, buffer, size=None):
+        """
+        :return int|None: Number of bytes read, None - if a non-blocking socket
+                          has no data
+        """
+        view = memoryview(buffer)
+        if size is not None:
+            view = view[:size]
+        total = 0
+        while total < len(view):
+            try:
+                count = self.__sock.recv_into(view[total:])
+            except BlockingIOError:
+                return total if total else None
+            if not count:
+                break
+            total += count
+        return total
+
+    def readline(self):
+        line = bytearray()
+        while not line.endswith(b'\n'):
+            char = self.read(1)
+            if not char:
+                break
+            line += char
+        return bytes(line)
+
+    def write(self, data, size=None):
+        """
+        :return int|None: Number of bytes written, None - if a non-blocking
+                          socket can not take any
+        """
+        if isinstance(data, str):
+            # The firmware writes str as its UTF-8 bytes
+            data = data.encode()
+        view = memoryview(data)
+        if size is not None:
+            view = view[:size]
+        if self.__sock.gettimeout() != 0.0:
+            self.__sock.sendall(view)
+            return len(view)
+        try:
+            return self.__sock.send(view)
+        except BlockingIOError:
+            return None
+
+    def __repr__(self):
+        return '<socket fd={}>'.format(self.fileno())
@@ -0,0 +1,6 @@
+"""
+ustruct for CPython
+"""
+from struct import calcsize, pack, pack_into, unpack, unpack_from
+
+__all__ = ['calcsize', 'pack', 'pack_into', 'unpack', 'unpack_from']
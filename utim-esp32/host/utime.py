@@ -0,0 +1,48 @@
+"""
+utime for CPython
+
+Ticks wrap around at 2**30 as they do on the firmware, so code has to use
+ticks_add() and ticks_diff() as it must on the board.
+"""
+import time as _time
+
+__all__ = ['ticks_ms', 'ticks_us', 'ticks_cpu', 'ticks_add', 'ticks_diff',
+           'sleep', 'sleep_ms', 'sleep_us', 'time', 'localtime', 'mktime']
+
+_TICKS_PERIOD = 1 << 30
+_TICKS_MAX = _TICKS_PERIOD - 1
+_TICKS_HALFPERIOD = _TICKS_PERIOD >> 1
+
+time = _time.time
+localtime = _time.localtime
+mktime = _time.mktime
+sleep = _time.sleep
+
+
+def ticks_ms():
+    return int(_time.monotonic() * 1000) & _TICKS_MAX
+
+
+def ticks_us():
+    return int(_time.monotonic() * 1000000) & _TICKS_MAX
+
+
+def ticks_cpu():
+    return _time.perf_counter_ns() & _TICKS_MAX
+
+
+def ticks_add(ticks, delta):
+    return (ticks + delta) & _TICKS_MAX
+
+
+def ticks_diff(ticks1, ticks2):
+    diff = (ticks1 - ticks2) & _TICKS_MAX
+    return diff - _TICKS_PERIOD if diff >= _TICKS_HALFPERIOD else diff
+
+
+def sleep_ms(ms):
+    _time.sleep(ms / 1000)
+
+
+def sleep_us(us):
+    _time.sleep(us / 1000000)
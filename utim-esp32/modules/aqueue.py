@@ -0,0 +1,136 @@
+"""
+Awaitable queue.Queue realisation for asyncio/uasyncio event loop
+
+The queue is meant to be shared by coroutines of a single event loop, it is not
+thread-safe. The coroutines are aput(), aget(), aput_many() and aget_many(), the
+inherited queue.Queue methods wake them as well, so the queue still stands in
+for queue.Queue where an item is put or got without waiting.
+
+"""
+
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+import queue
+import pqueue
+from queue import Empty, Full, OVERFLOW_BLOCK
+
+__all__ = ['Empty', 'Full', 'Queue', 'PriorityQueue']
+
+
+class Queue(queue.Queue):
+    def __init__(self, maxsize=128, overflow=OVERFLOW_BLOCK):
+        """
+        :param int maxsize: Maximum number of queued items, must be positive
+        :param str overflow: Overflow policy, one of queue.OVERFLOW_*
+        """
+        super().__init__(maxsize, overflow)
+        self._item_put = asyncio.Event()
+        self._item_got = asyncio.Event()
+
+    async def aput(self, data):
+        """
+        Put an item into the queue, waiting for a free slot if the overflow
+        policy is OVERFLOW_BLOCK. The other policies never wait: a full queue
+        drops an item or rejects the new one and the loss is counted in stats()
+        """
+        while self._full() and self.overflow == OVERFLOW_BLOCK:
+            self._item_got.clear()
+            await self._item_got.wait()
+        try:
+            self.put_nowait(data)
+        except Full:
+            # OVERFLOW_REJECT, the item is counted as rejected already
+            pass
+
+    async def aget(self):
+        """
+        Remove and return an item from the queue, waiting until one is available
+        """
+        while self._empty():
+            self._item_put.clear()
+            await self._item_put.wait()
+        return self.get_nowait()
+
+    async def aput_many(self, items):
+        """
+        Put items into the queue in order, see aput()
+
+        :param list items:
+        :return int: Number of handled items, queued or dropped/rejected by
+                     the overflow policy, always len(items)
+        """
+        for data in items:
+            await self.aput(data)
+        return len(items)
+
+    async def aget_many(self, max_items):
+        """
+        Remove and return up to max_items items, waiting until one is available
+
+        :param int max_items:
+        :return list:
+        """
+        while self._empty():
+            self._item_put.clear()
+            await self._item_put.wait()
+        items = []
+        while len(self.q) and len(items) < max_items:
+            items.append(self.q.popleft())
+        self._item_got.set()
+        return items
+
+    def put_nowait(self, data):
+        if self._full():
+            if self.overflow == OVERFLOW_BLOCK:
+                raise Full
+            if self._overflow():
+                return
+        self.q.append(data)
+        self._item_put.set()
+
+    def get_nowait(self):
+        if self._empty():
+            raise Empty
+        data = self.q.popleft()
+        self._item_got.set()
+        return data
+
+    def get(self, block=True, timeout=None):
+        data = super().get(block, timeout)
+        self._item_got.set()
+        return data
+
+    def get_many(self, max_items, block=True, timeout=None):
+        items = super().get_many(max_items, block, timeout)
+        self._item_got.set()
+        return items
+
+    def _put(self, data, block, deadline):
+        super()._put(data, block, deadline)
+        self._item_put.set()
+
+
+class PriorityQueue(Queue):
+    def __init__(self, lane, maxsize=128, overflow=OVERFLOW_BLOCK,
+                 lanes=2, fairness=pqueue.DEFAULT_FAIRNESS):
+        """
+        Awaitable pqueue.PriorityQueue
+
+        :param lane: Function of an item returning its lane index
+        :param int maxsize: Maximum number of queued items of all lanes
+        :param str overflow: Overflow policy
+        :param int lanes: Number of lanes
+        :param int fairness: Fairness cap
+        """
+        super().__init__(maxsize, overflow)
+        self.q = pqueue.Lanes(lane, maxsize, lanes, fairness)
+
+    def stats(self):
+        stats = super().stats()
+        stats['lanes'] = self.q.sizes()
+        return stats
+
+    def _drop(self):
+        self.q.drop()
@@ -2,14 +2,48 @@
     Some necessary CPython 3 threading module classes
 """
 
+import sys
 import _thread
-from collections import deque as _deque
-from itertools import islice as _islice
+import utime as _utime
 
 _allocate_lock = _thread.allocate_lock
 
 Lock = _allocate_lock
 
+# Period of polling for a lock acquired with timeout
+_POLL_INTERVAL_MS = 10
+# MicroPython's _thread ignores the timeout argument of acquire()
+_TIMED_ACQUIRE = sys.implementation.name != 'micropython'
+
+
+def _acquire_timeout(lock, timeout):
+    """Acquire a lock, blocking for at most timeout seconds.
+    MicroPython's _thread ignores the timeout argument of acquire(), so the
+    lock is polled with sleeps in between until the deadline passes there.
+    Loops which wait long wait with no timeout and are woken instead.
+    Return true if the lock has been acquired, false if the timeout has elapsed.
+    """
+    if _TIMED_ACQUIRE:
+        return lock.acquire(True, timeout)
+    deadline = _utime.ticks_add(_utime.ticks_ms(), int(timeout * 1000))
+    while not lock.acquire(False):
+        remaining = _utime.ticks_diff(deadline, _utime.ticks_ms())
+        if remaining <= 0:
+            return False
+        _utime.sleep_ms(min(remaining, _POLL_INTERVAL_MS))
+    return True
+
+def acquire_lock(lock, timeout=None):
+    """Acquire a lock, blocking for at most timeout seconds, forever if timeout
+    is None, or not at all if it is not positive.
+    Return true if the lock has been acquired, false if the timeout has elapsed.
+    """
+    if timeout is None:
+        return lock.acquire()
+    if timeout <= 0:
+        return lock.acquire(False)
+    return _acquire_timeout(lock, timeout)
+
 def RLock(*args, **kwargs):
     """Factory function that returns a new reentrant lock.
     A reentrant lock must be released by the thread that acquired it. Once a
@@ -154,7 +188,8 @@ class Condition:
             self._is_owned = lock._is_owned
         except AttributeError:
             pass
-        self._waiters = _deque((), 128)
+        # A list is used as MicroPython deque supports neither remove() nor iteration
+        self._waiters = []
 
     def __enter__(self):
         return self._lock.__enter__()
@@ -211,7 +246,7 @@ class Condition:
                 gotit = True
             else:
                 if timeout > 0:
-                    gotit = waiter.acquire(True, timeout)
+                    gotit = _acquire_timeout(waiter, timeout)
                 else:
                     gotit = waiter.acquire(False)
             return gotit
@@ -229,15 +264,15 @@ class Condition:
         boolean value.  A timeout may be provided giving the maximum time to
         wait.
         """
-        endtime = None
+        deadline = None
         waittime = timeout
         result = predicate()
         while not result:
             if waittime is not None:
-                if endtime is None:
-                    endtime = _time() + waittime
+                if deadline is None:
+                    deadline = _utime.ticks_add(_utime.ticks_ms(), int(waittime * 1000))
                 else:
-                    waittime = endtime - _time()
+                    waittime = _utime.ticks_diff(deadline, _utime.ticks_ms()) / 1000
                     if waittime <= 0:
                         break
             self.wait(waittime)
@@ -254,10 +289,7 @@ class Condition:
         if not self._is_owned():
             raise RuntimeError("cannot notify on un-acquired lock")
         all_waiters = self._waiters
-        # deque has to be created empty in Micropython
-        waiters_to_notify = _deque((), 128)
-        for item in _islice(all_waiters, n):
-            waiters_to_notify.append(item)
+        waiters_to_notify = all_waiters[:n]
         if not waiters_to_notify:
             return
         for waiter in waiters_to_notify:
@@ -0,0 +1,353 @@
+"""
+Datalink frames reassembler for byte streams
+
+A UART or a socket delivers the [type: 1 byte][length: 2 bytes, big endian]
+[payload] frames as a byte stream, one read may return a part of a frame or
+several frames at once. Framer collects the chunks in a preallocated buffer and
+cuts complete frames out of it. A header with an unknown type or a length the
+buffer can not hold is garbage, one byte is skipped and the search for a header
+goes on from the next byte.
+
+StreamLink reads a stream in bulk through Framer and provides the queue.Queue
+methods used by the datalink, so a stream may replace a frame queue in
+Manager. A pseudo-terminal or a socketpair serves as the stream on a host:
+
+    a, b = socket.socketpair()
+    StreamLink(a.makefile('rwb', buffering=0))
+
+"""
+
+import utime
+import uselect
+from queue import Empty, Full
+
+__all__ = ['Framer', 'StreamLink', 'AsyncStreamLink']
+
+# Period of polling for data in AsyncStreamLink.aget()
+_POLL_INTERVAL_MS = 5
+# Milliseconds of a stream poll of blocking get() without timeout, close() is
+# noticed after it at the latest
+_WAIT_SLICE_MS = 1000
+# Milliseconds to wait for the stream to take more of a frame being written
+_WRITE_TIMEOUT_MS = 1000
+
+HEADER_LENGTH = 3
+
+
+class Framer(object):
+    def __init__(self, size=4096, validate=None):
+        """
+        :param int size: Buffer size in bytes, the longest frame included
+        :param validate: Function of a frame type returning True if it is
+                         known, None - every type is known
+        """
+        if size <= HEADER_LENGTH:
+            raise ValueError("'size' is too small")
+        self.size = size
+        self.frames = 0
+        self.resyncs = 0
+        self.discarded = 0
+        self.__validate = validate
+        self.__buffer = bytearray(size)
+        self.__view = memoryview(self.__buffer)
+        # Start of unparsed data
+        self.__head = 0
+        # End of received data
+        self.__end = 0
+        # Bytes are being discarded, a run of them is one resynchronisation
+        self.__resyncing = False
+
+    def __len__(self):
+        """
+        :return int: Number of buffered bytes
+        """
+        return self.__end - self.__head
+
+    def feed(self, data):
+        """
+        Buffer a chunk of the stream
+
+        :param data: bytes, bytearray or memoryview
+        :return int: Number of buffered bytes of data, the rest must be fed
+                     again after frames are taken
+        """
+        count = min(len(data), len(self.space()))
+        self.__view[self.__end:self.__end + count] = memoryview(data)[:count]
+        self.__end += count
+        return count
+
+    def space(self):
+        """
+        Get free part of the buffer to read the stream into, the data read
+        must be committed with commit()
+
+        :return memoryview:
+        """
+        if self.__end == self.size:
+            self.__compact()
+        return self.__view[self.__end:]
+
+    def commit(self, count):
+        """
+        Commit count bytes read into space()
+        """
+        self.__end += count
+
+    def get(self):
+        """
+        Cut the next complete frame
+
+        :return bytes|None: Frame - [type][length][payload], None - if there is
+                            no complete frame
+        """
+        buffer = self.__buffer
+        validate = self.__validate
+        while self.__end - self.__head >= HEADER_LENGTH:
+            head = self.__head
+            length = buffer[head + 1] << 8 | buffer[head + 2]
+            if (length > self.size - HEADER_LENGTH or
+                    (validate is not None and not validate(buffer[head]))):
+                # Garbage, resynchronise on the next byte
+                if not self.__resyncing:
+                    self.__resyncing = True
+                    self.resyncs += 1
+                self.discarded += 1
+                self.__head = head + 1
+                continue
+
+            end = head + HEADER_LENGTH + length
+            if end > self.__end:
+                if end > self.size:
+                    # Make room for the rest of the frame
+                    self.__compact()
+                return None
+
+            frame = bytes(self.__view[head:end])
+            self.__head = end
+            if end == self.__end:
+                self.__head = self.__end = 0
+            self.frames += 1
+            self.__resyncing = False
+            return frame
+
+        return None
+
+    def get_many(self, max_items):
+        """
+        Cut up to max_items complete frames
+
+        :return list:
+        """
+        frames = []
+        while len(frames) < max_items:
+            frame = self.get()
+            if frame is None:
+                break
+            frames.append(frame)
+        return frames
+
+    def stats(self):
+        """
+        Get reassembler statistics
+
+        :return dict: Buffer size, buffered bytes, number of frames, number of
+                      resynchronisations and number of discarded bytes
+        """
+        return {'size': self.size,
+                'used': len(self),
+                'frames': self.frames,
+                'resyncs': self.resyncs,
+                'discarded': self.discarded}
+
+    def __compact(self):
+        """
+        Move unparsed data to the buffer start
+        """
+        count = self.__end - self.__head
+        if self.__head:
+            # The regions may overlap, so the data is copied out first
+            self.__view[0:count] = bytes(self.__view[self.__head:self.__end])
+            self.__head = 0
+            self.__end = count
+
+
+class StreamLink(object):
+    def __init__(self, stream, size=4096, validate=None):
+        """
+        :param stream: Stream with readinto() and write(), pollable by
+                       uselect.poll, e.g. machine.UART, a socket or a file
+        :param int size: Reassembly buffer size in bytes
+        :param validate: Function of a frame type returning True if it is known
+        """
+        self.stream = stream
+        self.framer = Framer(size, validate)
+        self.rejected = 0
+        self.short_writes = 0
+        # Closed link never blocks, see close()
+        self.closed = False
+        self.__poll = uselect.poll()
+        self.__poll.register(stream, uselect.POLLIN)
+        self.__write_poll = uselect.poll()
+        self.__write_poll.register(stream, uselect.POLLOUT)
+
+    def read(self, timeout_ms=0):
+        """
+        Read all bytes the stream has ready into the reassembly buffer
+
+        :param int timeout_ms: Milliseconds to wait for the first byte
+        :return int: Number of bytes read
+        """
+        total = 0
+        while self.__poll.poll(timeout_ms if not total else 0):
+            space = self.framer.space()
+            if not len(space):
+                # Frames must be taken first
+                break
+            count = self.stream.readinto(space)
+            if not count:
+                break
+            self.framer.commit(count)
+            total += count
+        return total
+
+    def get_nowait(self):
+        """
+        Remove and return a frame if one is available, else raise Empty
+
+        :return bytes:
+        """
+        frame = self.framer.get()
+        if frame is None:
+            self.read()
+            frame = self.framer.get()
+            if frame is None:
+                raise Empty
+        return frame
+
+    def get(self, block=True, timeout=None):
+        """
+        Remove and return a frame, waiting for it as queue.Queue.get() does
+        """
+        deadline = self.__deadline(timeout)
+        while True:
+            try:
+                return self.get_nowait()
+            except Empty:
+                if not block or self.closed or self.__expired(deadline):
+                    raise
+                # The stream poll returns as soon as data arrives
+                if deadline is None:
+                    self.read(_WAIT_SLICE_MS)
+                else:
+                    self.read(max(utime.ticks_diff(deadline, utime.ticks_ms()), 0))
+
+    def get_many(self, max_items, block=True, timeout=None):
+        """
+        Remove and return up to max_items frames, waiting for the first one as
+        queue.Queue.get_many() does
+
+        :return list:
+        """
+        frames = [self.get(block, timeout)]
+        frames.extend(self.framer.get_many(max_items - 1))
+        return frames
+
+    def put_nowait(self, data):
+        """
+        Write a frame to the stream. A stream may take a part of it, e.g. a
+        UART with a full TX buffer or a non-blocking socket, the rest is
+        written when the stream can take more. The frame is rejected if the
+        stream takes nothing for _WRITE_TIMEOUT_MS, the receiving Framer skips
+        the part written
+        """
+        view = memoryview(data)
+        written = 0
+        try:
+            while written < len(view):
+                # None - a non-blocking stream took nothing
+                count = self.stream.write(view[written:]) or 0
+                written += count
+                if written < len(view):
+                    self.short_writes += 1
+                    if not count and not self.__write_poll.poll(_WRITE_TIMEOUT_MS):
+                        raise OSError('write timed out')
+        except OSError:
+            self.rejected += 1
+            raise Full
+
+    def put(self, data, block=True, timeout=None):
+        """
+        Write a frame to the stream, the stream does the waiting
+        """
+        self.put_nowait(data)
+
+    def close(self):
+        """
+        Keep blocking get() from waiting again, it raises Empty instead
+        """
+        self.closed = True
+
+    def empty(self):
+        return not len(self.framer)
+
+    def full(self):
+        return False
+
+    def stats(self):
+        """
+        Get link statistics
+
+        :return dict: Reassembler statistics, number of rejected frames and
+                      number of writes the stream took a part of a frame by
+        """
+        stats = self.framer.stats()
+        stats['rejected'] = self.rejected
+        stats['short_writes'] = self.short_writes
+        return stats
+
+    @staticmethod
+    def __deadline(timeout):
+        if timeout is None:
+            return None
+        if timeout < 0:
+            raise ValueError("'timeout' must be a non-negative number")
+        return utime.ticks_add(utime.ticks_ms(), int(timeout * 1000))
+
+    @staticmethod
+    def __expired(deadline):
+        return deadline is not None and utime.ticks_diff(deadline, utime.ticks_ms()) <= 0
+
+
+class AsyncStreamLink(StreamLink):
+    """
+    StreamLink with awaitable aget() and aget_many() for the asyncio/uasyncio
+    event loop, the stream is polled without blocking the loop
+    """
+
+    def __init__(self, stream, size=4096, validate=None):
+        super().__init__(stream, size, validate)
+        try:
+            import uasyncio as asyncio
+        except ImportError:
+            import asyncio
+        self.__asyncio = asyncio
+
+    async def aget(self):
+        """
+        Remove and return a frame, waiting until one is available
+        """
+        while True:
+            try:
+                return self.get_nowait()
+            except Empty:
+                await self.__asyncio.sleep(_POLL_INTERVAL_MS / 1000)
+
+    async def aget_many(self, max_items):
+        """
+        Remove and return up to max_items frames, waiting for the first one
+
+        :return list:
+        """
+        frames = [await self.aget()]
+        frames.extend(self.framer.get_many(max_items - 1))
+        return frames
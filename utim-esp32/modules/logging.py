@@ -30,7 +30,7 @@ class Logger:
         return "LVL" + str(level)
 
     def log(self, level, msg, *args):
-        string = "{:<8}{:-40}{}".format(self._level_str(level), str(self.name), str(msg))
+        string = "{:<8}{:<40}{}".format(self._level_str(level), str(self.name), str(msg))
         # if level >= _level:
         print(string)
 
@@ -70,6 +70,14 @@ def debug(msg, *args):
     getLogger(None).debug(msg, *args)
 
 
+def warning(msg, *args):
+    getLogger(None).warning(msg, *args)
+
+
+def error(msg, *args):
+    getLogger(None).error(msg, *args)
+
+
 def basicConfig(level=INFO, filename=None, stream=None, format=None):
     global _level, _stream
     _level = level
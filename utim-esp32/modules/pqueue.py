@@ -0,0 +1,121 @@
+"""
+Multi-lane priority queue.Queue realisation
+
+Items are put into lanes chosen by a lane function, lane 0 has the highest
+priority. Lanes are served in strict priority order, except that after
+'fairness' items in a row were taken from higher lanes while a lower lane was
+waiting, one item is taken from the lower lane, so bulk data is never starved.
+Items of one lane keep their order.
+
+"""
+
+from collections import deque
+import queue
+
+__all__ = ['LANE_CONTROL', 'LANE_BULK', 'DEFAULT_FAIRNESS', 'Lanes', 'PriorityQueue']
+
+# Default lanes
+LANE_CONTROL = 0
+LANE_BULK = 1
+
+# Items taken from higher lanes while a lower lane waits before the lower lane
+# is served once
+DEFAULT_FAIRNESS = 8
+
+
+class Lanes(object):
+    """
+    Lanes of items with the deque methods used by queue.Queue
+    """
+
+    def __init__(self, lane, maxlen, lanes=2, fairness=DEFAULT_FAIRNESS):
+        """
+        :param lane: Function of an item returning its lane index
+        :param int maxlen: Maximum number of items in a lane
+        :param int lanes: Number of lanes
+        :param int fairness: Fairness cap, must be positive
+        """
+        if fairness <= 0:
+            raise ValueError("'fairness' must be a positive number")
+        self.__lane = lane
+        self.__lanes = [deque((), maxlen) for _ in range(lanes)]
+        self.__fairness = fairness
+        # Items taken from higher lanes in a row while a lower lane waits
+        self.__streak = 0
+        self.__length = 0
+
+    def __len__(self):
+        return self.__length
+
+    def append(self, data):
+        lane = self.__lane(data)
+        self.__lanes[min(max(lane, 0), len(self.__lanes) - 1)].append(data)
+        self.__length += 1
+
+    def popleft(self):
+        """
+        Remove and return the next item to serve
+
+        :raise: IndexError - if there are no items
+        """
+        lanes = self.__lanes
+        count = len(lanes)
+        index = 0
+        while index < count and not len(lanes[index]):
+            index += 1
+        if index == count:
+            raise IndexError('pop from an empty deque')
+
+        lower = index + 1
+        while lower < count and not len(lanes[lower]):
+            lower += 1
+        if lower == count:
+            self.__streak = 0
+        elif self.__streak >= self.__fairness:
+            self.__streak = 0
+            index = lower
+        else:
+            self.__streak += 1
+
+        self.__length -= 1
+        return lanes[index].popleft()
+
+    def drop(self):
+        """
+        Remove and return the oldest item of the lowest non-empty lane
+        """
+        for lane in reversed(self.__lanes):
+            if len(lane):
+                self.__length -= 1
+                return lane.popleft()
+        raise IndexError('pop from an empty deque')
+
+    def sizes(self):
+        """
+        :return list: Number of items in every lane
+        """
+        return [len(lane) for lane in self.__lanes]
+
+
+class PriorityQueue(queue.Queue):
+    def __init__(self, lane, maxsize=128, overflow=queue.OVERFLOW_BLOCK,
+                 lanes=2, fairness=DEFAULT_FAIRNESS):
+        """
+        :param lane: Function of an item returning its lane index
+        :param int maxsize: Maximum number of queued items of all lanes
+        :param str overflow: Overflow policy, OVERFLOW_DROP_OLDEST drops the
+                             oldest item of the lowest non-empty lane
+        :param int lanes: Number of lanes
+        :param int fairness: Fairness cap
+        """
+        super().__init__(maxsize, overflow)
+        self.q = Lanes(lane, maxsize, lanes, fairness)
+
+    def stats(self):
+        stats = super().stats()
+        with self.mutex:
+            stats['lanes'] = self.q.sizes()
+        return stats
+
+    def _drop(self):
+        self.q.drop()
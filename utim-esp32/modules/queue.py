@@ -4,8 +4,19 @@ Python3 queue.Queue realisation with Micropython ucollections.deque
 """
 
 from collections import deque
+import utime
+import event
 
-__all__ = ['Empty', 'Full', 'Queue']
+__all__ = ['Empty', 'Full', 'Queue', 'OVERFLOW_BLOCK', 'OVERFLOW_DROP_NEWEST',
+           'OVERFLOW_DROP_OLDEST', 'OVERFLOW_REJECT']
+
+# Overflow policies, what put() does when the queue is full:
+OVERFLOW_BLOCK = 'block'                # wait for a free slot as block/timeout allow
+OVERFLOW_DROP_NEWEST = 'drop_newest'    # discard the new item
+OVERFLOW_DROP_OLDEST = 'drop_oldest'    # discard the oldest queued item
+OVERFLOW_REJECT = 'reject'              # raise Full at once
+
+_OVERFLOW_POLICIES = (OVERFLOW_BLOCK, OVERFLOW_DROP_NEWEST, OVERFLOW_DROP_OLDEST, OVERFLOW_REJECT)
 
 
 class Empty(Exception):
@@ -19,21 +30,242 @@ class Full(Exception):
 
 
 class Queue(object):
-    def __init__(self):
-        self.q = deque((), 128)
+    def __init__(self, maxsize=128, overflow=OVERFLOW_BLOCK):
+        """
+        :param int maxsize: Maximum number of queued items, must be positive
+        :param str overflow: Overflow policy, one of OVERFLOW_*
+        """
+        if maxsize <= 0:
+            raise ValueError("'maxsize' must be a positive number")
+        if overflow not in _OVERFLOW_POLICIES:
+            raise ValueError("Unknown overflow policy: {}".format(overflow))
+        self.maxsize = maxsize
+        self.overflow = overflow
+        # Drop statistics
+        self.dropped = 0
+        self.rejected = 0
+        # Closed queue never blocks, see close()
+        self.closed = False
+        self.q = deque((), maxsize)
+        # All conditions share the same lock, so the queue state is consistent
+        # for any waiter which is woken up
+        self.mutex = event.Lock()
+        self.not_empty = event.Condition(self.mutex)
+        self.not_full = event.Condition(self.mutex)
+
+    def put(self, data, block=True, timeout=None):
+        """
+        Put an item into the queue.
+
+        If block is true and timeout is None, block until a free slot is
+        available. If timeout is a positive number, block at most timeout
+        seconds and raise Full if no free slot was available within that time.
+        Otherwise put the item if a free slot is immediately available, else
+        raise Full.
+
+        block and timeout apply to the OVERFLOW_BLOCK policy only, the other
+        policies never wait: a full queue drops an item or rejects the new one
+        and the loss is counted in stats().
+        """
+        deadline = self._deadline(block, timeout)
+        with self.not_full:
+            self._put(data, block, deadline)
+            self.not_empty.notify()
+
+    def get(self, block=True, timeout=None):
+        """
+        Remove and return an item from the queue.
+
+        If block is true and timeout is None, block until an item is
+        available. If timeout is a positive number, block at most timeout
+        seconds and raise Empty if no item was available within that time.
+        Otherwise return an item if one is immediately available, else raise
+        Empty.
+        """
+        deadline = self._deadline(block, timeout)
+        with self.not_empty:
+            self._wait(self.not_empty, self._empty, block, deadline, Empty)
+            data = self.q.popleft()
+            self.not_full.notify()
+            return data
+
+    def put_many(self, items, block=True, timeout=None):
+        """
+        Put items into the queue in order, taking the lock once.
+
+        block and timeout are applied to every item as put() does, the timeout
+        is shared by all of them.
+
+        :param list items:
+        :return int: Number of handled items, they are queued or dropped/rejected
+                     by the overflow policy. It is less than len(items) only if
+                     the OVERFLOW_BLOCK queue had no free slot in time, the rest
+                     of the items is not queued then.
+        """
+        deadline = self._deadline(block, timeout)
+        count = 0
+        with self.not_full:
+            for data in items:
+                try:
+                    self._put(data, block, deadline)
+                except Full:
+                    if self.overflow == OVERFLOW_BLOCK:
+                        break
+                count += 1
+                self.not_empty.notify()
+        return count
+
+    def put_many_until(self, items, run_event, timeout=None):
+        """
+        Put items in order while run_event is set, waiting for free slots.
+
+        put_many() is retried with the rest of the items whenever the
+        OVERFLOW_BLOCK queue has no free slot within timeout seconds, so a
+        cleared run_event is noticed at the latest then.
+
+        :param list items:
+        :param event.Event run_event: Event of the running producer
+        :param float timeout: Seconds of a put_many() attempt
+        :return bool: True - if all items are handled by the queue, False - if
+                      run_event is cleared or the queue is closed
+        """
+        while items:
+            if not run_event.is_set() or self.closed:
+                return False
+            items = items[self.put_many(items, timeout=timeout):]
+        return True
+
+    def get_many(self, max_items, block=True, timeout=None):
+        """
+        Remove and return up to max_items items, taking the lock once.
+
+        block and timeout apply to the first item as get() does, the rest are
+        the items which are queued already.
+
+        :param int max_items:
+        :return list:
+        """
+        deadline = self._deadline(block, timeout)
+        with self.not_empty:
+            self._wait(self.not_empty, self._empty, block, deadline, Empty)
+            items = []
+            while len(self.q) and len(items) < max_items:
+                items.append(self.q.popleft())
+            self.not_full.notify(len(items))
+            return items
 
     def put_nowait(self, data):
-        if(self.full()):
-            raise Full
-        self.q.append(data)
+        return self.put(data, False)
+
+    def close(self):
+        """
+        Wake the threads blocked in get() and put() and keep the queue from
+        blocking again, they raise Empty or Full instead. The owner closes
+        the queue on stop, so its loops wait with no timeout. Items are still
+        put and got if the queue allows it at once.
+        """
+        with self.mutex:
+            self.closed = True
+            self.not_empty.notify_all()
+            self.not_full.notify_all()
 
     def get_nowait(self):
-        if(self.empty()):
-            raise Empty
-        return self.q.popleft()
+        return self.get(False)
+
+    def qsize(self):
+        with self.mutex:
+            return len(self.q)
 
     def empty(self):
-        return (len(self.q) == 0)
+        with self.mutex:
+            return self._empty()
 
     def full(self):
-        return (len(self.q) > 128)
+        with self.mutex:
+            return self._full()
+
+    def stats(self):
+        """
+        Get queue statistics
+
+        :return dict: Current size, maximum size, overflow policy and numbers of
+                      dropped and rejected items
+        """
+        with self.mutex:
+            return {'size': len(self.q),
+                    'maxsize': self.maxsize,
+                    'overflow': self.overflow,
+                    'dropped': self.dropped,
+                    'rejected': self.rejected}
+
+    def _overflow(self):
+        """
+        Apply the non-blocking overflow policy to the full queue
+
+        :return bool: True - if the new item must be discarded
+        :raise: Full - if the new item is rejected
+        """
+        if self.overflow == OVERFLOW_DROP_NEWEST:
+            self.dropped += 1
+            return True
+        if self.overflow == OVERFLOW_DROP_OLDEST:
+            self._drop()
+            self.dropped += 1
+            return False
+        self.rejected += 1
+        raise Full
+
+    def _drop(self):
+        """
+        Discard the oldest item
+        """
+        self.q.popleft()
+
+    def _put(self, data, block, deadline):
+        """
+        Put an item, the lock must be held
+        """
+        if self._full() and self.overflow != OVERFLOW_BLOCK:
+            if self._overflow():
+                return
+        else:
+            self._wait(self.not_full, self._full, block, deadline, Full)
+        self.q.append(data)
+
+    @staticmethod
+    def _deadline(block, timeout):
+        if not block or timeout is None:
+            return None
+        if timeout < 0:
+            raise ValueError("'timeout' must be a non-negative number")
+        return utime.ticks_add(utime.ticks_ms(), int(timeout * 1000))
+
+    def _wait(self, condition, blocked, block, deadline, exception):
+        """
+        Wait for the condition while blocked() is true, the lock must be held
+
+        :raise: exception - if still blocked when block is false, the deadline
+                            is passed or the queue is closed
+        """
+        if not block or self.closed:
+            if blocked():
+                raise exception
+        elif deadline is None:
+            while blocked():
+                if self.closed:
+                    raise exception
+                condition.wait()
+        else:
+            while blocked():
+                if self.closed:
+                    raise exception
+                remaining = utime.ticks_diff(deadline, utime.ticks_ms())
+                if remaining <= 0:
+                    raise exception
+                condition.wait(remaining / 1000)
+
+    def _empty(self):
+        return (len(self.q) == 0)
+
+    def _full(self):
+        return (len(self.q) >= self.maxsize)
@@ -0,0 +1,207 @@
+"""
+Single-producer/single-consumer frame ring buffer
+
+Frames are stored length-prefixed (2 bytes, big endian) in a preallocated
+bytearray. The producer only moves the tail index and the consumer only moves
+the head index, so one producer thread and one consumer thread can share the
+buffer without locking. Blocked get() and put() wait on a lock the other side
+releases when it publishes a frame or frees room. It provides the queue.Queue
+methods used by the datalink, and raises queue.Empty and queue.Full in the same
+situations.
+
+"""
+
+import utime
+import event
+from queue import Empty, Full
+
+__all__ = ['RingBuffer']
+
+_HEADER_LENGTH = 2
+_MAX_FRAME_LENGTH = 0xFFFF
+
+
+class RingBuffer(object):
+    def __init__(self, size=4096):
+        """
+        :param int size: Buffer size in bytes, frames and their headers included
+        """
+        if size <= _HEADER_LENGTH:
+            raise ValueError("'size' is too small")
+        self.size = size
+        self.rejected = 0
+        # Closed buffer never blocks, see close()
+        self.closed = False
+        self.__buffer = bytearray(size)
+        self.__view = memoryview(self.__buffer)
+        # Read index, written by the consumer only
+        self.__head = 0
+        # Write index, written by the producer only
+        self.__tail = 0
+        # Released by the producer when a frame is published and by the
+        # consumer when room is freed, the waiting side acquires it
+        self.__readable = event.Lock()
+        self.__readable.acquire()
+        self.__writable = event.Lock()
+        self.__writable.acquire()
+
+    def put_nowait(self, data):
+        """
+        Put a frame if there is room for it, else raise Full
+        """
+        if not self.__write(data):
+            self.rejected += 1
+            raise Full
+
+    def __write(self, data):
+        """
+        Write a frame
+
+        :return bool: False - if there is no room for the frame
+        :raise: ValueError - if the frame never fits into the buffer
+        """
+        length = len(data)
+        # One byte is always left free, so the full buffer differs from the empty one
+        if length > _MAX_FRAME_LENGTH or length + _HEADER_LENGTH >= self.size:
+            raise ValueError("Frame is too long: {}".format(length))
+        tail = self.__tail
+        if length + _HEADER_LENGTH > (self.__head - tail - 1) % self.size:
+            return False
+
+        buffer = self.__buffer
+        buffer[tail] = length >> 8
+        tail = (tail + 1) % self.size
+        buffer[tail] = length & 0xFF
+        tail = (tail + 1) % self.size
+
+        first = min(length, self.size - tail)
+        data = memoryview(data)
+        self.__view[tail:tail + first] = data[:first]
+        if first < length:
+            self.__view[0:length - first] = data[first:]
+
+        # Publish the frame to the consumer
+        self.__tail = (tail + length) % self.size
+        self.__signal(self.__readable)
+        return True
+
+    def get_nowait(self):
+        """
+        Remove and return a frame if one is available, else raise Empty
+
+        :return bytes:
+        """
+        head = self.__head
+        if head == self.__tail:
+            raise Empty
+
+        buffer = self.__buffer
+        length = buffer[head] << 8 | buffer[(head + 1) % self.size]
+        head = (head + _HEADER_LENGTH) % self.size
+
+        first = min(length, self.size - head)
+        if first == length:
+            data = bytes(self.__view[head:head + length])
+        else:
+            data = bytes(self.__view[head:]) + bytes(self.__view[0:length - first])
+
+        # Release the space to the producer
+        self.__head = (head + length) % self.size
+        self.__signal(self.__writable)
+        return data
+
+    def put(self, data, block=True, timeout=None):
+        """
+        Put a frame, waiting for room as queue.Queue.put() does
+        """
+        deadline = self.__deadline(timeout)
+        while not self.__write(data):
+            if not block or self.closed or self.__expired(deadline):
+                self.rejected += 1
+                raise Full
+            self.__wait(self.__writable, deadline)
+
+    def get(self, block=True, timeout=None):
+        """
+        Remove and return a frame, waiting for it as queue.Queue.get() does
+        """
+        deadline = self.__deadline(timeout)
+        while True:
+            try:
+                return self.get_nowait()
+            except Empty:
+                if not block or self.closed or self.__expired(deadline):
+                    raise
+                self.__wait(self.__readable, deadline)
+
+    def get_many(self, max_items, block=True, timeout=None):
+        """
+        Remove and return up to max_items frames, waiting for the first one as
+        queue.Queue.get_many() does
+
+        :return list:
+        """
+        frames = [self.get(block, timeout)]
+        while len(frames) < max_items and self.__head != self.__tail:
+            frames.append(self.get_nowait())
+        return frames
+
+    def close(self):
+        """
+        Wake the threads blocked in get() and put() and keep the buffer from
+        blocking again, they raise Empty or Full instead
+        """
+        self.closed = True
+        self.__signal(self.__readable)
+        self.__signal(self.__writable)
+
+    def empty(self):
+        return self.__head == self.__tail
+
+    def full(self):
+        return (self.__head - self.__tail - 1) % self.size < _HEADER_LENGTH
+
+    def stats(self):
+        """
+        Get buffer statistics
+
+        :return dict: Buffer size, used bytes and number of rejected frames
+        """
+        return {'size': self.size,
+                'used': (self.__tail - self.__head) % self.size,
+                'rejected': self.rejected}
+
+    @staticmethod
+    def __signal(lock):
+        """
+        Wake the other side if it waits, only it acquires the lock
+        """
+        if lock.locked():
+            try:
+                lock.release()
+            except RuntimeError:
+                # Released by close() meanwhile
+                pass
+
+    @staticmethod
+    def __wait(lock, deadline):
+        """
+        Wait until the other side releases the lock or the deadline passes,
+        the caller checks the buffer again either way
+        """
+        if deadline is None:
+            lock.acquire()
+        else:
+            event.acquire_lock(lock, max(utime.ticks_diff(deadline, utime.ticks_ms()), 0) / 1000)
+
+    @staticmethod
+    def __deadline(timeout):
+        if timeout is None:
+            return None
+        if timeout < 0:
+            raise ValueError("'timeout' must be a non-negative number")
+        return utime.ticks_add(utime.ticks_ms(), int(timeout * 1000))
+
+    @staticmethod
+    def __expired(deadline):
+        return deadline is not None and utime.ticks_diff(deadline, utime.ticks_ms()) <= 0
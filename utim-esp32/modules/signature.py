@@ -1,16 +1,19 @@
 # from uhashlib import sha256
 # import hmac
 import chmac
+import ubinascii
 
 
 class Signature(object):
 
     @staticmethod
     def create_signature(secret_key, message):
-        message_to_sign = message.encode('utf-8')
         # sha256 by default, hardcoded into chmac
-        hashed = chmac.hmac(secret_key, len(secret_key), message_to_sign, len(message_to_sign))
-        return hashed.hexdigest()
+        mac = chmac.HMAC(secret_key)
+        # A list of parts is authenticated as the parts joined
+        for part in (message if isinstance(message, list) else [message]):
+            mac.update(part.encode('utf-8') if isinstance(part, str) else part)
+        return ubinascii.hexlify(mac.digest()).decode()
 
     def message_sign(self, key, message):
         hmac = self.create_signature(key, message)
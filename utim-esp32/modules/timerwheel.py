@@ -0,0 +1,229 @@
+"""
+Hierarchical timer wheel on utime.ticks_ms
+
+Time is counted in ticks of 'resolution' milliseconds. The wheel has LEVELS
+levels of SLOTS slots each, level N slot spans SLOTS ** N ticks. A timer is put
+into the level which covers its delay, and a higher level slot is cascaded into
+the lower levels when the time reaches it, so adding, cancelling and expiring a
+timer costs O(1) whatever the number of pending timers is.
+
+The wheel only keeps time, advance() must be called by one thread or coroutine
+and it runs the callbacks of the expired timers. The caller may sleep for
+next_expiry() milliseconds in between, the wakeup function tells it that add()
+put a timer expiring earlier. Timers may be added and cancelled from any thread.
+
+"""
+
+import utime
+import event
+
+__all__ = ['Timer', 'TimerWheel']
+
+_BITS = 6
+SLOTS = 1 << _BITS
+LEVELS = 4
+
+_MASK = SLOTS - 1
+# Longest delay the wheel covers in ticks, longer delays are cascaded again
+_MAX_DELAY = (1 << (_BITS * LEVELS)) - 1
+
+
+class Timer(object):
+    """
+    Timer handle returned by TimerWheel.add()
+    """
+
+    def __init__(self, wheel, expires, callback, args, period):
+        self.expires = expires
+        self.callback = callback
+        self.args = args
+        self.period = period
+        self.slot = None
+        self.__wheel = wheel
+
+    def cancel(self):
+        """
+        Cancel the timer, it is a no-op for an expired timer
+        """
+        self.__wheel.cancel(self)
+
+    def active(self):
+        """
+        :return bool: True - if the timer is pending
+        """
+        return self.slot is not None
+
+
+class TimerWheel(object):
+    def __init__(self, resolution=10, wakeup=None):
+        """
+        :param int resolution: Tick length in milliseconds
+        :param wakeup: Function without arguments called by add() if the new
+                       timer expires before the time next_expiry() returned
+        """
+        if resolution <= 0:
+            raise ValueError("'resolution' must be a positive number")
+        self.resolution = resolution
+        self.__wheel = [[[] for _ in range(SLOTS)] for _ in range(LEVELS)]
+        # Next tick to process
+        self.__now = 0
+        self.__last_ms = utime.ticks_ms()
+        self.__count = 0
+        self.__lock = event.Lock()
+        self.__wakeup = wakeup
+        # Tick the advance() caller sleeps till, None - till any timer is added
+        self.__wait_tick = None
+
+    def __len__(self):
+        return self.__count
+
+    def add(self, delay_ms, callback, args=(), period=0):
+        """
+        Add timer
+
+        :param int delay_ms: Delay in milliseconds
+        :param callback: Function to call in the advance() caller context
+        :param tuple args: Callback arguments
+        :param int period: Period in milliseconds, 0 - one-shot timer
+        :return Timer:
+        """
+        with self.__lock:
+            timer = Timer(self, self.__expires(delay_ms), callback, args, period)
+            self.__place(timer)
+            self.__count += 1
+            wakeup = self.__wait_tick is None or timer.expires < self.__wait_tick
+            if wakeup:
+                self.__wait_tick = timer.expires
+        if wakeup and self.__wakeup is not None:
+            self.__wakeup()
+        return timer
+
+    def cancel(self, timer):
+        """
+        Cancel timer
+
+        :param Timer timer:
+        """
+        with self.__lock:
+            if timer.slot is not None:
+                timer.slot.remove(timer)
+                timer.slot = None
+                self.__count -= 1
+            # A periodic timer must not be added again by advance()
+            timer.period = 0
+
+    def advance(self):
+        """
+        Process the ticks passed since the last call and run expired timers
+
+        :return int: Number of expired timers
+        """
+        with self.__lock:
+            ticks = utime.ticks_diff(utime.ticks_ms(), self.__last_ms) // self.resolution
+            if ticks <= 0:
+                return 0
+            self.__last_ms = utime.ticks_add(self.__last_ms, ticks * self.resolution)
+
+            expired = []
+            for tick in range(ticks):
+                if not self.__count:
+                    # Nothing to cascade or to expire, jump to the current tick
+                    self.__now += ticks - tick
+                    break
+                expired.extend(self.__tick())
+
+        # Callbacks run without the lock, so they can add and cancel timers.
+        # A failed callback does not stop the others, its error is raised after
+        error = None
+        for timer in expired:
+            try:
+                timer.callback(*timer.args)
+            except Exception as ex:
+                error = ex
+            if timer.period:
+                with self.__lock:
+                    if timer.period:
+                        timer.expires = self.__expires(timer.period)
+                        self.__place(timer)
+                        self.__count += 1
+
+        if error is not None:
+            raise error
+        return len(expired)
+
+    def next_expiry(self):
+        """
+        Get milliseconds till advance() expires the next level 0 timer or
+        cascades the next higher level slot, the time the caller may sleep.
+        add() calls the wakeup function for a timer expiring earlier
+
+        :return int|None: None - if there are no timers
+        """
+        with self.__lock:
+            if not self.__count:
+                self.__wait_tick = None
+                return None
+            level = self.__wheel[0]
+            # Higher level slots are cascaded at the ticks of index 0
+            last = (-self.__now) & _MASK
+            ticks = 0
+            while ticks < last and not level[(self.__now + ticks) & _MASK]:
+                ticks += 1
+            self.__wait_tick = self.__now + ticks
+            # The tick of index now is processed once a whole tick has passed
+            remaining = (ticks + 1) * self.resolution - utime.ticks_diff(utime.ticks_ms(),
+                                                                         self.__last_ms)
+            return max(remaining, 0)
+
+    def __expires(self, delay_ms):
+        """
+        Get expiry tick of delay, the lock must be held
+        """
+        # Round up and count the current tick as passed, the timer must not
+        # fire earlier than asked. The ticks passed since the last advance()
+        # are not processed yet, the caller may be sleeping
+        ticks = (max(delay_ms, 0) + self.resolution - 1) // self.resolution
+        passed = utime.ticks_diff(utime.ticks_ms(), self.__last_ms) // self.resolution
+        return self.__now + max(passed, 0) + ticks
+
+    def __place(self, timer):
+        """
+        Put timer into the slot covering its expiry tick, the lock must be held
+        """
+        delay = timer.expires - self.__now
+        if delay < 0:
+            delay = 0
+        expires = self.__now + min(delay, _MAX_DELAY)
+        level = 0
+        while delay >= SLOTS and level < LEVELS - 1:
+            delay >>= _BITS
+            level += 1
+        slot = self.__wheel[level][(expires >> (_BITS * level)) & _MASK]
+        slot.append(timer)
+        timer.slot = slot
+
+    def __tick(self):
+        """
+        Process the next tick, the lock must be held
+
+        :return list: Expired timers
+        """
+        now = self.__now
+        # Cascade higher level slots reached by the time
+        level = 1
+        index = now & _MASK
+        while index == 0 and level < LEVELS:
+            index = (now >> (_BITS * level)) & _MASK
+            slot = self.__wheel[level][index]
+            self.__wheel[level][index] = []
+            for timer in slot:
+                self.__place(timer)
+            level += 1
+
+        expired = self.__wheel[0][now & _MASK]
+        self.__wheel[0][now & _MASK] = []
+        for timer in expired:
+            timer.slot = None
+        self.__count -= len(expired)
+        self.__now = now + 1
+        return expired
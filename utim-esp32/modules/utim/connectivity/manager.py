@@ -62,14 +62,54 @@ class ConnectivityManager(object):
 
         return self.__manager.send(data)
 
-    def receive(self):
+    def receive(self, timeout=manager.QUEUE_TIMEOUT):
         """
         Receive method
 
+        :param timeout: Seconds to wait for data, None - wait forever
         :return:
         """
 
-        return self.__manager.receive()
+        return self.__manager.receive(timeout)
+
+    async def receive_async(self):
+        """
+        Receive coroutine, waits for data
+
+        :return:
+        """
+
+        return await self.__manager.receive_async()
+
+    def receive_many(self, max_items=manager.BATCH_SIZE, timeout=manager.QUEUE_TIMEOUT):
+        """
+        Receive all queued data up to max_items
+
+        :param int max_items: Maximum number of items
+        :param timeout: Seconds to wait for the first item, None - wait forever
+        :return list:
+        """
+
+        return self.__manager.receive_many(max_items, timeout)
+
+    async def receive_many_async(self, max_items=manager.BATCH_SIZE):
+        """
+        Receive coroutine, waits for data and returns all queued data up to max_items
+
+        :param int max_items: Maximum number of items
+        :return list:
+        """
+
+        return await self.__manager.receive_many_async(max_items)
+
+    def get_queue_stats(self):
+        """
+        Get queue statistics
+
+        :return dict: Statistics by queue name
+        """
+
+        return self.__manager.get_queue_stats()
 
     def run_uhost_connection(self, config):
         """
@@ -1,13 +1,24 @@
 import logging
 import queue
-import _thread
 import event
+import framer
+import pqueue
+import ringbuffer
 from . import utim_connection
+from ..utilities import config
+from ..utilities import runtime
+from ..utilities import tlv
 from ..utilities.exceptions import *
 from .utim_connection import UtimConnectionInvalidDataException
 
 logger = logging.Logger('connectivity.ttnd_manager')
 
+# Seconds receive() waits for data by default, the loops wait with no timeout
+# and stop() closes their queues
+QUEUE_TIMEOUT = 1
+# Maximum number of items a stage takes from its queue in one wakeup
+BATCH_SIZE = 16
+
 
 class DataType(object):
     """
@@ -33,6 +44,19 @@ class DataType(object):
 
         return False
 
+    @classmethod
+    def lane(cls, data):
+        """
+        Get priority lane of item, Uhost data carries control commands
+
+        :param list data: [DataType, data]
+        :return int: pqueue.LANE_*
+        """
+
+        if data[0] == cls.UHOST:
+            return pqueue.LANE_CONTROL
+        return pqueue.LANE_BULK
+
 
 class ManagerConnectionStatus(object):
     """
@@ -71,22 +95,30 @@ class Manager(object):
         self.__uhost_connection = None
         self.__uhost_status = None
 
-        # Threads
+        self.__runtime = runtime.get_runtime()
+
+        # Threads (or tasks of the event loop runtime)
         self.__inbound_thread = None
         self.__outbound_thread = None
+        self.__uhost_inbound_task = None
 
         # Run event
         self.__run_event = event.Event()
 
         # Queues
-        self.__inbound_queue = queue.Queue()
-        self.__outbound_queue = queue.Queue()
-        self.__device_queue = queue.Queue()
-        self.__uhost_queue = queue.Queue()
-        self.__platform_queue = queue.Queue()
+        queue_config = config.Config().queue
+        self.__overflow = queue_config.get('overflow', queue.OVERFLOW_BLOCK)
+        self.__inbound_queue = self.__runtime.priority_queue(DataType.lane, **queue_config)
+        self.__outbound_queue = self.__runtime.priority_queue(DataType.lane, **queue_config)
+        self.__device_queue = self.__runtime.queue(**queue_config)
+        self.__uhost_queue = self.__runtime.queue(**queue_config)
+        self.__platform_queue = self.__runtime.queue(**queue_config)
         self.__tx = None
         self.__rx = None
 
+        # Outbound frames are assembled into one buffer, only the outbound loop uses it
+        self.__frame_writer = tlv.FrameWriter()
+
         self.connect(**kwargs)
 
         # Run processing
@@ -101,7 +133,9 @@ class Manager(object):
     def connect(self, **kwargs):
         if 'tx' not in kwargs.keys() or 'rx' not in kwargs.keys():
             raise DataLinkRealisationWrongArgsException()
-        if not isinstance(kwargs['tx'], queue.Queue) or not isinstance(kwargs['rx'], queue.Queue):
+        datalink_types = (queue.Queue, ringbuffer.RingBuffer, framer.StreamLink)
+        if (not isinstance(kwargs['tx'], datalink_types) or
+                not isinstance(kwargs['rx'], datalink_types)):
             raise DataLinkRealisationWrongArgsException()
         self.__tx = kwargs['tx']
         self.__rx = kwargs['rx']
@@ -111,9 +145,9 @@ class Manager(object):
         Run inbound data processing in another thread
         """
 
-        self.__inbound_thread = _thread.start_new_thread(
+        self.__inbound_thread = self.__runtime.start(
             self.__process_inbound,
-            ()
+            self.__process_inbound_device_task
         )
 
     def __run_process_outbound(self):
@@ -121,79 +155,102 @@ class Manager(object):
         Run outbound data processing in another thread
         """
 
-        self.__outbound_thread = _thread.start_new_thread(
+        self.__outbound_thread = self.__runtime.start(
             self.__process_outbound,
-            ()
+            self.__process_outbound_task
         )
 
     def __process_inbound(self):
         """
-        Process inbound data queue in loop
+        Process inbound device data in loop, it waits for the datalink
+        """
+
+        while self.__run_event.is_set():
+            items = self.__process_inbound_frames(self.__process_inbound_datalink())
+            if items:
+                self.__inbound_queue.put_many_until(items, self.__run_event)
+
+    def __process_inbound_uhost(self):
+        """
+        Process inbound Uhost data in loop, it waits for Uhost connection
         """
 
         while self.__run_event.is_set():
-            data_device = self.__process_inbound_transport()
+            data = self.__uhost_connection.receive_many(BATCH_SIZE, None)
+            if data:
+                items = [[DataType.UHOST, data_uhost] for data_uhost in data]
+                self.__inbound_queue.put_many_until(items, self.__run_event)
+
+    async def __process_inbound_device_task(self):
+        """
+        Process inbound device data coroutine
+        """
+
+        while self.__run_event.is_set():
+            items = self.__process_inbound_frames(await self.__rx.aget_many(BATCH_SIZE))
+            await self.__inbound_queue.aput_many(items)
+
+    async def __process_inbound_uhost_task(self):
+        """
+        Process inbound Uhost data coroutine
+        """
+
+        while self.__run_event.is_set():
+            data = await self.__uhost_connection.receive_many_async(BATCH_SIZE)
+            await self.__inbound_queue.aput_many([[DataType.UHOST, data_uhost] for data_uhost in data])
+
+    def __process_inbound_frames(self, frames):
+        """
+        Unpack datalink frames
+
+        :param list frames: Datalink frames
+        :return list: Inbound items of the valid frames
+        """
+
+        items = []
+        for frame in frames:
+            data_device = self.__process_inbound_transport(frame)
             if data_device is not None:
-                while not self.__put_data([DataType.DEVICE, data_device]):
-                    pass
+                items.append([DataType.DEVICE, data_device])
 
-            if (self.__uhost_connection and
-                    self.__uhost_status == ManagerConnectionStatus.SUCCESS):
-                data_uhost = self.__uhost_connection.receive()
-                if data_uhost is not None:
-                    while not self.__put_data([DataType.UHOST, data_uhost]):
-                        pass
+        return items
 
-    def __process_inbound_transport(self):
+    def __process_inbound_transport(self, data):
         # DataType.DEVICE by default
-        data = self.__process_inbound_network()
-        if data is not None:
-            # Data must be bytes type
-            if isinstance(data, bytes):
-                # Data must be 3 bytes at a minimum
-                data_length = len(data)
-                if data_length >= 3:
-                    tag_bytes = data[0:1]
-                    tag = int.from_bytes(tag_bytes, 'big')
-                    length_bytes = data[1:3]
-                    length = int.from_bytes(length_bytes, 'big')
-                    data = data[3:3 + length]
-                    if DataType.validate(tag) is True:
-                        # while not self.__put_data(data):
-                        #     pass
-                        return data
-                    else:
-                        logger.debug("Unknown data type - {}: {}".format(tag, str(data)))
-
+        reader = self.__process_inbound_network(data)
+        if reader is not None:
+            if reader.read():
+                if DataType.validate(reader.tag) is True:
+                    # The only copy of the frame data
+                    return reader.value_bytes()
                 else:
-                    logger.debug("Invalid data length - {}: {}".format(data_length, str(data)))
+                    logger.debug("Unknown data type - {}: {}".format(reader.tag, str(data)))
 
             else:
-                logger.error("Invalid data type: {}".format(str(data)))
+                logger.debug("Invalid data length - {}: {}".format(reader.remaining(), str(data)))
 
         return None
 
-    def __process_inbound_network(self):
-        data = self.__process_inbound_datalink()
+    def __process_inbound_network(self, data):
+        """
+        Unpack network layer
+
+        :param bytes data: Datalink frame
+        :return tlv.TLVReader|None: Reader of the network layer value
+        """
+
         if data is not None:
             # Data must be bytes type
             if isinstance(data, bytes):
-                # Data must be 3 bytes at a minimum
-                data_length = len(data)
-                if data_length >= 3:
-                    tag_bytes = data[0:1]
-                    tag = int.from_bytes(tag_bytes, 'big')
-                    length_bytes = data[1:3]
-                    length = int.from_bytes(length_bytes, 'big')
-                    data = data[3:3+length]
-
-                    if tag == DataType.DEVICE:
-                        return data
+                reader = tlv.TLVReader(data)
+                if reader.read():
+                    if reader.tag == DataType.DEVICE:
+                        return reader.nested()
 
                     else:
-                        logger.debug("Unknown data type - {}: {}".format(tag, str(data)))
+                        logger.debug("Unknown data type - {}: {}".format(reader.tag, str(data)))
                 else:
-                    logger.debug("Invalid data length - {}: {}".format(data_length, str(data)))
+                    logger.debug("Invalid data length - {}: {}".format(len(data), str(data)))
 
             else:
                 logger.error("Invalid data type: {}".format(str(data)))
@@ -205,115 +262,169 @@ class Manager(object):
             raise DataLinkRealisationConnectionException()
 
         try:
-            return self.__rx.get_nowait()
+            return self.__rx.get_many(BATCH_SIZE)
 
         except queue.Empty:
             pass
 
-        return None
+        return []
 
-    def __put_data(self, data):
+    def __process_outbound(self):
         """
-        Put data
-
-        :param data:
-        :return bool:
+        Process outbound data queue
         """
 
-        try:
-            self.__inbound_queue.put_nowait(data)
-        except queue.Full:
-            return False
-        return True
+        while self.__run_event.is_set():
+            try:
+                items = self.__outbound_queue.get_many(BATCH_SIZE)
 
-    def __process_outbound(self):
+            except queue.Empty:
+                continue
+
+            for data in items:
+                logger.debug('Sending data: {}'.format(data))
+                # Only a blocking Uhost queue is waited for, the other
+                # overflow policies have counted the lost item
+                while (not self.__process_outbound_item(data, True) and
+                       self.__overflow == queue.OVERFLOW_BLOCK and
+                       self.__run_event.is_set()):
+                    pass
+
+        logger.info("Stopping outbound processing..")
+
+    async def __process_outbound_task(self):
         """
-        Process outbound data queue
+        Process outbound data queue coroutine
         """
 
         while self.__run_event.is_set():
-            try:
-                data = self.__outbound_queue.get_nowait()
+            for data in await self.__outbound_queue.aget_many(BATCH_SIZE):
                 logger.debug('Sending data: {}'.format(data))
-                data_type = data[0]
-                data = data[1]
-                if DataType.validate(data_type):
-                    try:
-                        if (data_type == DataType.DEVICE):
-                            self.__process_outbound_transport(data_type, data)
-                        elif (data_type == DataType.UHOST and
-                              self.__uhost_status == ManagerConnectionStatus.SUCCESS):
-                            while not self.__uhost_connection.send(data):
-                                pass
-                        else:
-                            logger.debug("Manager has no active status connections !")
-
-                    except UtimConnectionInvalidDataException:
-                        pass
-                    except UtimDeviceInvalidDataException:
-                        pass
+                while not self.__process_outbound_item(data):
+                    # Let Uhost connection publish its queue
+                    await self.__runtime.sleep(0)
+
+    def __process_outbound_item(self, data, block=False):
+        """
+        Process outbound item
+
+        :param list data: [DataType, data]
+        :param bool block: Wait for room in the Uhost queue until it is closed
+        :return bool: False - if Uhost connection is busy and item must be retried
+        """
+
+        data_type = data[0]
+        data = data[1]
+        if DataType.validate(data_type):
+            try:
+                if (data_type == DataType.DEVICE):
+                    self.__process_outbound_transport(data_type, data)
+                elif (data_type == DataType.UHOST and
+                      self.__uhost_status == ManagerConnectionStatus.SUCCESS):
+                    return self.__uhost_connection.send(data, block)
                 else:
-                    logger.debug("Unknown data type - {}: {}".format(data_type, str(data)))
+                    logger.debug("Manager has no active status connections !")
 
-            except queue.Empty:
+            except UtimConnectionInvalidDataException:
+                logger.error('Invalid Uhost data dropped: {}'.format(type(data)))
+            except UtimDeviceInvalidDataException:
                 pass
+        else:
+            logger.debug("Unknown data type - {}: {}".format(data_type, str(data)))
 
-        logger.info("Stopping outbound processing..")
+        return True
 
     def __process_outbound_transport(self, destination, data):
         logger.debug('Transport Send data {}'.format(data))
-        try:
-            # Assemble packet
-            dest = destination.to_bytes(1, 'big')
-            length = len(data).to_bytes(2, 'big')
-            packet = dest + length + data
 
-            # sending to DEVICE by default
-            tag = DataType.DEVICE
-            self.__process_outbound_network(tag, packet)
+        # sending to DEVICE by default
+        return self.__process_outbound_network(DataType.DEVICE, destination, data)
 
-        except queue.Empty:
-            pass
-
-    def __process_outbound_network(self, destination, data):
+    def __process_outbound_network(self, destination, transport_destination, data):
         logger.debug('Network Send data {}'.format(data))
         if DataType.validate(destination):
-            if isinstance(data, bytes):
-                length = len(data).to_bytes(2, 'big')
-                dest = destination.to_bytes(1, 'big')
-                packet = dest + length + data
-                self.__process_outbound_datalink(packet)
+            if isinstance(data, (bytes, bytearray)):
+                # Both headers and the data are written into one reused buffer
+                frame = self.__frame_writer.wrap((destination, transport_destination), data)
+                return self.__process_outbound_datalink(frame)
+        return True
 
     def __process_outbound_datalink(self, message):
         logger.debug('Datalink Send data {}'.format(message))
-        if type(message) is not bytes:
+        if not isinstance(message, (bytes, memoryview)):
             raise DataLinkRealisationWrongArgsException()
         if self.__tx is None:
             raise DataLinkRealisationConnectionException()
 
+        # The ring buffer and the stream copy the frame out, other queues keep the object
+        if (isinstance(message, memoryview) and
+                not isinstance(self.__tx, (ringbuffer.RingBuffer, framer.StreamLink))):
+            message = bytes(message)
+
         try:
             self.__tx.put_nowait(message)
 
         except queue.Full:
             return False
 
+        except ValueError as ex:
+            # The frame never fits into the datalink buffer, a retry is useless
+            logger.error('Datalink frame dropped: {}'.format(ex))
+
         return True
 
-    def receive(self):
+    def receive(self, timeout=QUEUE_TIMEOUT):
         """
         Receive method
 
+        :param timeout: Seconds to wait for data, None - wait forever
         :return bytes|None: Data
         """
 
         try:
-            return self.__inbound_queue.get_nowait()
+            return self.__inbound_queue.get(timeout=timeout)
 
         except queue.Empty:
             pass
 
         return None
 
+    async def receive_async(self):
+        """
+        Receive coroutine, waits for data
+
+        :return bytes: Data
+        """
+
+        return await self.__inbound_queue.aget()
+
+    def receive_many(self, max_items=BATCH_SIZE, timeout=QUEUE_TIMEOUT):
+        """
+        Receive all queued data up to max_items
+
+        :param int max_items: Maximum number of items
+        :param timeout: Seconds to wait for the first item, None - wait forever
+        :return list: Data, empty if nothing is received in time
+        """
+
+        try:
+            return self.__inbound_queue.get_many(max_items, timeout=timeout)
+
+        except queue.Empty:
+            pass
+
+        return []
+
+    async def receive_many_async(self, max_items=BATCH_SIZE):
+        """
+        Receive coroutine, waits for data and returns all queued data up to max_items
+
+        :param int max_items: Maximum number of items
+        :return list: Data
+        """
+
+        return await self.__inbound_queue.aget_many(max_items)
+
     def send(self, data):
         """
         Send method
@@ -336,28 +447,49 @@ class Manager(object):
         else:
             raise ManagerDataTypeException()
 
-    def run_uhost_connection(self, config):
+    def get_queue_stats(self):
+        """
+        Get statistics of Manager and Uhost connection queues
+
+        :return dict: Statistics by queue name
+        """
+
+        stats = {
+            'inbound': self.__inbound_queue.stats(),
+            'outbound': self.__outbound_queue.stats()
+        }
+        if self.__uhost_connection:
+            stats['uhost'] = self.__uhost_connection.get_queue_stats()
+
+        return stats
+
+    def run_uhost_connection(self, config, connection=None):
         """
         Run uhost connection in another thread
 
         :param dict config: Config of uhost connection
+        :param connection: Connection to run instead of the UtimConnection of
+                           the config, it has the UtimConnection methods
         """
 
         try:
-            # Get values
-            topic = config['topic']
-            name = config['name']
-            protocol = config['protocol']
-
             # Establish connection
-            self.__uhost_connection = utim_connection.UtimConnection(
-                topic,
-                name,
-                protocol
-            )
+            if connection is None:
+                connection = utim_connection.UtimConnection(
+                    config['topic'],
+                    config['name'],
+                    config['protocol']
+                )
+            self.__uhost_connection = connection
             self.__uhost_connection.connect()
             self.__uhost_connection.run()
 
+            # Uhost connection is waited for apart from the datalink
+            self.__uhost_inbound_task = self.__runtime.start(
+                self.__process_inbound_uhost,
+                self.__process_inbound_uhost_task
+            )
+
             # Return result
 
             self.__uhost_status = ManagerConnectionStatus.SUCCESS
@@ -384,7 +516,15 @@ class Manager(object):
         if self.__run_event:
             self.__run_event.clear()
 
-        if self.__inbound_thread:
-            self.__inbound_thread.exit()
-        if self.__outbound_thread:
-            self.__outbound_thread.exit()
+        if self.__uhost_connection:
+            self.__uhost_connection.stop()
+
+        # Wake the loops blocked on the queues
+        self.__inbound_queue.close()
+        self.__outbound_queue.close()
+        if self.__rx is not None:
+            self.__rx.close()
+
+        self.__runtime.stop(self.__inbound_thread)
+        self.__runtime.stop(self.__outbound_thread)
+        self.__runtime.stop(self.__uhost_inbound_task)
@@ -4,12 +4,10 @@ Utim Connection module
 This module implements Utim connection and messaging through the MQTT or AMQP
 """
 
-import utime as time
 import logging
 import queue
-import _thread
 import event
-from ..utilities import connmanager, config
+from ..utilities import connmanager, config, runtime
 import ubinascii
 
 logger = logging.Logger('connectivity.top.uhost.utim_connection')
@@ -41,8 +39,11 @@ class UtimConnection(object):
         Initialize MQTT connection
         """
 
-        self.__inbound_queue = queue.Queue()  # Queue for inbound data
-        self.__outbound_queue = queue.Queue()  # Queue for outbound data
+        self.__config = config.Config()
+        self.__runtime = runtime.get_runtime()
+
+        self.__inbound_queue = self.__runtime.queue(**self.__config.queue)  # Queue for inbound data
+        self.__outbound_queue = self.__runtime.queue(**self.__config.queue)  # Queue for outbound data
         self.__topic = topic
         self.__utim_name = name
         self.__type = type
@@ -54,8 +55,6 @@ class UtimConnection(object):
         # Run event
         self.__run_event = event.Event()
 
-        self.__config = config.Config()
-
     def connect(self):
         """
         Establish connection
@@ -69,27 +68,29 @@ class UtimConnection(object):
         Stop
         """
 
+        if self.__run_event:
+            self.__run_event.clear()
+
         if self.__client:
             self.__client.disconnect()
 
-        if self.__run_event:
-            self.__run_event.clear()
+        # Wake the threads blocked on the queues
+        self.__inbound_queue.close()
+        self.__outbound_queue.close()
 
-        if self.__run2_thread:
-            self.__run2_thread.exit()
+        self.__runtime.stop(self.__run2_thread)
 
     def run(self):
         """
         Run subscribe and publish to MQTT-broker
         """
 
-        logger.info("Try to run in another thread")
         self.__run_event.set()
 
         logger.info('Starting THREAD_UTIM_CONNECTION_RUN')
-        self.__run2_thread = _thread.start_new_thread(
+        self.__run2_thread = self.__runtime.start(
             self.__run2,
-            ()
+            self.__run2_task
         )
         # name='THREAD_UTIM_CONNECTION_RUN'
         # self.__run2_thread.daemon = True
@@ -97,8 +98,7 @@ class UtimConnection(object):
 
     def __run2(self):
         """
-        Run listening and writing to Serial port
-        Use it in another thread.
+        Run publishing thread, it publishes messages as soon as they are queued
         """
 
         # Subscribe to topic
@@ -108,30 +108,52 @@ class UtimConnection(object):
         logger.info("Start Running")
         while self.__run_event.is_set():
             self.__publish()
-            time.sleep(1)
 
         logger.info("Stopping processing..")
 
+    async def __run2_task(self):
+        """
+        Run publishing coroutine, it publishes messages as soon as they are queued
+        """
+
+        # Subscribe to topic
+        self.__client.subscribe(self.__topic, self, self._on_message)
+        logger.debug("Subscribed to topic: {}".format(self.__topic))
+
+        logger.info("Start Running")
+        while self.__run_event.is_set():
+            for message in await self.__outbound_queue.aget_many(self.__outbound_queue.maxsize):
+                self.__publish_message(message)
+
     def __publish(self):
         """
-        Publish
+        Publish queued messages, waiting for them until the queue is closed
         """
 
-        while not self.__outbound_queue.empty():
-            try:
-                message = self.__outbound_queue.get_nowait()
-                logger.debug("Publish item: {}".format(message))
-
-                destination = ubinascii.unhexlify(self.__config.uhost_name)
-                logger.debug("Message: {}".format(message))
-                logger.debug("Type message: {}".format(type(message)))
-                self.__client.publish(self.__utim_name.encode(), destination.decode(), message)
-                logger.debug("Message {} was published to {}".format(
-                    str(destination),
-                    str(message)))
-
-            except queue.Empty:
-                pass
+        try:
+            messages = self.__outbound_queue.get_many(self.__outbound_queue.maxsize)
+        except queue.Empty:
+            return
+
+        for message in messages:
+            self.__publish_message(message)
+
+    def __publish_message(self, message):
+        """
+        Publish single message to Uhost
+
+        :param bytes message: The message
+        """
+
+        logger.debug("Publish item: {}".format(message))
+
+        destination = ubinascii.unhexlify(self.__config.uhost_name)
+        logger.debug("Message: {}".format(message))
+        logger.debug("Type message: {}".format(type(message)))
+        self.__client.publish(self.__utim_name.encode(), destination.decode(), message)
+        logger.debug("Message {} was published to {}".format(
+            str(destination),
+            str(message)))
 
     def _on_message(self, conn, sender, message):
         """
@@ -146,23 +168,26 @@ class UtimConnection(object):
         """
         # This log message causes the thing to crash because of the stack overflow =__=
         # logger.info("Received message {0} from {1}".format(message, sender))
-        while not self.__put_data(message):
-            pass
+        if self.__runtime.name == runtime.RUNTIME_ASYNCIO:
+            # The callback is called by a coroutine and can not wait for a free slot
+            try:
+                self.__inbound_queue.put_nowait(message)
+            except queue.Full:
+                logger.error("Inbound queue is full, message is lost")
+        else:
+            self.__inbound_queue.put_many_until([message], self.__run_event)
 
-    def __put_data(self, data):
+    def get_queue_stats(self):
         """
-        Put data
+        Get queue statistics
 
-        :param data:
-        :return bool:
+        :return dict: Statistics by queue name
         """
 
-        try:
-            self.__inbound_queue.put_nowait(data)
-        except queue.Full:
-            return False
-
-        return True
+        return {
+            'inbound': self.__inbound_queue.stats(),
+            'outbound': self.__outbound_queue.stats()
+        }
 
     def receive(self):
         """
@@ -179,18 +204,56 @@ class UtimConnection(object):
 
         return None
 
-    def send(self, data):
+    async def receive_async(self):
+        """
+        Receive coroutine, waits for data
+
+        :return bytes: Data
+        """
+
+        return await self.__inbound_queue.aget()
+
+    def receive_many(self, max_items, timeout=0):
+        """
+        Receive all queued data up to max_items
+
+        :param int max_items: Maximum number of items
+        :param timeout: Seconds to wait for the first item, 0 - do not wait,
+                        None - wait forever
+        :return list: Data, empty if nothing is received in time
+        """
+
+        try:
+            return self.__inbound_queue.get_many(max_items, timeout != 0, timeout)
+        except queue.Empty:
+            pass
+
+        return []
+
+    async def receive_many_async(self, max_items):
+        """
+        Receive coroutine, waits for data and returns all queued data up to max_items
+
+        :param int max_items: Maximum number of items
+        :return list: Data
+        """
+
+        return await self.__inbound_queue.aget_many(max_items)
+
+    def send(self, data, block=False):
         """
         Send method
 
-        :param bytes data: Data to send
+        :param bytes|bytearray data: Data to send
+        :param bool block: Wait for room in the queue until it is closed
         :return bool: True if data is sent, False - otherwise
         :raise: UtimConnectionInvalidDataException
         """
 
-        if isinstance(data, bytes):
+        # Sealed envelopes are bytearrays, written in place by CryptoLayer
+        if isinstance(data, (bytes, bytearray)):
             try:
-                self.__outbound_queue.put_nowait(data)
+                self.__outbound_queue.put(data, block)
                 return True
 
             except queue.Full:
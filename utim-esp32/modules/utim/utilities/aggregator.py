@@ -0,0 +1,145 @@
+"""
+Aggregator module
+
+Device readings for the platform are collected into batches, so a batch is
+sent, acknowledged and secured once instead of every reading. A batch is
+the DATA_BATCH record of DATA_TO_PLATFORM records of the readings:
+
+    [DATA_BATCH][length][DATA_TO_PLATFORM][length][reading]...
+
+It is sent when it reaches the maximum number of readings or bytes, or when its
+first reading has waited the linger time. The receiver splits a batch into the
+readings with unpack().
+"""
+
+import event
+import logging
+from .tag import Tag
+from .tlv import TLVReader, HEADER_LENGTH
+from . import timers
+
+logger = logging.Logger('utilities.aggregator')
+
+_DATA_BATCH = ord(Tag.OUTBOUND.DATA_BATCH)
+_DATA_TO_PLATFORM = ord(Tag.INBOUND.DATA_TO_PLATFORM)
+
+
+class Aggregator(object):
+    """
+    Batch of platform data
+    """
+
+    def __init__(self, on_flush, linger_ms=100, max_bytes=1024, max_count=16):
+        """
+        :param on_flush: Function of a batch sent by the linger timer
+        :param int linger_ms: Milliseconds the first reading waits for more readings
+        :param int max_bytes: Maximum batch size in bytes, headers included
+        :param int max_count: Maximum number of readings in a batch
+        """
+
+        self.linger_ms = linger_ms
+        self.max_bytes = max_bytes
+        self.max_count = max_count
+        self.__on_flush = on_flush
+        self.__readings = []
+        # Batch size in bytes
+        self.__length = HEADER_LENGTH
+        self.__timer = None
+        self.__lock = event.Lock()
+
+    def enabled(self):
+        """
+        :return bool: False - if readings are configured to be sent one by one
+        """
+
+        return self.max_count > 1 and self.linger_ms > 0
+
+    def add(self, data):
+        """
+        Add reading
+
+        :param bytes data: Reading
+        :return bytearray|None: Batch ready to send, None - if the batch is
+                                not full, the linger timer sends it then
+        """
+
+        batch = None
+        with self.__lock:
+            length = HEADER_LENGTH + len(data)
+            if self.__readings and self.__length + length > self.max_bytes:
+                # The reading starts the next batch
+                batch = self.__take()
+
+            self.__readings.append(data)
+            self.__length += length
+            if batch is None and (len(self.__readings) >= self.max_count or
+                                  self.__length >= self.max_bytes):
+                batch = self.__take()
+            elif self.__timer is None:
+                self.__timer = timers.get_timers().add(self.linger_ms, self.__flush)
+
+        return batch
+
+    def stop(self):
+        """
+        Drop the batch and the linger timer
+        """
+
+        with self.__lock:
+            if self.__timer:
+                self.__timer.cancel()
+                self.__timer = None
+            self.__readings = []
+            self.__length = HEADER_LENGTH
+
+    def __flush(self):
+        """
+        Send the batch, the linger timer callback
+        """
+
+        with self.__lock:
+            self.__timer = None
+            batch = self.__take() if self.__readings else None
+
+        if batch is not None:
+            self.__on_flush(batch)
+
+    def __take(self):
+        """
+        Assemble the batch and start a new one, the lock must be held
+
+        :return bytearray:
+        """
+
+        batch = Tag.OUTBOUND.assemble_batch(self.__readings)
+        logger.debug('Batch of {} readings, {} bytes'.format(len(self.__readings), len(batch)))
+        self.__readings = []
+        self.__length = HEADER_LENGTH
+        if self.__timer:
+            self.__timer.cancel()
+            self.__timer = None
+        return batch
+
+
+def unpack(data):
+    """
+    Split batch into readings
+
+    :param data: bytes, bytearray or memoryview
+    :return list|None: Readings, None - if data is not a whole batch
+    """
+
+    reader = TLVReader(data)
+    if not reader.read() or reader.tag != _DATA_BATCH or reader.remaining():
+        return None
+
+    readings = []
+    records = reader.nested()
+    while records.read():
+        if records.tag != _DATA_TO_PLATFORM:
+            return None
+        readings.append(records.value_bytes())
+
+    if records.remaining():
+        return None
+    return readings
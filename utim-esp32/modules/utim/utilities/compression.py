@@ -0,0 +1,187 @@
+"""
+Compression module
+
+Compression of messages before encryption. A compressed message is
+
+    [codec: 1 byte][original length: 2 bytes, big endian][compressed data]
+
+and the codec is CODEC_DEFLATE, raw deflate of zlib/uzlib, or CODEC_LZ, an LZSS
+variant for short messages where deflate headers and tables cost more than they
+save. Deflate is used only where zlib can compress, MicroPython uzlib can only
+decompress. Both codecs are always decompressed.
+"""
+
+import logging
+
+try:
+    import zlib
+except ImportError:
+    try:
+        import uzlib as zlib
+    except ImportError:
+        zlib = None
+
+logger = logging.Logger('utilities.compression')
+
+_ERRORS = (ValueError, IndexError, OSError)
+if hasattr(zlib, 'error'):
+    _ERRORS += (zlib.error,)
+
+CODEC_DEFLATE = 1
+CODEC_LZ = 2
+
+HEADER_LENGTH = 3
+
+# Messages shorter than this are compressed with LZ, deflate does not pay off
+_DEFLATE_MIN_LENGTH = 128
+# Raw deflate stream, no zlib header and checksum
+_DEFLATE_WBITS = -15
+
+# LZ match: 12 bits of distance, 4 bits of length
+_LZ_WINDOW = 4096
+_LZ_MIN_MATCH = 3
+_LZ_MAX_MATCH = _LZ_MIN_MATCH + 15
+
+_MAX_LENGTH = 0xFFFF
+
+
+def compress(message):
+    """
+    Compress message
+
+    :param message: bytes or bytearray
+    :return bytearray|None: Compressed message, None - if it is not shorter
+    """
+
+    length = len(message)
+    if not length or length > _MAX_LENGTH:
+        return None
+
+    data = None
+    if length >= _DEFLATE_MIN_LENGTH and hasattr(zlib, 'compressobj'):
+        codec = CODEC_DEFLATE
+        compressor = zlib.compressobj(9, zlib.DEFLATED, _DEFLATE_WBITS)
+        data = compressor.compress(message) + compressor.flush()
+    if data is None or len(data) >= length:
+        codec = CODEC_LZ
+        data = _lz_compress(message)
+    if len(data) + HEADER_LENGTH >= length:
+        return None
+
+    result = bytearray(HEADER_LENGTH + len(data))
+    result[0] = codec
+    result[1] = length >> 8
+    result[2] = length & 0xFF
+    result[HEADER_LENGTH:] = data
+    return result
+
+
+def decompress(message):
+    """
+    Decompress message, bytes after the compressed data are ignored
+
+    :param message: bytes, bytearray or memoryview
+    :return bytes|None: Message, None - if it is not a valid compressed message
+    """
+
+    if len(message) < HEADER_LENGTH:
+        return None
+    codec = message[0]
+    length = message[1] << 8 | message[2]
+    try:
+        if codec == CODEC_DEFLATE and zlib is not None:
+            result = zlib.decompress(bytes(message[HEADER_LENGTH:]), _DEFLATE_WBITS)
+        elif codec == CODEC_LZ:
+            result = _lz_decompress(message, HEADER_LENGTH, length)
+        else:
+            logger.error('Unknown codec: {}'.format(codec))
+            return None
+    except _ERRORS as ex:
+        logger.error('Invalid compressed message: {}'.format(ex))
+        return None
+
+    if result is None or len(result) != length:
+        logger.error('Invalid compressed message length')
+        return None
+    return result
+
+
+def _lz_compress(message):
+    """
+    LZSS compression, a flag byte precedes every 8 tokens, bit set - match of
+    2 bytes [distance - 1: 12 bits][length - 3: 4 bits], bit clear - literal
+
+    :return bytearray:
+    """
+
+    out = bytearray()
+    # Last position of every 3 bytes sequence
+    positions = {}
+    length = len(message)
+    index = 0
+    flags_at = 0
+    bit = 8
+    while index < length:
+        if bit == 8:
+            flags_at = len(out)
+            out.append(0)
+            bit = 0
+
+        best = 0
+        distance = 0
+        if index + _LZ_MIN_MATCH <= length:
+            key = bytes(message[index:index + _LZ_MIN_MATCH])
+            start = positions.get(key)
+            positions[key] = index
+            if start is not None and index - start <= _LZ_WINDOW:
+                limit = min(_LZ_MAX_MATCH, length - index)
+                best = _LZ_MIN_MATCH
+                while best < limit and message[start + best] == message[index + best]:
+                    best += 1
+                distance = index - start
+
+        if best:
+            out[flags_at] |= 1 << bit
+            code = (distance - 1) << 4 | (best - _LZ_MIN_MATCH)
+            out.append(code >> 8)
+            out.append(code & 0xFF)
+            for position in range(index + 1, min(index + best, length - _LZ_MIN_MATCH + 1)):
+                positions[bytes(message[position:position + _LZ_MIN_MATCH])] = position
+            index += best
+        else:
+            out.append(message[index])
+            index += 1
+        bit += 1
+
+    return out
+
+
+def _lz_decompress(message, offset, length):
+    """
+    LZSS decompression
+
+    :return bytes|None:
+    """
+
+    out = bytearray()
+    end = len(message)
+    while len(out) < length and offset < end:
+        flags = message[offset]
+        offset += 1
+        for bit in range(8):
+            if len(out) >= length or offset >= end:
+                break
+            if flags & (1 << bit):
+                code = message[offset] << 8 | message[offset + 1]
+                offset += 2
+                start = len(out) - (code >> 4) - 1
+                if start < 0:
+                    return None
+                # Byte by byte, the match may overlap the bytes it produces
+                for position in range(start, start + (code & 0x0F) + _LZ_MIN_MATCH):
+                    out.append(out[position])
+            else:
+                out.append(message[offset])
+                offset += 1
+
+    return bytes(out)
@@ -6,5 +6,39 @@ class Config(object):
         self.mqtt = {'host': '192.168.0.12',
                      'user': 'test',
                      'pass': 'test',
-                     'reconnect_time': 60}
+                     'reconnect_time': 60,
+                     'keepalive': 0}
         self.protocol = 'mqtt'
+        # Size in bytes of the datalink rx/tx frame buffers
+        self.datalink = {'buffer_size': 4096}
+        # Loops runtime: 'thread' - thread per loop, 'asyncio' - single event loop
+        self.runtime = 'thread'
+        # Size and overflow policy of the internal queues (see queue.OVERFLOW_*)
+        self.queue = {'maxsize': 32,
+                      'overflow': 'block'}
+        # Number of item processing workers, items of one source are always
+        # processed by the same worker in order. There are three sources
+        # (device, Uhost and platform), more workers are not started
+        self.process = {'workers': 2}
+        # Batching of device data to the platform: a batch is sent when it has
+        # 'max_count' readings or 'max_bytes' bytes, or 'linger_ms' milliseconds
+        # after its first reading. max_count 1 sends every reading alone
+        self.aggregation = {'linger_ms': 100,
+                            'max_bytes': 1024,
+                            'max_count': 1}
+        # Compress messages to Uhost before encryption, Uhost must accept
+        # CryptoLayer.CRYPTO_MODE_AES_COMPRESSED
+        self.compression = False
+        # Cipher of messages to Uhost: 'cbc' - AES-CBC, 'ctr' - AES-CTR stream
+        # without padding, Uhost must accept CryptoLayer.CRYPTO_MODE_AES_CTR.
+        # Compression applies to 'cbc'
+        self.cipher = 'cbc'
+        # Longest envelope from Uhost in bytes, longer ones are rejected before
+        # the crypto work, None - no limit
+        self.max_message_length = 4096
+        # Crypto primitives backend (see utilities/crypto_backend.py): 'backend'
+        # None - the fastest correct one, or the name of the one to prefer;
+        # 'cache' - absolute path of the file of the throughput measurements,
+        # None - measure at every start
+        self.crypto = {'backend': None,
+                       'cache': '/crypto_backend.json'}
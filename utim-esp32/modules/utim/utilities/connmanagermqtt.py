@@ -1,13 +1,23 @@
 """ConnManagerMQTT containing script"""
-import _thread
-import utime as time
 import random
 import logging
 from .uconn_umqtt import UConnUMQTT as UConnMQTT
 from . import exceptions
+from . import timers
 
 logger = logging.Logger('utilities.connmanagermqtt')
 
+# Milliseconds to wait for the ack before the message is published again
+_REPUBLISH_DELAY_MS = 10000
+# Milliseconds between the next republishes
+_REPUBLISH_PERIOD_MS = 5000
+# Latest message ids of a sender remembered to drop republished duplicates,
+# the bitmap of the window stays a small int of MicroPython
+_DEDUP_WINDOW = 30
+# Senders with a dedup window, the least recently heard one is forgotten
+_DEDUP_SENDERS = 8
+_ID_MODULO = 65536
+
 
 class ConnManagerMQTT(object):
     """
@@ -17,17 +27,24 @@ class ConnManagerMQTT(object):
     _SENDER = 'sender'
     _DESTINATION = 'destination'
     _MESSAGE = 'message'
+    _TIMER = 'timer'
 
     def __init__(self):
         """
         Initialization of ConnManager
         """
         logger.info('Initializing ConnmanagerMQTT')
+        self.__timers = timers.get_timers()
         self.__connection = UConnMQTT()
         self.__message_number = random.randint(0, 65536)
         self.__sent_messages = dict()
         self.__callback = None
         self.__callback_object = None
+        # Dedup windows of the senders: sender -> [latest id, bitmap], bit n
+        # is set if the id n before the latest one was received
+        self.__windows = dict()
+        # Senders of the windows, the most recently heard last
+        self.__window_senders = []
 
     def disconnect(self):
         """
@@ -35,6 +52,9 @@ class ConnManagerMQTT(object):
         """
         logger.info('Disconnecting...')
         self.__connection.disconnect()
+        for message in self.__sent_messages.values():
+            message[self._TIMER].cancel()
+        self.__sent_messages.clear()
 
     def subscribe(self, topic, callback_object, callback):
         """
@@ -72,33 +92,28 @@ class ConnManagerMQTT(object):
         out_message = b'\x01' + id.to_bytes(2, 'big') + message
         logger.info("Publishing {} to topic {}".format(message, destination))
         self.__connection.publish(sender, destination, out_message)
+        # The timer only hands the republish over to the connection loop
+        timer = self.__timers.add(_REPUBLISH_DELAY_MS, self.__connection.call_soon,
+                                  (self._republish, (id,)), period=_REPUBLISH_PERIOD_MS)
         self.__sent_messages[id] = {self._SENDER: sender,
                                     self._DESTINATION: destination,
-                                    self._MESSAGE: message}
-
-        logger.info('Starting THREAD_PUBLISH')
-        _thread.start_new_thread(self._republish, (id,))
+                                    self._MESSAGE: message,
+                                    self._TIMER: timer}
 
     def _republish(self, id):
         """
-        Check if message was delivered and republish if not
+        Republish message which was not delivered, run by the connection loop
+        on the republish timer
 
         :param id: Message ID
         """
-        logger.info("_publish for {0} started".format(id))
-        time.sleep(10)
-        while id in self.__sent_messages.keys():
-            try:
-                logger.info("Message {0} wasn\'t delivered".format(id))
-                message = self.__sent_messages[id]
-                self.__connection.publish(message[self._SENDER], message[self._DESTINATION],
-                                          b'\x01' + id.to_bytes(2, 'big') + message[self._MESSAGE])
-                time.sleep(5)
-            except KeyError:
-                logger.error("Message was already deleted from republish")
-                break
-
-        logger.info("Message {0} was delivered".format(id))
+        message = self.__sent_messages.get(id)
+        if message is None:
+            logger.error("Message was already deleted from republish")
+            return
+        logger.info("Message {0} wasn\'t delivered".format(id))
+        self.__connection.publish(message[self._SENDER], message[self._DESTINATION],
+                                  b'\x01' + id.to_bytes(2, 'big') + message[self._MESSAGE])
 
     def _on_message(self, sender, message):
         """
@@ -116,11 +131,64 @@ class ConnManagerMQTT(object):
                     logger.info('Received ack, deleting message from sent')
                     id = int.from_bytes(message[1:3], 'big')
                     if id in self.__sent_messages.keys():
-                        self.__sent_messages.pop(id)
+                        self.__sent_messages.pop(id)[self._TIMER].cancel()
+                        logger.info("Message {0} was delivered".format(id))
                 except KeyError:
                     logger.error("Message was already deleted from republish")
             else:
                 logger.info('Received message, sending ack...')
                 ack_message = b'\x02' + message[1:3]
                 self.__connection.publish(b'ack', sender.decode(), ack_message)
+                # A duplicate means the ack was lost, it is acked again but
+                # not processed
+                id = int.from_bytes(message[1:3], 'big')
+                if self.__is_duplicate(sender, id):
+                    logger.info("Message {0} is a duplicate, dropping".format(id))
+                    return
                 self.__callback(self.__callback_object, sender, message[3:])
+
+    def __is_duplicate(self, sender, id):
+        """
+        Check message id in the dedup window of sender and record it there.
+        Ids older than the window are taken as new, the sender may have
+        restarted its numbering
+
+        :param sender: Message sender
+        :param int id: Message ID
+        :return bool: True - if the id was received already
+        """
+        if sender in self.__window_senders:
+            self.__window_senders.remove(sender)
+        elif len(self.__window_senders) >= _DEDUP_SENDERS:
+            del self.__windows[self.__window_senders.pop(0)]
+        self.__window_senders.append(sender)
+
+        window = self.__windows.get(sender)
+        if window is None:
+            self.__windows[sender] = [id, 1]
+            return False
+        latest, bitmap = window
+        ahead = (id - latest) % _ID_MODULO
+        behind = (latest - id) % _ID_MODULO
+        if ahead == 0:
+            return True
+        if ahead < _ID_MODULO // 2:
+            # Newer id, the window slides forward
+            if ahead < _DEDUP_WINDOW:
+                # Bits leaving the window are cleared before the shift
+                bitmap = (bitmap & ((1 << (_DEDUP_WINDOW - ahead)) - 1)) << ahead | 1
+            else:
+                bitmap = 1
+            window[0] = id
+            window[1] = bitmap
+            return False
+        if behind < _DEDUP_WINDOW:
+            # Older id, a duplicate or one delivered out of order
+            if bitmap & (1 << behind):
+                return True
+            window[1] = bitmap | (1 << behind)
+            return False
+        # Older than the window, the sender numbers anew
+        window[0] = id
+        window[1] = 1
+        return False
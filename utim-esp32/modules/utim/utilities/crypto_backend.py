@@ -0,0 +1,334 @@
+"""
+Crypto backend registry
+
+CryptoLayer and srp take their primitives from the installed backend instead of
+importing the modules implementing them:
+
+    'sha256' - hash class, sha256([data]) with update() and digest()
+    'hmac'   - HMAC-SHA256 class, hmac(key) with the interface of chmac.HMAC
+    'aes'    - AES class, aes(key, mode, IV) of ucryptolib
+
+The registered backends, in the order of preference on equal throughput:
+
+    'native'  - uhashlib, chmac and ucryptolib, the C modules of the firmware
+                or the shims of host/
+    'python'  - pure Python sha256 of micropython-lib hashlib and HMAC over it
+    'cpython' - hashlib and hmac of CPython, runs on a host only
+
+A backend provides the primitives it can import. select() checks each of them
+against known answers and measures its throughput, every primitive is installed
+from the fastest correct backend. The measurements are cached in a file keyed by
+the interpreter and the firmware build, so a board measures once per build.
+"""
+
+import sys
+import uos
+import utime
+import ubinascii
+import logging
+
+try:
+    import ujson as json
+except ImportError:
+    import json
+
+logger = logging.Logger('utilities.crypto_backend')
+
+PRIMITIVES = ('sha256', 'hmac', 'aes')
+
+# Microseconds of a throughput measurement
+_MEASURE_US = 20000
+
+_SHA256_BLOCK_LENGTH = 64
+_UCRYPTOLIB_MODE_CBC = 2
+# Message of the throughput measurements, a short Uhost message
+_DATA = bytes(range(64))
+_KEY = bytes(range(32))
+
+# Known answers: sha256 of b'abc', HMAC-SHA256 of RFC 4231 test case 2 and of
+# the same key and an empty message, AES-128 of FIPS-197 appendix C.1
+_SHA256_ABC = ubinascii.unhexlify('ba7816bf8f01cfea414140de5dae2223b00361a396177a9cb410ff61f20015ad')
+_HMAC_KEY = b'Jefe'
+_HMAC_MESSAGE = b'what do ya want for nothing?'
+_HMAC_DIGEST = ubinascii.unhexlify('5bdcc146bf60754e6a042426089575c75a003f089d2739839dec58b964ec3843')
+_HMAC_EMPTY_DIGEST = ubinascii.unhexlify('923598ca6d64af2a5dba79dcd021a8a0fe5c5f557519adaaf0ad532d4506dd30')
+_AES_KEY = ubinascii.unhexlify('000102030405060708090a0b0c0d0e0f')
+_AES_PLAIN = ubinascii.unhexlify('00112233445566778899aabbccddeeff')
+_AES_CIPHER = ubinascii.unhexlify('69c4e0d86a7b0430d8cdb78070b4c55a')
+_AES_IV = bytes(16)
+
+# Registered backends: (name, loader), the loader returns the primitives
+_backends = []
+# Installed primitives: name -> (backend name, constructor)
+_installed = {}
+
+
+def register(name, loader):
+    """
+    Register backend, select() considers it from then on
+
+    :param str name: Backend name
+    :param loader: Function returning dict of the primitives the backend can
+                   provide on this interpreter, name -> constructor
+    """
+    _backends.append((name, loader))
+
+
+def get(primitive):
+    """
+    Get constructor of the installed primitive, backends are selected without
+    a cache if select() was not called
+
+    :param str primitive: One of PRIMITIVES
+    :return: Constructor, None - if no backend provides the primitive
+    """
+    if not _installed:
+        select()
+    installed = _installed.get(primitive)
+    return installed[1] if installed is not None else None
+
+
+def installed():
+    """
+    :return dict: Name of the backend of every installed primitive
+    """
+    return dict((primitive, value[0]) for primitive, value in _installed.items())
+
+
+def select(backend=None, cache=None):
+    """
+    Check and measure the backends and install the fastest correct one of
+    every primitive
+
+    :param str backend: Backend to install wherever it is correct, the fastest
+                        one is installed by default
+    :param str cache: Path of the cache of the measurements, None - measure
+                      every time
+    :return dict: installed()
+    """
+    key = _interpreter()
+    cached = _read_cache(cache, key) if cache else None
+    rates = cached if cached is not None else {}
+    measured = False
+
+    providers = []
+    for name, loader in _backends:
+        try:
+            providers.append((name, loader()))
+        except ImportError as e:
+            logger.debug('Backend {} unavailable: {}'.format(name, e))
+
+    for primitive in PRIMITIVES:
+        primitive_rates = rates.setdefault(primitive, {})
+        best = None
+        for name, primitives in providers:
+            constructor = primitives.get(primitive)
+            if constructor is None:
+                continue
+            if not _check(primitive, constructor):
+                logger.warning('Backend {} fails {} check'.format(name, primitive))
+                continue
+            if name not in primitive_rates:
+                primitive_rates[name] = _measure(_OPERATIONS[primitive](constructor))
+                measured = True
+            if name == backend:
+                best = (name, constructor)
+                break
+            if best is None or primitive_rates[name] > primitive_rates[best[0]]:
+                best = (name, constructor)
+        if best is not None:
+            _installed[primitive] = best
+        else:
+            _installed.pop(primitive, None)
+            logger.error('No backend provides {}'.format(primitive))
+
+    logger.info('Crypto backends: {}, operations per second: {}'.format(installed(), rates))
+    if cache and measured:
+        _write_cache(cache, key, rates)
+    return installed()
+
+
+def _interpreter():
+    """
+    :return str: Key of the cached measurements
+    """
+    implementation = sys.implementation
+    key = '{} {} {}'.format(implementation.name,
+                            '.'.join(str(x) for x in implementation.version[:3]),
+                            sys.platform)
+    try:
+        # Firmware build
+        key += ' ' + uos.uname().version
+    except (AttributeError, OSError):
+        pass
+    return key
+
+
+def _read_cache(cache, key):
+    """
+    :return dict|None: Cached rates, None - if there are none of this interpreter
+    """
+    try:
+        with open(cache) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or data.get('key') != key:
+        return None
+    return data.get('rates')
+
+
+def _write_cache(cache, key, rates):
+    try:
+        with open(cache, 'w') as f:
+            json.dump({'key': key, 'rates': rates}, f)
+    except OSError as e:
+        logger.warning('Crypto backend cache not written: {}'.format(e))
+
+
+def _measure(operation):
+    """
+    :return int: Operations per second
+    """
+    operation()
+    count = 0
+    start = utime.ticks_us()
+    while True:
+        operation()
+        count += 1
+        elapsed = utime.ticks_diff(utime.ticks_us(), start)
+        if elapsed >= _MEASURE_US:
+            return count * 1000000 // elapsed
+
+
+def _check(primitive, constructor):
+    """
+    :return bool: True - if the primitive gives the known answers
+    """
+    try:
+        return _CHECKS[primitive](constructor)
+    except Exception as e:
+        logger.debug('{} check raised {}'.format(primitive, e))
+        return False
+
+
+def _check_sha256(sha256):
+    # srp needs no copy(), uhashlib of the firmware has none
+    hashed = sha256(b'a')
+    hashed.update(b'bc')
+    return hashed.digest() == _SHA256_ABC
+
+
+def _check_hmac(hmac):
+    keyed = hmac(_HMAC_KEY)
+    mac = keyed.copy()
+    mac.update(_HMAC_MESSAGE[:16])
+    mac.update(memoryview(_HMAC_MESSAGE)[16:])
+    return (mac.digest() == _HMAC_DIGEST and mac.digest() == _HMAC_DIGEST and
+            keyed.digest() == _HMAC_EMPTY_DIGEST)
+
+
+def _check_aes(aes):
+    return (aes(_AES_KEY, _UCRYPTOLIB_MODE_CBC, _AES_IV).encrypt(_AES_PLAIN) == _AES_CIPHER and
+            aes(_AES_KEY, _UCRYPTOLIB_MODE_CBC, _AES_IV).decrypt(_AES_CIPHER) == _AES_PLAIN)
+
+
+def _sha256_operation(sha256):
+    return lambda: sha256(_DATA).digest()
+
+
+def _hmac_operation(hmac):
+    # Per message work of CryptoLayer, the key pads are hashed once
+    keyed = hmac(_KEY)
+
+    def operation():
+        mac = keyed.copy()
+        mac.update(_DATA)
+        return mac.digest()
+
+    return operation
+
+
+def _aes_operation(aes):
+    return lambda: aes(_KEY, _UCRYPTOLIB_MODE_CBC, _AES_IV).encrypt(_DATA)
+
+
+_CHECKS = {'sha256': _check_sha256, 'hmac': _check_hmac, 'aes': _check_aes}
+_OPERATIONS = {'sha256': _sha256_operation, 'hmac': _hmac_operation, 'aes': _aes_operation}
+
+
+class _HMAC(object):
+    """
+    HMAC over a hash class with copy(), the interface of chmac.HMAC
+    """
+
+    def __init__(self, inner, outer):
+        """
+        :param inner: Hash of the inner key pad and the message so far
+        :param outer: Hash of the outer key pad, it is never updated
+        """
+        self.__inner = inner
+        self.__outer = outer
+
+    @classmethod
+    def new(cls, hash_class, key):
+        if len(key) > _SHA256_BLOCK_LENGTH:
+            key = hash_class(key).digest()
+        key = bytes(key) + bytes(_SHA256_BLOCK_LENGTH - len(key))
+        return cls(hash_class(bytes(x ^ 0x36 for x in key)),
+                   hash_class(bytes(x ^ 0x5c for x in key)))
+
+    def update(self, data):
+        self.__inner.update(data)
+
+    def digest(self):
+        outer = self.__outer.copy()
+        outer.update(self.__inner.digest())
+        return outer.digest()
+
+    def copy(self):
+        return _HMAC(self.__inner.copy(), self.__outer)
+
+
+def _native():
+    primitives = {}
+    try:
+        import uhashlib
+        primitives['sha256'] = uhashlib.sha256
+    except ImportError:
+        pass
+    try:
+        import chmac
+        primitives['hmac'] = chmac.HMAC
+    except (ImportError, AttributeError):
+        pass
+    try:
+        from ucryptolib import aes
+        primitives['aes'] = aes
+    except ImportError:
+        pass
+    return primitives
+
+
+def _python():
+    try:
+        from hashlib._sha256 import sha256
+    except ImportError:
+        # hashlib package of the frozen modules
+        from hashlib.hashlib._sha256 import sha256
+    return {'sha256': sha256,
+            'hmac': lambda key: _HMAC.new(sha256, key)}
+
+
+def _cpython():
+    if sys.implementation.name != 'cpython':
+        raise ImportError('not CPython')
+    import hashlib
+    import hmac
+    return {'sha256': hashlib.sha256,
+            'hmac': lambda key: hmac.new(bytes(key), digestmod=hashlib.sha256)}
+
+
+register('native', _native)
+register('python', _python)
+register('cpython', _cpython)
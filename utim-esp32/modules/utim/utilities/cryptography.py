@@ -1,9 +1,10 @@
 """Cryptography layer for Utim and Uhost"""
 
-from ucryptolib import aes
-import chmac
+import uos
 import logging
 from .tag import Tag
+from . import compression
+from . import crypto_backend
 
 logger = logging.Logger('utilities.cryptography')
 
@@ -18,19 +19,47 @@ class CryptoLayer(object):
 
     CRYPTO_MODE_NONE = b'\x00'
     CRYPTO_MODE_AES = b'\x01'
+    # AES of the message compressed by utilities.compression
+    CRYPTO_MODE_AES_COMPRESSED = b'\x02'
+    # AES-CTR stream: [nonce][cipher text], the cipher text is as long as
+    # the message, there is no padding
+    CRYPTO_MODE_AES_CTR = b'\x03'
 
+    UCRYPTOLIB_MODE_ECB = 1
     UCRYPTOLIB_MODE_CBC = 2
+    UCRYPTOLIB_MODE_CTR = 6
+
+    # Bytes ciphered and authenticated in a step of seal() and open(), whole
+    # AES blocks
+    SEAL_CHUNK_LENGTH = 256
+
+    # Reasons of rejecting envelope structure
+    REJECT_LENGTH = 'length'
+    REJECT_TAG = 'tag'
+    REJECT_MODE = 'mode'
+    REJECT_ALIGNMENT = 'alignment'
 
     __SIGN_SHA256_LENGTH = 32
+    __AES_BLOCK_LENGTH = 16
+    # Random part of the CTR initial counter, the rest is a 32-bit block counter
+    __CTR_NONCE_LENGTH = 12
     __iv = b'\x75\xbe\x38\x2b\x42\x51\xc7\x05\xa2\x43\x23\x5d\xe0\xf4\xb5\x08'
 
     def __init__(self, key):
         """
-        Initialization of CryptoLayer
+        Initialization of CryptoLayer, the crypto context of a session key.
+        Utim creates it when the key is set and the workers share it, so
+        the work depending only on the key is done once per session.
         For AES key must be 16, 24 or 32 bytes
         """
-        logger.info('Creating new layer with key {}'.format(key))
+        logger.debug('Creating new layer, keyed: {}'.format(key is not None))
         self.__key = key
+        # Primitives of the installed crypto backend
+        self.__aes = crypto_backend.get('aes')
+        # HMAC with the key pads hashed, copied for every message
+        self.__hmac = crypto_backend.get('hmac')(key) if key is not None else None
+        # True - if ucryptolib has MODE_CTR, None - if it is not known yet
+        self.__native_ctr = None
 
     @staticmethod
     def is_secured(message):
@@ -45,13 +74,67 @@ class CryptoLayer(object):
                 return True
         return False
 
+    @classmethod
+    def check_structure(cls, message, keyed, max_length=None):
+        """
+        Check signed and encrypted envelope structure before any crypto work,
+        the envelope is [SIGNED][mode][ENCRYPTED][mode][data][signature]
+
+        :param message: Envelope
+        :param bool keyed: True - if the session key is set, the envelope must
+                           be signed and encrypted then, else it must be plain
+        :param int max_length: Longest envelope accepted, None - no limit
+        :return str|None: REJECT_* reason, None - if the envelope may be valid
+        """
+        length = len(message)
+        if length < 4 or (max_length is not None and length > max_length):
+            return cls.REJECT_LENGTH
+        if message[0:1] != Tag.CRYPTO.SIGNED or message[2:3] != Tag.CRYPTO.ENCRYPTED:
+            return cls.REJECT_TAG
+
+        sign_mode = message[1:2]
+        crypto_mode = message[3:4]
+        if not keyed:
+            if sign_mode != cls.SIGN_MODE_NONE or crypto_mode != cls.CRYPTO_MODE_NONE:
+                return cls.REJECT_MODE
+            return None
+
+        if (sign_mode != cls.SIGN_MODE_SHA256 or
+                crypto_mode not in (cls.CRYPTO_MODE_AES, cls.CRYPTO_MODE_AES_COMPRESSED,
+                                    cls.CRYPTO_MODE_AES_CTR)):
+            return cls.REJECT_MODE
+        cipher_length = length - 4 - cls.__SIGN_SHA256_LENGTH
+        if crypto_mode == cls.CRYPTO_MODE_AES_CTR:
+            # Headers, the nonce and the signature, the message may be empty
+            if cipher_length < cls.__CTR_NONCE_LENGTH:
+                return cls.REJECT_LENGTH
+            return None
+        # Headers, one block at least and the signature
+        if cipher_length < cls.__AES_BLOCK_LENGTH:
+            return cls.REJECT_LENGTH
+        if cipher_length % cls.__AES_BLOCK_LENGTH:
+            return cls.REJECT_ALIGNMENT
+        return None
+
     def encrypt(self, mode, message):
         """
         Encrypt message
         """
         if self.__key is not None and mode != self.CRYPTO_MODE_NONE:
-            if mode == self.CRYPTO_MODE_AES:
-                cipher = aes(self.__key, self.UCRYPTOLIB_MODE_CBC, self.__iv)
+            if mode == self.CRYPTO_MODE_AES_CTR:
+                nonce = uos.urandom(self.__CTR_NONCE_LENGTH)
+                start = 2 + self.__CTR_NONCE_LENGTH
+                # The cipher writes the cipher text in place after the headers
+                envelope = bytearray(start + len(message))
+                envelope[0:1] = Tag.CRYPTO.ENCRYPTED
+                envelope[1:2] = mode
+                envelope[2:start] = nonce
+                self.__counter(nonce).encrypt(message, memoryview(envelope)[start:])
+                return envelope
+            if mode == self.CRYPTO_MODE_AES_COMPRESSED:
+                mode, message = self.__compress(message)
+            if mode in (self.CRYPTO_MODE_AES, self.CRYPTO_MODE_AES_COMPRESSED):
+                cipher = self.__aes(self.__key, self.UCRYPTOLIB_MODE_CBC, self.__iv)
                 if(len(message) % 16 > 0):
                     message += (b' ' * (16 - len(message) % 16))
                 return Tag.CRYPTO.ENCRYPTED + mode + cipher.encrypt(message)
@@ -67,21 +150,140 @@ class CryptoLayer(object):
             if message[1:2] == self.CRYPTO_MODE_NONE:
                 return message[2:]
         elif message[1:2] == self.CRYPTO_MODE_AES:
-            cipher = aes(self.__key, self.UCRYPTOLIB_MODE_CBC, self.__iv)
-            return cipher.decrypt(self.__iv + message[2:])[16:]
+            cipher = self.__aes(self.__key, self.UCRYPTOLIB_MODE_CBC, self.__iv)
+            # The cipher reads the payload in place, the plain text is the only copy
+            return cipher.decrypt(memoryview(message)[2:])
+        elif message[1:2] == self.CRYPTO_MODE_AES_COMPRESSED:
+            cipher = self.__aes(self.__key, self.UCRYPTOLIB_MODE_CBC, self.__iv)
+            return compression.decompress(cipher.decrypt(memoryview(message)[2:]))
+        elif message[1:2] == self.CRYPTO_MODE_AES_CTR:
+            start = 2 + self.__CTR_NONCE_LENGTH
+            if len(message) < start:
+                return None
+            view = memoryview(message)
+            return self.__counter(view[2:start]).decrypt(view[start:])
         return None
 
+    def seal(self, mode, message):
+        """
+        Encrypt and sign message in one pass, the envelope is the one of
+        sign(SIGN_MODE_SHA256, encrypt(mode, message)). The cipher text is
+        written into the preallocated envelope and authenticated a chunk at a
+        time while the chunk is at hand
+
+        :param bytes mode: CRYPTO_MODE_*
+        :param message: bytes-like
+        :return bytes|bytearray: [SIGNED][mode][ENCRYPTED][mode][data][signature]
+        """
+        if mode == self.CRYPTO_MODE_AES_COMPRESSED and self.__key is not None:
+            mode, message = self.__compress(message)
+        if self.__key is None or mode not in (self.CRYPTO_MODE_AES, self.CRYPTO_MODE_AES_COMPRESSED,
+                                              self.CRYPTO_MODE_AES_CTR):
+            # Nothing to cipher
+            return self.sign(self.SIGN_MODE_SHA256, self.encrypt(mode, message))
+
+        length = len(message)
+        if mode == self.CRYPTO_MODE_AES_CTR:
+            nonce = uos.urandom(self.__CTR_NONCE_LENGTH)
+            cipher = self.__counter(nonce)
+            # Whole message, CTR ciphers any length
+            whole = length
+            data_length = length
+        else:
+            nonce = b''
+            cipher = self.__aes(self.__key, self.UCRYPTOLIB_MODE_CBC, self.__iv)
+            whole = length - length % self.__AES_BLOCK_LENGTH
+            data_length = self.__blocks(length) * self.__AES_BLOCK_LENGTH
+
+        start = 4 + len(nonce)
+        end = start + data_length
+        envelope = bytearray(end + self.__SIGN_SHA256_LENGTH)
+        envelope[0:1] = Tag.CRYPTO.SIGNED
+        envelope[1:2] = self.SIGN_MODE_SHA256
+        envelope[2:3] = Tag.CRYPTO.ENCRYPTED
+        envelope[3:4] = mode
+        envelope[4:start] = nonce
+        view = memoryview(envelope)
+        source = memoryview(message)
+        mac = self.__hmac.copy()
+        mac.update(view[2:start])
+        for offset in range(0, whole, self.SEAL_CHUNK_LENGTH):
+            chunk_end = min(offset + self.SEAL_CHUNK_LENGTH, whole)
+            out = view[start + offset:start + chunk_end]
+            cipher.encrypt(source[offset:chunk_end], out)
+            mac.update(out)
+        if whole < data_length:
+            # Last block of CBC padded with spaces
+            block = bytearray(b' ' * self.__AES_BLOCK_LENGTH)
+            block[:length - whole] = source[whole:]
+            out = view[start + whole:end]
+            cipher.encrypt(block, out)
+            mac.update(out)
+        envelope[end:] = mac.digest()
+        return envelope
+
+    def open(self, envelope):
+        """
+        Verify and decrypt envelope of seal() in one pass over a memoryview,
+        every chunk is authenticated and deciphered while it is at hand. The
+        message is returned only if the signature matches
+
+        :param envelope: bytes-like, [SIGNED][mode][ENCRYPTED][mode][data][signature]
+        :return bytes|bytearray|None: Message, None - if the envelope is not
+                                      authentic or not valid
+        """
+        if self.__key is None:
+            unsigned = self.unsign(envelope)
+            return self.decrypt(unsigned) if unsigned is not None else None
+
+        end = len(envelope) - self.__SIGN_SHA256_LENGTH
+        if (end < 4 or envelope[0:1] != Tag.CRYPTO.SIGNED or
+                envelope[1:2] != self.SIGN_MODE_SHA256 or envelope[2:3] != Tag.CRYPTO.ENCRYPTED):
+            return None
+        mode = envelope[3:4]
+        view = memoryview(envelope)
+        if mode == self.CRYPTO_MODE_AES_CTR:
+            start = 4 + self.__CTR_NONCE_LENGTH
+            if end < start:
+                return None
+            cipher = self.__counter(view[4:start])
+        elif mode in (self.CRYPTO_MODE_AES, self.CRYPTO_MODE_AES_COMPRESSED):
+            start = 4
+            if (end - start) % self.__AES_BLOCK_LENGTH:
+                return None
+            cipher = self.__aes(self.__key, self.UCRYPTOLIB_MODE_CBC, self.__iv)
+        else:
+            return None
+
+        message = bytearray(end - start)
+        out = memoryview(message)
+        mac = self.__hmac.copy()
+        mac.update(view[2:start])
+        for offset in range(start, end, self.SEAL_CHUNK_LENGTH):
+            chunk = view[offset:min(offset + self.SEAL_CHUNK_LENGTH, end)]
+            mac.update(chunk)
+            cipher.decrypt(chunk, out[offset - start:offset - start + len(chunk)])
+        if not self.__equal(view[end:], mac.digest()):
+            return None
+        if mode == self.CRYPTO_MODE_AES_COMPRESSED:
+            return compression.decompress(message)
+        return message
+
     def sign(self, mode, message):
         """
         Sign message
+
+        :param message: bytes, or list of the message parts, they are
+                        authenticated one by one and joined once with the
+                        envelope headers
         """
+        parts = message if isinstance(message, list) else [message]
         if self.__key is not None and mode != self.SIGN_MODE_NONE:
             logger.debug('Signing mode', mode)
             if mode == self.SIGN_MODE_SHA256:
-                # sha256 hardcoded into chmac
-                signature = chmac.hmac(self.__key, len(self.__key), message, len(message))
-                return Tag.CRYPTO.SIGNED + mode + message + signature
-        return Tag.CRYPTO.SIGNED + self.SIGN_MODE_NONE + message
+                signature = self.__mac(*parts)
+                return b''.join([Tag.CRYPTO.SIGNED, mode] + parts + [signature])
+        return b''.join([Tag.CRYPTO.SIGNED, self.SIGN_MODE_NONE] + parts)
 
     def unsign(self, message):
         """
@@ -95,10 +297,128 @@ class CryptoLayer(object):
         elif message[1:2] == self.SIGN_MODE_SHA256:
             # message end is full length minus signature length
             message_end = len(message) - self.__SIGN_SHA256_LENGTH
-            useful_message = message[2:message_end]
-            signature = message[message_end:]
-            ref_signature = chmac.hmac(self.__key, len(self.__key),
-                                       useful_message, len(useful_message))
-            if signature == ref_signature:
-                return useful_message
+            if message_end < 2:
+                return None
+            # The signature is checked over views, the message is copied
+            # only once it is authentic
+            view = memoryview(message)
+            ref_signature = self.__mac(view[2:message_end])
+            if self.__equal(view[message_end:], ref_signature):
+                return message[2:message_end]
         return None
+
+    def __mac(self, *parts):
+        """
+        HMAC-SHA256 of the message parts with the session key, the parts are
+        authenticated as one message without joining them
+
+        :param parts: bytes, bytearray or memoryview
+        :return bytes: 32 bytes signature
+        """
+        mac = self.__hmac.copy()
+        for part in parts:
+            mac.update(part)
+        return mac.digest()
+
+    def __counter(self, nonce):
+        """
+        Get AES-CTR cipher of the session key, the initial counter is the
+        nonce and a zero block counter
+        """
+        counter = bytes(nonce) + bytes(16 - self.__CTR_NONCE_LENGTH)
+        if self.__native_ctr is not False:
+            try:
+                cipher = self.__aes(self.__key, self.UCRYPTOLIB_MODE_CTR, counter)
+                self.__native_ctr = True
+                return cipher
+            except ValueError:
+                # ucryptolib is built without MODE_CTR
+                self.__native_ctr = False
+        return _Counter(self.__aes(self.__key, self.UCRYPTOLIB_MODE_ECB), counter)
+
+    def __compress(self, message):
+        """
+        Compress message for CRYPTO_MODE_AES_COMPRESSED
+
+        :return tuple: Crypto mode and message, CRYPTO_MODE_AES and message
+                       as it is if compression does not save blocks
+        """
+        compressed = compression.compress(message)
+        # Compression is kept only if fewer blocks go on air
+        if (compressed is not None and
+                self.__blocks(len(compressed)) < self.__blocks(len(message))):
+            return self.CRYPTO_MODE_AES_COMPRESSED, compressed
+        return self.CRYPTO_MODE_AES, message
+
+    @classmethod
+    def __blocks(cls, length):
+        """
+        Get number of AES blocks of message length
+        """
+        return (length + cls.__AES_BLOCK_LENGTH - 1) // cls.__AES_BLOCK_LENGTH
+
+    @staticmethod
+    def __equal(signature, ref_signature):
+        """
+        Compare signatures in place, in time independent of the first difference
+
+        :param memoryview signature: Received signature
+        :param bytes ref_signature: Computed signature
+        :return bool:
+        """
+        if len(signature) != len(ref_signature):
+            return False
+        result = 0
+        for i in range(len(ref_signature)):
+            result |= signature[i] ^ ref_signature[i]
+        return result == 0
+
+
+class _Counter(object):
+    """
+    AES-CTR over an ECB cipher with the interface of the ucryptolib CTR one,
+    for ucryptolib built without MODE_CTR
+    """
+
+    # Bytes of key stream made at once
+    __STREAM_LENGTH = 256
+
+    def __init__(self, ecb, counter):
+        """
+        :param ecb: ucryptolib ECB cipher
+        :param bytes counter: 16 bytes initial counter
+        """
+        self.__ecb = ecb
+        self.__counter = int.from_bytes(counter, 'big')
+        self.__counters = bytearray(self.__STREAM_LENGTH)
+        self.__stream = bytearray(self.__STREAM_LENGTH)
+        # Offset of the unused key stream
+        self.__offset = self.__STREAM_LENGTH
+
+    def encrypt(self, in_buf, out_buf=None):
+        """
+        :param in_buf: Data of any length
+        :param out_buf: Buffer of the data length for the result
+        :return bytes|None: Result, None - if out_buf is given
+        """
+        result = out_buf if out_buf is not None else bytearray(len(in_buf))
+        stream = self.__stream
+        offset = self.__offset
+        for i in range(len(in_buf)):
+            if offset == self.__STREAM_LENGTH:
+                self.__refill()
+                offset = 0
+            result[i] = in_buf[i] ^ stream[offset]
+            offset += 1
+        self.__offset = offset
+        return bytes(result) if out_buf is None else None
+
+    def decrypt(self, in_buf, out_buf=None):
+        return self.encrypt(in_buf, out_buf)
+
+    def __refill(self):
+        counters = self.__counters
+        for offset in range(0, self.__STREAM_LENGTH, 16):
+            counters[offset:offset + 16] = self.__counter.to_bytes(16, 'big')
+            self.__counter += 1
+        self.__ecb.encrypt(counters, self.__stream)
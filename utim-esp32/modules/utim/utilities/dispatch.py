@@ -0,0 +1,108 @@
+"""
+Dispatch module
+
+Command tables of the subprocessors. A worker registers its process function
+for the command tag it handles:
+
+    @dispatch.UHOST.command(Tag.UCOMMAND.KEEPALIVE)
+    def process(utim, data):
+        ...
+
+and a subprocessor runs an item through its table, so a new command needs no
+changes of the subprocessors. The table is a dict keyed by the first byte of the
+item body, the command is found at once whatever the number of commands is.
+"""
+
+import logging
+from .address import Address
+from .status import Status
+from .item import Item
+
+logger = logging.Logger('utilities.dispatch')
+
+
+class Dispatcher(object):
+    """
+    Command table of the items of one source
+    """
+
+    def __init__(self, source):
+        """
+        :param int source: Address of the items the table serves
+        """
+
+        self.source = source
+        self.__handlers = {}
+
+    def command(self, tag):
+        """
+        Get decorator registering worker process function for command
+
+        :param bytes tag: One byte command tag
+        :return: Decorator returning the function unchanged
+        """
+
+        def register(function):
+            self.register(tag, function)
+            return function
+
+        return register
+
+    def register(self, tag, function):
+        """
+        Register worker process function for command
+
+        :param bytes tag: One byte command tag
+        :param function: Function of (utim, item) returning the next item
+        """
+
+        if tag[0] in self.__handlers:
+            logger.warning('Command {} handler is replaced'.format(tag))
+        self.__handlers[tag[0]] = function
+
+    def accepts(self, data):
+        """
+        Check item metadata, the item is dispatched while it comes from the
+        table source and is being processed
+
+        :param Item data:
+        :return bool:
+        """
+
+        return (isinstance(data, Item) and
+                data.source is self.source and
+                data.status is Status.STATUS_PROCESS)
+
+    def dispatch(self, utim, data):
+        """
+        Run item through the workers of its commands, the item metadata is
+        checked here, so the workers get only items addressed to Utim
+
+        :param Utim utim: Utim
+        :param Item data:
+        :return Item: Processed item, an item of an unknown command is finalized
+        """
+
+        while self.accepts(data):
+            if data.destination is not Address.ADDRESS_UTIM:
+                logger.error("Invalid metadata: source={}, destination={}, status={}".format(
+                             data.source,
+                             data.destination,
+                             data.status))
+                data.status = Status.STATUS_FINALIZED
+                break
+
+            body = data.body
+            handler = self.__handlers.get(body[0]) if body else None
+            if handler is None:
+                logger.debug('Unknown command: {}'.format(body[0:1] if body else body))
+                data.status = Status.STATUS_FINALIZED
+                break
+            data = handler(utim, data)
+
+        return data
+
+
+# Tables of the subprocessors
+UHOST = Dispatcher(Address.ADDRESS_UHOST)
+DEVICE = Dispatcher(Address.ADDRESS_DEVICE)
@@ -0,0 +1,44 @@
+"""
+Item module
+
+Record of a message processed by the subprocessors and the workers. One record
+is created per inbound message and every stage updates it in place, instead of
+building a new [source, destination, status, body] list per stage.
+"""
+
+
+class Item(object):
+    """
+    Message record
+    """
+
+    __slots__ = ('source', 'destination', 'status', 'body')
+
+    def __init__(self, source, destination, status, body):
+        """
+        :param int source: Address.ADDRESS_* of the sender
+        :param int destination: Address.ADDRESS_* of the receiver
+        :param int status: Status.STATUS_*
+        :param body: Message
+        """
+
+        self.source = source
+        self.destination = destination
+        self.status = status
+        self.body = body
+
+    def set(self, source, destination, status, body):
+        """
+        Reuse record for the next stage
+
+        :return Item: The record itself
+        """
+
+        self.source = source
+        self.destination = destination
+        self.status = status
+        self.body = body
+        return self
+
+    def __repr__(self):
+        return 'Item({}, {}, {}, {})'.format(self.source, self.destination, self.status, self.body)
@@ -2,14 +2,12 @@
 Subprocessor for device messages
 """
 import logging
+import pqueue
 from ..utilities.tag import Tag
+from ..utilities import dispatch
+# Command workers register in the dispatch table on import
 from ..workers import device_worker_forward
 from ..workers import device_worker_startup
-from ..utilities.address import Address
-from ..utilities.status import Status
-from ..utilities.data_indexes import SubprocessorIndex
-
-_SubprocessorIndex = SubprocessorIndex()
 
 logger = logging.Logger('utilities.process_device')
 
@@ -26,28 +24,27 @@ class ProcessDevice(object):
 
         self.__utim = utim
 
+    @staticmethod
+    def lane(body):
+        """
+        Get priority lane of device message by its tag
+
+        :param bytes body: Device message
+        :return int: pqueue.LANE_*
+        """
+
+        if body[0:1] == Tag.INBOUND.DATA_TO_PLATFORM:
+            return pqueue.LANE_BULK
+        return pqueue.LANE_CONTROL
+
     def process(self, data):
         """
         Process device message
-        :param data: array [source, destination, status, body]
+        :param Item data: Message record
         :return: same as input
         """
         logger.info('Starting device processing')
-        # Placeholder for data being processed, that will be returned one day
-        res = data
-
-        while (res[_SubprocessorIndex.status] is not Status.STATUS_TO_SEND and
-               res[_SubprocessorIndex.status] is not Status.STATUS_FINALIZED and
-               res[_SubprocessorIndex.source] is Address.ADDRESS_DEVICE):
-            command = res[_SubprocessorIndex.body][0:1]
-            if command == Tag.INBOUND.DATA_TO_PLATFORM:
-                res = device_worker_forward.process(self.__utim, res)
-            elif command == Tag.INBOUND.NETWORK_READY:
-                res = device_worker_startup.process(self.__utim, res)
-            else:
-                res[_SubprocessorIndex.status] = Status.STATUS_FINALIZED
-
-            if (res[_SubprocessorIndex.status] is Status.STATUS_TO_SEND or
-                    res[_SubprocessorIndex.status] is Status.STATUS_FINALIZED):
-                break
+
+        # Workers of the commands are registered in the dispatch table
+        res = dispatch.DEVICE.dispatch(self.__utim, data)
         return res
@@ -3,21 +3,60 @@ Process Item module
 """
 
 import logging
+import pqueue
 import queue
-import _thread
 import event
 from .address import Address
 from .status import Status
 from . import process_device
 from . import process_uhost
 from . import process_platform
-from .data_indexes import ProcessorIndex, SubprocessorIndex
+from . import config
+from . import runtime
+from .data_indexes import ProcessorIndex
+from .item import Item
 
 _ProcessorIndex = ProcessorIndex()
-_SubprocessorIndex = SubprocessorIndex()
 
 logger = logging.Logger('utilities.process_item')
 
+# Maximum number of items taken from the inbound queue in one wakeup
+_BATCH_SIZE = 16
+
+# Item sources in the order of their workers: Uhost items carry the SRP
+# handshake, so with two or more workers it never holds up device data
+_SHARD_SOURCES = (Address.ADDRESS_DEVICE, Address.ADDRESS_UHOST, Address.ADDRESS_PLATFORM)
+
+
+def inbound_lane(data):
+    """
+    Get priority lane of inbound item
+
+    :param list data: [Source, Body]
+    :return int: pqueue.LANE_*
+    """
+
+    source = data[_ProcessorIndex.address]
+    body = data[_ProcessorIndex.body]
+    if source == Address.ADDRESS_DEVICE:
+        return process_device.ProcessDevice.lane(body)
+    elif source == Address.ADDRESS_UHOST:
+        return process_uhost.ProcessUhost.lane(body)
+    return pqueue.LANE_BULK
+
+
+def outbound_lane(data):
+    """
+    Get priority lane of outbound item, answers to Uhost go first
+
+    :param list data: [Destination, Body]
+    :return int: pqueue.LANE_*
+    """
+
+    if data[_ProcessorIndex.address] == Address.ADDRESS_UHOST:
+        return pqueue.LANE_CONTROL
+    return pqueue.LANE_BULK
+
 
 class ProcessItemException(Exception):
     """
@@ -38,6 +77,11 @@ class InputParametersException(ProcessItemException):
 class ProcessItem(object):
     """
     Process Item class
+
+    Items are processed by a pool of workers. Each worker has its own queue and
+    the dispatcher routes every item by its source, so items of one source,
+    which belong to the single Uhost session of the Utim, stay in order. With
+    one worker the worker reads the inbound queue itself.
     """
 
     def __init__(self, utim, in_queue, out_queue):
@@ -56,8 +100,15 @@ class ProcessItem(object):
         # Set utim
         self.__utim = utim
 
+        self.__runtime = runtime.get_runtime()
+
         # Threads
         self.__run_thread = None
+        self.__worker_threads = []
+
+        # Workers, one per source at most as the items are routed by source
+        self.__workers = min(max(1, config.Config().process['workers']), len(_SHARD_SOURCES))
+        self.__worker_queues = []
 
         # Run event
         self.__run_event = event.Event()
@@ -86,11 +137,11 @@ class ProcessItem(object):
         status = Status.STATUS_PROCESS
         body = data[_ProcessorIndex.body]
 
-        # [From, To, Status, Message]
-        data_to_process = [source, destination, status, body]
+        # [From, To, Status, Message], the record is updated in place by the workers
+        data_to_process = Item(source, destination, status, body)
 
         address = source
-        while data_to_process[_SubprocessorIndex.status] not in\
+        while data_to_process.status not in\
                 (Status.STATUS_TO_SEND, Status.STATUS_FINALIZED):
             if address == Address.ADDRESS_DEVICE:
                 data_to_process = self.__device.process(data_to_process)
@@ -101,14 +152,14 @@ class ProcessItem(object):
             elif address == Address.ADDRESS_PLATFORM:
                 data_to_process = self.__platform.process(data_to_process)
 
-            if isinstance(data_to_process, list) and len(data_to_process) == 4:
-                if (data_to_process[_SubprocessorIndex.source] == Address.ADDRESS_UTIM and
-                        data_to_process[_SubprocessorIndex.destination] != Address.ADDRESS_UTIM):
-                    address = data_to_process[_SubprocessorIndex.destination]
+            if isinstance(data_to_process, Item):
+                if (data_to_process.source == Address.ADDRESS_UTIM and
+                        data_to_process.destination != Address.ADDRESS_UTIM):
+                    address = data_to_process.destination
 
-                elif (data_to_process[_SubprocessorIndex.source] != Address.ADDRESS_UTIM and
-                      data_to_process[_SubprocessorIndex.destination] == Address.ADDRESS_UTIM):
-                    address = data_to_process[_SubprocessorIndex.source]
+                elif (data_to_process.source != Address.ADDRESS_UTIM and
+                      data_to_process.destination == Address.ADDRESS_UTIM):
+                    address = data_to_process.source
 
                 else:
                     data_to_process = self.__error_handler(data_to_process)
@@ -127,13 +178,16 @@ class ProcessItem(object):
         :return list|None:
         """
 
-        if isinstance(data, list) and len(data) == 4:
-            if (data[_SubprocessorIndex.destination] is not Address.ADDRESS_UTIM and
-                    data[_SubprocessorIndex.status] is not Status.STATUS_FINALIZED):
+        if isinstance(data, Item):
+            if (data.destination is not Address.ADDRESS_UTIM and
+                    data.status is not Status.STATUS_FINALIZED):
                 return [
-                    data[_SubprocessorIndex.destination],
-                    data[_SubprocessorIndex.body]
+                    data.destination,
+                    data.body
                 ]
+            if data.status is Status.STATUS_FINALIZED:
+                # Nothing to send, e.g. the data waits in a batch
+                return None
 
         if data is not None:
             logger.error("Invalid data to return: {} {}".format(type(data), str(data)))
@@ -147,47 +201,128 @@ class ProcessItem(object):
 
         self.__run_event.set()
 
-        logger.info('Starting THREAD_PROCESS_ITEM_RUN')
-        self.__run_thread = _thread.start_new_thread(
-            self.__run2,
-            ()
-        )
+        if self.__workers == 1:
+            self.__worker_queues = [self.__inbound_queue]
+        else:
+            queue_config = config.Config().queue
+            self.__worker_queues = [self.__runtime.priority_queue(inbound_lane, **queue_config)
+                                    for _ in range(self.__workers)]
+            logger.info('Starting THREAD_PROCESS_ITEM_RUN')
+            self.__run_thread = self.__runtime.start(
+                self.__run2,
+                self.__run2_task
+            )
+
+        for index in range(self.__workers):
+            logger.info('Starting THREAD_PROCESS_ITEM_WORKER {}'.format(index))
+            self.__worker_threads.append(self.__runtime.start(
+                self.__run_worker,
+                self.__run_worker_task,
+                (self.__worker_queues[index],)
+            ))
         # name='THREAD_PROCESS_ITEM_RUN'
         # self.__run_thread.daemon = True
         # self.__run_thread.start()
 
     def __run2(self):
         """
-        Run2
+        Run2, dispatch inbound items to the workers
         """
 
         while self.__run_event.is_set():
             # print('(. Y .)')
             try:
-                data = self.__inbound_queue.get_nowait()
-                res = self.__process(data)
-                if res:
-                    while not self.__put_data(res):
-                        pass
+                items = self.__inbound_queue.get_many(_BATCH_SIZE)
             except queue.Empty:
-                pass
+                continue
+
+            for index, shard in enumerate(self.__shard(items)):
+                if shard:
+                    self.__worker_queues[index].put_many_until(shard, self.__run_event)
 
         logger.info("Stopping processing..")
 
-    def __put_data(self, data):
+    async def __run2_task(self):
+        """
+        Run2 coroutine, dispatch inbound items to the workers
         """
-        Put data
 
-        :param data:
-        :return bool:
+        while self.__run_event.is_set():
+            items = await self.__inbound_queue.aget_many(_BATCH_SIZE)
+            for index, shard in enumerate(self.__shard(items)):
+                if shard:
+                    await self.__worker_queues[index].aput_many(shard)
+
+    def __run_worker(self, worker_queue):
+        """
+        Process items of the worker queue
+
+        :param Queue worker_queue: Worker queue
         """
 
-        try:
-            self.__outbound_queue.put_nowait(data)
-        except queue.Full:
-            return False
+        while self.__run_event.is_set():
+            try:
+                items = worker_queue.get_many(_BATCH_SIZE)
+            except queue.Empty:
+                continue
 
-        return True
+            results = self.__process_many(items)
+            if results:
+                self.__outbound_queue.put_many_until(results, self.__run_event)
+
+        logger.info("Stopping worker..")
+
+    async def __run_worker_task(self, worker_queue):
+        """
+        Process items of the worker queue coroutine
+
+        :param Queue worker_queue: Worker queue
+        """
+
+        while self.__run_event.is_set():
+            items = await worker_queue.aget_many(_BATCH_SIZE)
+            await self.__outbound_queue.aput_many(self.__process_many(items))
+
+    def __shard(self, items):
+        """
+        Split items by worker
+
+        :param list items: Inbound items [Source, Body]
+        :return list: Items of every worker in order
+        """
+
+        shards = [[] for _ in range(self.__workers)]
+        for data in items:
+            source = data[_ProcessorIndex.address]
+            index = _SHARD_SOURCES.index(source) if source in _SHARD_SOURCES else 0
+            shards[index % self.__workers].append(data)
+
+        return shards
+
+    def __process_many(self, items):
+        """
+        Process items
+
+        :param list items: Inbound items
+        :return list: Results of the items which have any
+        """
+
+        results = []
+        for data in items:
+            res = self.__process(data)
+            if res:
+                results.append(res)
+
+        return results
+
+    def get_reject_stats(self):
+        """
+        Get numbers of Uhost messages rejected by their structure
+
+        :return dict: Number by CryptoLayer.REJECT_* reason
+        """
+
+        return self.__uhost.get_reject_stats()
 
     def stop(self):
         """
@@ -197,8 +332,15 @@ class ProcessItem(object):
         if self.__run_event:
             self.__run_event.clear()
 
-        if self.__run_thread:
-            self.__run_thread.exit()
+        # Wake the workers, the queues of Utim are closed by Utim
+        for worker_queue in self.__worker_queues:
+            if worker_queue is not self.__inbound_queue:
+                worker_queue.close()
+
+        self.__runtime.stop(self.__run_thread)
+        for worker_thread in self.__worker_threads:
+            self.__runtime.stop(worker_thread)
+        self.__worker_threads = []
 
     def __error_handler(self, data):
         """
@@ -209,8 +351,8 @@ class ProcessItem(object):
 
         logger.error("Item processing error: {}".format(str(data)))
 
-        if isinstance(data, list) and len(data) == 4:
-            data[_SubprocessorIndex.status] = Status.STATUS_FINALIZED
+        if isinstance(data, Item):
+            data.status = Status.STATUS_FINALIZED
             return data
 
         return None
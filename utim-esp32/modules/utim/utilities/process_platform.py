@@ -18,6 +18,6 @@ class ProcessPlatform(object):
     def process(self, data):
         """
         Process platform message
-        :param data: array [source, destination, status
+        :param Item data: Message record
         :return: same as input
         """
@@ -3,23 +3,25 @@ Subprocessor for uhost messages
 """
 
 import logging
+import pqueue
 from ..utilities.tag import Tag
+from ..utilities.cryptography import CryptoLayer
+from ..utilities import config, dispatch
+# Command workers register in the dispatch table on import
 from ..workers import utim_worker_try
 from ..workers import utim_worker_init
 from ..workers import utim_worker_connection_string
 from ..workers import utim_worker_error
 from ..workers import utim_worker_platform_verify
 from ..workers import utim_worker_authentic
-from ..workers import utim_worker_encrypt
-from ..workers import utim_worker_decrypt
-from ..workers import utim_worker_sign
-from ..workers import utim_worker_unsign
+from ..workers import utim_worker_seal
+from ..workers import utim_worker_open
 from ..workers import utim_worker_keepalive
-from ..utilities.data_indexes import SubprocessorIndex
 from ..utilities.address import Address
 from ..utilities.status import Status
 
-_SubprocessorIndex = SubprocessorIndex()
+# Commands which must not wait behind bulk data
+_CONTROL_COMMANDS = (Tag.UCOMMAND.KEEPALIVE, Tag.UCOMMAND.ERROR, Tag.UCOMMAND.DIE)
 
 logger = logging.Logger('utilities.process_uhost')
 
@@ -35,11 +37,43 @@ class ProcessUhost(object):
         """
 
         self.__utim = utim
+        self.__max_message_length = config.Config().max_message_length
+        # Number of messages rejected before the crypto work by reason
+        self.__rejects = {}
+
+    def get_reject_stats(self):
+        """
+        Get numbers of messages rejected by their structure
+
+        :return dict: Number by CryptoLayer.REJECT_* reason
+        """
+
+        return dict(self.__rejects)
+
+    @staticmethod
+    def lane(body):
+        """
+        Get priority lane of Uhost message by its command tag
+
+        The command tag of an unsecured message follows the signed and the
+        encrypted headers. The tag of a secured message is unknown before it
+        is unsigned and decrypted, it goes to the control lane as any of them
+        may be a keepalive and Uhost traffic is light anyway.
+
+        :param bytes body: Uhost message
+        :return int: pqueue.LANE_*
+        """
+
+        if CryptoLayer.is_secured(body) or CryptoLayer.is_secured(body[2:4]):
+            return pqueue.LANE_CONTROL
+        if body[4:5] in _CONTROL_COMMANDS:
+            return pqueue.LANE_CONTROL
+        return pqueue.LANE_BULK
 
     def process(self, data):
         """
         Process uhost message
-        :param data: array [source, destination, status
+        :param Item data: Message record
         :return: same as input
         """
 
@@ -47,41 +81,27 @@ class ProcessUhost(object):
 
         logger.info('Data to decipher:       {}'.format(res))
 
-        if (res[_SubprocessorIndex.source] is Address.ADDRESS_UHOST and
-                res[_SubprocessorIndex.status] is Status.STATUS_PROCESS):
-            res = utim_worker_unsign.process(self.__utim, res)
-        if (res[_SubprocessorIndex.source] is Address.ADDRESS_UHOST and
-                res[_SubprocessorIndex.status] is Status.STATUS_PROCESS):
-            res = utim_worker_decrypt.process(self.__utim, res)
+        # Malformed messages are dropped before the HMAC and AES work
+        if dispatch.UHOST.accepts(res):
+            reason = CryptoLayer.check_structure(res.body, self.__utim.get_session_key() is not None,
+                                                 self.__max_message_length)
+            if reason is not None:
+                self.__rejects[reason] = self.__rejects.get(reason, 0) + 1
+                logger.debug('Message is rejected, invalid {}'.format(reason))
+                res.status = Status.STATUS_FINALIZED
+                return res
+
+        # Signature check and decryption in one pass
+        if dispatch.UHOST.accepts(res):
+            res = utim_worker_open.process(self.__utim, res)
 
         logger.info('Data after deciphering: {}'.format(res))
 
-        while (res[_SubprocessorIndex.status] is not Status.STATUS_TO_SEND and
-               res[_SubprocessorIndex.status] is not Status.STATUS_FINALIZED and
-               res[_SubprocessorIndex.source] is Address.ADDRESS_UHOST):
-            command = res[_SubprocessorIndex.body][0:1]
-            if command == Tag.UCOMMAND.TRY_FIRST:
-                res = utim_worker_try.process(self.__utim, res)
-            elif command == Tag.UCOMMAND.INIT:
-                res = utim_worker_init.process(self.__utim, res)
-            elif command == Tag.UCOMMAND.CONNECTION_STRING:
-                res = utim_worker_connection_string.process(self.__utim, res)
-            elif command == Tag.UCOMMAND.TEST_PLATFORM_DATA:
-                res = utim_worker_platform_verify.process(self.__utim, res)
-            elif command == Tag.UCOMMAND.AUTHENTIC:
-                res = utim_worker_authentic.process(self.__utim, res)
-            elif command == Tag.UCOMMAND.ERROR:
-                res = utim_worker_error.process(self.__utim, res)
-
-            elif command == Tag.UCOMMAND.KEEPALIVE:
-                res = utim_worker_keepalive.process(self.__utim, res)
-
-            else:
-                res[_SubprocessorIndex.status] = Status.STATUS_FINALIZED
-
-        if (res[_SubprocessorIndex.destination] == Address.ADDRESS_UHOST
-                and res[_SubprocessorIndex.status] == Status.STATUS_PROCESS):
-            res = utim_worker_encrypt.process(self.__utim, res)
-            res = utim_worker_sign.process(self.__utim, res)
+        # Workers of the commands are registered in the dispatch table
+        res = dispatch.UHOST.dispatch(self.__utim, res)
+
+        if (res.destination == Address.ADDRESS_UHOST
+                and res.status == Status.STATUS_PROCESS):
+            res = utim_worker_seal.process(self.__utim, res)
 
         return res
@@ -0,0 +1,299 @@
+"""
+Runtime module
+
+Utim loops run either in separate threads (RUNTIME_THREAD) or as coroutines of
+a single asyncio/uasyncio event loop (RUNTIME_ASYNCIO). The runtime is selected
+by Config.runtime and is shared by all Utim objects of the process.
+
+Every looping object provides a thread function and a coroutine function for
+the same job and lets the runtime start the suitable one.
+"""
+
+import _thread
+import event
+import framer
+import logging
+import queue
+from queue import OVERFLOW_BLOCK
+import pqueue
+import ringbuffer
+import utime as time
+from . import config
+
+logger = logging.Logger('utilities.runtime')
+
+RUNTIME_THREAD = 'thread'
+RUNTIME_ASYNCIO = 'asyncio'
+
+
+class RuntimeException(Exception):
+    """
+    Unknown runtime exception
+    """
+
+    pass
+
+
+class ThreadRuntime(object):
+    """
+    Thread per loop runtime
+    """
+
+    name = RUNTIME_THREAD
+
+    @staticmethod
+    def queue(maxsize=128, overflow=OVERFLOW_BLOCK):
+        """
+        Create thread-safe queue
+
+        :param int maxsize: Maximum number of queued items
+        :param str overflow: Overflow policy
+        :return queue.Queue:
+        """
+
+        return queue.Queue(maxsize, overflow)
+
+    @staticmethod
+    def priority_queue(lane, maxsize=128, overflow=OVERFLOW_BLOCK):
+        """
+        Create thread-safe priority queue with control and bulk lanes
+
+        :param lane: Function of an item returning pqueue.LANE_*
+        :param int maxsize: Maximum number of queued items
+        :param str overflow: Overflow policy
+        :return pqueue.PriorityQueue:
+        """
+
+        return pqueue.PriorityQueue(lane, maxsize, overflow)
+
+    @staticmethod
+    def frame_queue(size):
+        """
+        Create queue of datalink frames for one producer and one consumer thread
+
+        :param int size: Buffer size in bytes
+        :return ringbuffer.RingBuffer:
+        """
+
+        return ringbuffer.RingBuffer(size)
+
+    @staticmethod
+    def stream_link(stream, size, validate=None):
+        """
+        Create datalink over a byte stream, e.g. UART or socket, for one
+        consumer thread
+
+        :param stream: Stream with readinto() and write()
+        :param int size: Reassembly buffer size in bytes
+        :param validate: Function of a frame type returning True if it is known
+        :return framer.StreamLink:
+        """
+
+        return framer.StreamLink(stream, size, validate)
+
+    @staticmethod
+    def start(function, coroutine_function, args=()):
+        """
+        Run function in a new thread
+
+        :param function: Thread function
+        :param coroutine_function: Coroutine function, not used
+        :param tuple args: Arguments
+        :return: None, threads are stopped by their run events
+        """
+
+        _thread.start_new_thread(function, args)
+
+    @staticmethod
+    def stop(task):
+        """
+        Stop task started by start()
+        """
+
+        pass
+
+    @staticmethod
+    def sleep(seconds):
+        """
+        Sleep
+        """
+
+        time.sleep(seconds)
+
+    @staticmethod
+    def event():
+        """
+        Create thread-safe event
+
+        :return event.Event:
+        """
+
+        return event.Event()
+
+    @staticmethod
+    def wait_event(flag, seconds=None):
+        """
+        Wait until event is set
+
+        :param event.Event flag: Event created by event()
+        :param float seconds: Timeout, None - wait forever
+        :return bool: True - if the event is set
+        """
+
+        return flag.wait(seconds)
+
+
+class AsyncRuntime(object):
+    """
+    Single event loop runtime
+    """
+
+    name = RUNTIME_ASYNCIO
+
+    def __init__(self):
+        try:
+            import uasyncio as asyncio
+        except ImportError:
+            import asyncio
+        import aqueue
+
+        self.__asyncio = asyncio
+        self.__aqueue = aqueue
+
+    def queue(self, maxsize=128, overflow=OVERFLOW_BLOCK):
+        """
+        Create awaitable queue
+
+        :param int maxsize: Maximum number of queued items
+        :param str overflow: Overflow policy
+        :return aqueue.Queue:
+        """
+
+        return self.__aqueue.Queue(maxsize, overflow)
+
+    def priority_queue(self, lane, maxsize=128, overflow=OVERFLOW_BLOCK):
+        """
+        Create awaitable priority queue with control and bulk lanes
+
+        :param lane: Function of an item returning pqueue.LANE_*
+        :param int maxsize: Maximum number of queued items
+        :param str overflow: Overflow policy
+        :return aqueue.PriorityQueue:
+        """
+
+        return self.__aqueue.PriorityQueue(lane, maxsize, overflow)
+
+    def frame_queue(self, size):
+        """
+        Create queue of datalink frames, the awaitable queue as coroutines need
+        to wait for frames and take no locks on a single event loop anyway
+
+        :param int size: Buffer size in bytes, not used
+        :return aqueue.Queue:
+        """
+
+        return self.__aqueue.Queue()
+
+    @staticmethod
+    def stream_link(stream, size, validate=None):
+        """
+        Create datalink over a byte stream, e.g. UART or socket, the stream is
+        polled by the reading coroutine
+
+        :param stream: Stream with readinto() and write()
+        :param int size: Reassembly buffer size in bytes
+        :param validate: Function of a frame type returning True if it is known
+        :return framer.AsyncStreamLink:
+        """
+
+        return framer.AsyncStreamLink(stream, size, validate)
+
+    def start(self, function, coroutine_function, args=()):
+        """
+        Schedule coroutine on the event loop
+
+        :param function: Thread function, not used
+        :param coroutine_function: Coroutine function
+        :param tuple args: Arguments
+        :return: Task
+        """
+
+        return self.__asyncio.create_task(coroutine_function(*args))
+
+    @staticmethod
+    def stop(task):
+        """
+        Cancel task started by start()
+        """
+
+        if task is not None:
+            task.cancel()
+
+    def sleep(self, seconds):
+        """
+        Sleep, it must be awaited
+        """
+
+        return self.__asyncio.sleep(seconds)
+
+    def event(self):
+        """
+        Create awaitable event
+
+        :return: asyncio.Event
+        """
+
+        return self.__asyncio.Event()
+
+    async def wait_event(self, flag, seconds=None):
+        """
+        Wait until event is set, it must be awaited
+
+        :param flag: Event created by event()
+        :param float seconds: Timeout, None - wait forever
+        :return bool: True - if the event is set
+        """
+
+        if seconds is None:
+            await flag.wait()
+            return True
+        try:
+            await self.__asyncio.wait_for(flag.wait(), seconds)
+        except self.__asyncio.TimeoutError:
+            pass
+        return flag.is_set()
+
+    def run(self, function):
+        """
+        Run main coroutine function until it completes
+
+        :param function: Coroutine function without arguments
+        """
+
+        return self.__asyncio.run(function())
+
+
+_runtime = None
+
+
+def get_runtime():
+    """
+    Get runtime selected by config
+
+    :return ThreadRuntime|AsyncRuntime:
+    :raise: RuntimeException
+    """
+
+    global _runtime
+    if _runtime is None:
+        name = config.Config().runtime
+        if name == RUNTIME_THREAD:
+            _runtime = ThreadRuntime()
+        elif name == RUNTIME_ASYNCIO:
+            _runtime = AsyncRuntime()
+        else:
+            logger.error('Unknown runtime: {}'.format(name))
+            raise RuntimeException()
+        logger.info('Runtime: {}'.format(name))
+    return _runtime
+
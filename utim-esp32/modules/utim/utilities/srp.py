@@ -13,16 +13,17 @@
 # x    Private key (derived from p and s)
 # v    Password verifier
 
-import uhashlib as hashlib
 import uos as os
 import binascii
+from . import crypto_backend
 
 SHA256 = 0
 
 NG_1024 = 0
 NG_CUSTOM = 1
 
-_hash_map = {SHA256: hashlib.sha256}
+# Primitives of crypto_backend
+_hash_map = {SHA256: 'sha256'}
 
 _ng_const = (
     # 1024-bit
@@ -120,7 +121,7 @@ def create_salted_verification_key(username, password, hash_alg=SHA256, ng_type=
                                    g_hex=None):
     if ng_type == NG_CUSTOM and (n_hex is None or g_hex is None):
         raise ValueError("Both n_hex and g_hex are required when ng_type = NG_CUSTOM")
-    hash_class = _hash_map[hash_alg]
+    hash_class = crypto_backend.get(_hash_map[hash_alg])
     N, g = get_ng(ng_type, n_hex, g_hex)
     _s = long_to_bytes(get_random(4))
     # _s = b'\xc3\x83\xc3\xa8'
@@ -163,7 +164,7 @@ class Verifier(object):
         self._authenticated = False
 
         N, g = get_ng(ng_type, n_hex, g_hex)
-        hash_class = _hash_map[hash_alg]
+        hash_class = crypto_backend.get(_hash_map[hash_alg])
         k = H(hash_class, N, g)
 
         self.hash_class = hash_class
@@ -223,7 +224,7 @@ class User(object):
         if bytes_a and len(bytes_a) != 32:
             raise ValueError("32 bytes required for bytes_a")
         N, g = get_ng(ng_type, n_hex, g_hex)
-        hash_class = _hash_map[hash_alg]
+        hash_class = crypto_backend.get(_hash_map[hash_alg])
         k = H(hash_class, N, g)
 
         self.identity = username
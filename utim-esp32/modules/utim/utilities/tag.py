@@ -3,6 +3,7 @@ Tag module
 """
 
 import logging
+from . import tlv
 
 logger = logging.Logger('tag')
 
@@ -43,12 +44,8 @@ class TagInbound(object):
         """
 
         if isinstance(data, (bytes, bytearray)):
-            # Get values
-            tag = self.DATA_FROM_NETWORK
-            length = len(data).to_bytes(2, 'big')
-
-            # Merge values into a message and return
-            return tag + length + data
+            # Write the record at once
+            return tlv.pack(self.DATA_FROM_NETWORK, data)
 
         return None
 
@@ -61,6 +58,7 @@ class TagOutbound(object):
     OK_STATUS = b'\x2a'
     DATA_TO_NETWORK = b'\x2d'
     DATA_TO_SLS = b'\x2e'
+    DATA_BATCH = b'\x2f'
 
     def in_this_scope(self, tag):
         """
@@ -72,7 +70,8 @@ class TagOutbound(object):
             if isinstance(tag, bytes) and len(tag) == 1:
                 tag_ord = ord(tag)
 
-            if tag_ord in (ord(self.OK_STATUS), ord(self.DATA_TO_NETWORK), ord(self.DATA_TO_SLS)):
+            if tag_ord in (ord(self.OK_STATUS), ord(self.DATA_TO_NETWORK), ord(self.DATA_TO_SLS),
+                           ord(self.DATA_BATCH)):
                 return True
 
         except TypeError:
@@ -86,12 +85,8 @@ class TagOutbound(object):
         """
 
         if isinstance(data, (bytes, bytearray)):
-            # Get values
-            tag = self.DATA_TO_NETWORK
-            length = len(data).to_bytes(2, 'big')
-
-            # Merge values into a message and return
-            return tag + length + data
+            # Write the record at once
+            return tlv.pack(self.DATA_TO_NETWORK, data)
 
         return None
 
@@ -101,27 +96,28 @@ class TagOutbound(object):
         """
 
         if isinstance(data, (bytes, bytearray)):
-            # Get values
-            tag = self.DATA_TO_SLS
-            length = len(data).to_bytes(2, 'big')
-
-            # Merge values into a message and return
-            return tag + length + data
+            # Write the record at once
+            return tlv.pack(self.DATA_TO_SLS, data)
 
         return None
 
+    def assemble_batch(self, data):
+        """
+        Assemble batch of platform data, every item is a DATA_TO_PLATFORM record
+
+        :param list data: Items of platform data
+        """
+
+        # Write the record of records at once
+        return tlv.pack_list(self.DATA_BATCH, TagInbound.DATA_TO_PLATFORM, data)
+
     def assemble_ok_status(self):
         """
         Assemble OK status data
         """
 
-        # Get values
-        data = b''
-        tag = self.OK_STATUS
-        length = len(data).to_bytes(2, 'big')
-
-        # Merge values into a message and return
-        return tag + length + data
+        # Write the record at once
+        return tlv.pack(self.OK_STATUS)
 
 
 class TagCrypto(object):
@@ -170,12 +166,8 @@ class UCommand(object):
         """
 
         if isinstance(data, (bytes, bytearray)):
-            # Get values
-            tag = self.TEST_PLATFORM_DATA
-            length = len(data).to_bytes(2, 'big')
-
-            # Merge values into a message and return
-            return tag + length + data
+            # Write the record at once
+            return tlv.pack(self.TEST_PLATFORM_DATA, data)
 
         return None
 
@@ -184,39 +176,28 @@ class UCommand(object):
         Assemble connection string success command
         """
 
-        # Get values
-        tag = self.CONNECTION_STRING
-        length = len(self.CONNECTION_STRING_SUCCESS).to_bytes(2, 'big')
-
-        # Merge values into a message and return
-        return tag + length + self.CONNECTION_STRING_SUCCESS
+        # Write the record at once
+        return tlv.pack(self.CONNECTION_STRING, self.CONNECTION_STRING_SUCCESS)
 
     def assemble_connection_string_error(self):
         """
         Assemble connection string error command
         """
 
-        # Get values
-        tag = self.CONNECTION_STRING
-        length = len(self.CONNECTION_STRING_ERROR).to_bytes(2, 'big')
-
-        # Merge values into a message and return
-        return tag + length + self.CONNECTION_STRING_ERROR
+        # Write the record at once
+        return tlv.pack(self.CONNECTION_STRING, self.CONNECTION_STRING_ERROR)
 
     def assemble_hello(self, data):
         """
         Assemble hello command
         """
         if isinstance(data, (bytes, bytearray)):
-            # Get values
-            tag = self.HELLO
-            length = len(data).to_bytes(2, 'big')
-            logger.info('tag: {}'.format(tag))
-            logger.info('len: {}'.format(length))
+            logger.info('tag: {}'.format(self.HELLO))
+            logger.info('len: {}'.format(len(data)))
             logger.info('data: {}'.format(data))
 
-            # Merge values into a message and return
-            return tag + length + data
+            # Write the record at once
+            return tlv.pack(self.HELLO, data)
 
         return None
 
@@ -226,14 +207,8 @@ class UCommand(object):
         """
 
         if isinstance(data1, (bytes, bytearray)) and isinstance(data2, (bytes, bytearray)):
-            # Get values
-            tag1 = self.TRY_FIRST
-            length1 = len(data1).to_bytes(2, 'big')
-            tag2 = self.TRY_SECOND
-            length2 = len(data2).to_bytes(2, 'big')
-
-            # Merge values into a message and return
-            return tag1 + length1 + data1 + tag2 + length2 + data2
+            # Write both records at once
+            return tlv.pack_pair(self.TRY_FIRST, data1, self.TRY_SECOND, data2)
 
         return None
 
@@ -243,12 +218,8 @@ class UCommand(object):
         """
 
         if isinstance(data, (bytes, bytearray)):
-            # Get values
-            tag = self.CHECK
-            length = len(data).to_bytes(2, 'big')
-
-            # Merge values into a message and return
-            return tag + length + data
+            # Write the record at once
+            return tlv.pack(self.CHECK, data)
 
         return None
 
@@ -258,12 +229,8 @@ class UCommand(object):
         """
 
         if isinstance(data, (bytes, bytearray)):
-            # Get values
-            tag = self.INIT
-            length = len(data).to_bytes(2, 'big')
-
-            # Merge values into a message and return
-            return tag + length + data
+            # Write the record at once
+            return tlv.pack(self.INIT, data)
 
         return None
 
@@ -273,12 +240,8 @@ class UCommand(object):
         """
 
         if isinstance(data, (bytes, bytearray)):
-            # Get values
-            tag = self.TRUSTED
-            length = len(data).to_bytes(2, 'big')
-
-            # Merge values into a message and return
-            return tag + length + data
+            # Write the record at once
+            return tlv.pack(self.TRUSTED, data)
 
         return None
 
@@ -288,14 +251,8 @@ class UCommand(object):
         """
 
         if isinstance(data1, (bytes, bytearray)) and isinstance(data2, (bytes, bytearray)):
-            # Get values
-            tag1 = self.SIGNED
-            length1 = len(data1).to_bytes(2, 'big')
-            tag2 = self.SIGNATURE
-            length2 = len(data2).to_bytes(2, 'big')
-
-            # Merge values into a message and return
-            return tag1 + length1 + data1 + tag2 + length2 + data2
+            # Write both records at once
+            return tlv.pack_pair(self.SIGNED, data1, self.SIGNATURE, data2)
 
         return None
 
@@ -305,12 +262,8 @@ class UCommand(object):
         """
 
         if isinstance(data, (bytes, bytearray)):
-            # Get values
-            tag = self.ERROR
-            length = len(data).to_bytes(2, 'big')
-
-            # Merge values into a message and return
-            return tag + length + data
+            # Write the record at once
+            return tlv.pack(self.ERROR, data)
 
         return None
 
@@ -319,24 +272,16 @@ class UCommand(object):
         Assemble verified command
         """
 
-        # Get values
-        tag = self.VERIFIED
-        length = (0).to_bytes(2, 'big')
-
-        # Merge values into a message and return
-        return tag + length
+        # Write the record at once
+        return tlv.pack(self.VERIFIED)
 
     def assemble_authentic(self):
         """
         Assemble authentic command
         """
 
-        # Get values
-        tag = self.AUTHENTIC
-        length = (0).to_bytes(2, 'big')
-
-        # Merge values into a message and return
-        return tag + length
+        # Write the record at once
+        return tlv.pack(self.AUTHENTIC)
 
 
 class Tag(object):
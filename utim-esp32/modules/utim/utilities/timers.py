@@ -0,0 +1,99 @@
+"""
+Timers module
+
+The timer wheel shared by all Utim objects of the process. It is driven by one
+thread, or by one coroutine of the event loop runtime, which is started by the
+first get_timers() call and sleeps till the next timer expires. Timer callbacks
+run in the driving thread or coroutine, so they must be short and must not
+block: a callback doing I/O signals the thread or queue of its owner instead.
+"""
+
+import logging
+import timerwheel
+from . import runtime
+
+logger = logging.Logger('utilities.timers')
+
+# Tick length of the timer wheel in milliseconds
+_RESOLUTION_MS = 50
+
+_timers = None
+_driver = None
+
+
+class _Driver(object):
+    """
+    Thread or coroutine driving the timer wheel
+    """
+
+    def __init__(self, utim_runtime):
+        self.runtime = utim_runtime
+        # Set by the wheel when a timer expiring earlier is added, and by stop()
+        self.wakeup = utim_runtime.event()
+        self.running = True
+        self.task = None
+
+    def advance(self, wheel):
+        """
+        Run expired timers, errors of callbacks are logged
+
+        :return float|None: Seconds till the next timer, None - there are no timers
+        """
+
+        # Cleared before next_expiry(), a timer added after it sets the event
+        self.wakeup.clear()
+        try:
+            wheel.advance()
+        except Exception as ex:
+            logger.error('Timer callback failed: {}'.format(ex))
+        expiry = wheel.next_expiry()
+        return expiry / 1000 if expiry is not None else None
+
+    def drive(self, wheel):
+        """
+        Drive timer wheel thread
+        """
+
+        while self.running:
+            self.runtime.wait_event(self.wakeup, self.advance(wheel))
+
+    async def drive_async(self, wheel):
+        """
+        Drive timer wheel coroutine
+        """
+
+        while self.running:
+            await self.runtime.wait_event(self.wakeup, self.advance(wheel))
+
+
+def get_timers():
+    """
+    Get shared timer wheel
+
+    :return timerwheel.TimerWheel:
+    """
+
+    global _timers, _driver
+    if _timers is None:
+        _driver = _Driver(runtime.get_runtime())
+        _timers = timerwheel.TimerWheel(_RESOLUTION_MS, _driver.wakeup.set)
+        logger.info('Starting THREAD_TIMERS')
+        _driver.task = _driver.runtime.start(_driver.drive, _driver.drive_async, (_timers,))
+    return _timers
+
+
+def stop():
+    """
+    Stop driving the shared timer wheel, its pending timers never expire.
+    The next get_timers() call starts a new wheel
+    """
+
+    global _timers, _driver
+    if _driver is None:
+        return
+    logger.info('Stopping THREAD_TIMERS')
+    _driver.running = False
+    _driver.wakeup.set()
+    _driver.runtime.stop(_driver.task)
+    _timers = None
+    _driver = None
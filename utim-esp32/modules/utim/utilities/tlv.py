@@ -0,0 +1,183 @@
+"""
+TLV module
+
+Reader and writers of the [tag: 1 byte][length: 2 bytes, big endian][value]
+records which all Utim layers are made of. Records are read by offsets of one
+memoryview, so nested records are parsed without copying, and a value is copied
+only when it is materialized with value_bytes(). Records are written with the
+final size computed up front, so a frame is assembled with one allocation.
+"""
+
+import ustruct
+
+# Length of the tag and length fields
+HEADER_LENGTH = 3
+
+_HEADER_FORMAT = '>BH'
+
+
+class TLVReader(object):
+    """
+    Sequential TLV records reader
+    """
+
+    def __init__(self, data, offset=0, end=None):
+        """
+        :param data: bytes, bytearray or memoryview with records
+        :param int offset: Offset of the first record
+        :param int end: Offset after the last record, None - end of data
+        """
+
+        self.view = data if isinstance(data, memoryview) else memoryview(data)
+        self.offset = offset
+        self.end = len(self.view) if end is None else end
+
+        # The last read record
+        self.tag = None
+        self.start = offset
+        self.length = 0
+
+    def read(self):
+        """
+        Read the next record
+
+        :return bool: True - if a whole record is read, False - if the rest of
+                      data is too short for the record header or its value
+        """
+
+        offset = self.offset
+        if self.end - offset < HEADER_LENGTH:
+            return False
+        view = self.view
+        length = view[offset + 1] << 8 | view[offset + 2]
+        start = offset + HEADER_LENGTH
+        if start + length > self.end:
+            return False
+
+        self.tag = view[offset]
+        self.start = start
+        self.length = length
+        self.offset = start + length
+        return True
+
+    def remaining(self):
+        """
+        :return int: Number of bytes after the last read record
+        """
+
+        return self.end - self.offset
+
+    def value(self):
+        """
+        :return memoryview: Value of the last read record, not copied
+        """
+
+        return self.view[self.start:self.start + self.length]
+
+    def value_bytes(self):
+        """
+        :return bytes: Copy of the value of the last read record
+        """
+
+        return bytes(self.value())
+
+    def nested(self):
+        """
+        :return TLVReader: Reader of the records inside the last read value
+        """
+
+        return TLVReader(self.view, self.start, self.start + self.length)
+
+
+def pack(tag, value=b''):
+    """
+    Assemble record
+
+    :param bytes tag: One byte tag
+    :param value: bytes, bytearray or memoryview
+    :return bytearray:
+    """
+
+    length = len(value)
+    record = bytearray(HEADER_LENGTH + length)
+    ustruct.pack_into(_HEADER_FORMAT, record, 0, tag[0], length)
+    record[HEADER_LENGTH:] = value
+    return record
+
+
+def pack_pair(tag1, value1, tag2, value2):
+    """
+    Assemble two records one after another
+
+    :return bytearray:
+    """
+
+    length1 = len(value1)
+    offset = HEADER_LENGTH + length1
+    record = bytearray(offset + HEADER_LENGTH + len(value2))
+    ustruct.pack_into(_HEADER_FORMAT, record, 0, tag1[0], length1)
+    record[HEADER_LENGTH:offset] = value1
+    ustruct.pack_into(_HEADER_FORMAT, record, offset, tag2[0], len(value2))
+    record[offset + HEADER_LENGTH:] = value2
+    return record
+
+
+def pack_list(tag, item_tag, values):
+    """
+    Assemble record of records with one tag
+
+    :param bytes tag: One byte tag of the outer record
+    :param bytes item_tag: One byte tag of the inner records
+    :param list values: Values of the inner records
+    :return bytearray:
+    """
+
+    length = len(values) * HEADER_LENGTH
+    for value in values:
+        length += len(value)
+    record = bytearray(HEADER_LENGTH + length)
+    ustruct.pack_into(_HEADER_FORMAT, record, 0, tag[0], length)
+
+    offset = HEADER_LENGTH
+    for value in values:
+        ustruct.pack_into(_HEADER_FORMAT, record, offset, item_tag[0], len(value))
+        offset += HEADER_LENGTH
+        record[offset:offset + len(value)] = value
+        offset += len(value)
+    return record
+
+
+class FrameWriter(object):
+    """
+    Writer of nested records into a reusable buffer
+    """
+
+    def __init__(self, size=256):
+        """
+        :param int size: Initial buffer size, it grows to the longest frame
+        """
+
+        self.__buffer = bytearray(size)
+
+    def wrap(self, tags, value):
+        """
+        Write value wrapped into nested records
+
+        :param tuple tags: Integer tags from the outermost record
+        :param value: bytes, bytearray or memoryview
+        :return memoryview: Frame, it is valid until the next call
+        """
+
+        value_length = len(value)
+        length = len(tags) * HEADER_LENGTH + value_length
+        if length > len(self.__buffer):
+            self.__buffer = bytearray(length)
+        buffer = self.__buffer
+
+        offset = 0
+        for tag in tags:
+            length -= HEADER_LENGTH
+            ustruct.pack_into(_HEADER_FORMAT, buffer, offset, tag, length)
+            offset += HEADER_LENGTH
+        buffer[offset:offset + value_length] = value
+        return memoryview(buffer)[:offset + value_length]
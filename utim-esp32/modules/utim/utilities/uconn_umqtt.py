@@ -5,13 +5,25 @@ This module implements the MQTT connection and messaging through the Mosquitto b
 """
 
 import logging
-import _thread
+import queue
+import uselect
 import utim.utilities.config as _config
 import utim.utilities.exceptions as exceptions
+import utim.utilities.runtime as runtime
+import utim.utilities.timers as timers
 from umqtt.simple import MQTTClient
 
 logger = logging.Logger('utilities.uconn_umqtt')
 
+# Seconds between checks for incoming messages in the event loop runtime
+_LISTEN_INTERVAL = 0.05
+
+# Milliseconds to wait for broker data before the loop flag is checked again
+_POLL_TIMEOUT_MS = 1000
+
+# Calls waiting for the loop, see call_soon()
+_CALLS_MAXSIZE = 32
+
 
 class MQTTThreadException(Exception):
     pass
@@ -32,12 +44,19 @@ class UConnUMQTT(object):
 
         self.thread_going = False
         self.thread = None
+        self.__runtime = runtime.get_runtime()
+
+        # Socket poller and keepalive ping timer
+        self.__poller = None
+        self.__ping_timer = None
+        # Calls of the timer callbacks run by the loop, they write to the socket
+        self.__calls = queue.Queue(_CALLS_MAXSIZE, queue.OVERFLOW_DROP_NEWEST)
 
         # Get connection parameters
-        username, password, host = self.__get_connection_parameters()
+        username, password, host, keepalive = self.__get_connection_parameters()
 
         # Establish connection
-        self.__establish_connection(username, password, host)
+        self.__establish_connection(username, password, host, keepalive)
 
     @staticmethod
     def __log_exception(ex):
@@ -65,18 +84,20 @@ class UConnUMQTT(object):
     def __get_connection_parameters():
         """
         Function to get parameters for Mosquitto broker from config.py
-        :return: Triplet of username, password and host address
-        :rtype: str, str, str
+        :return: Username, password, host address and keepalive seconds
+        :rtype: str, str, str, int
         """
         config = _config.Config()
-        return config.mqtt['user'], config.mqtt['pass'], config.mqtt['host']
+        return (config.mqtt['user'], config.mqtt['pass'], config.mqtt['host'],
+                config.mqtt.get('keepalive', 0))
 
-    def __establish_connection(self, username, password, hostname):
+    def __establish_connection(self, username, password, hostname, keepalive):
         """
         Exception handler
         :param str username: User name
         :param str password: User password
         :param str hostname: Host name
+        :param int keepalive: MQTT keepalive seconds, 0 - disabled
         :return: Opened channel
         :raise: UtimConnectionException
         """
@@ -88,10 +109,18 @@ class UConnUMQTT(object):
                 raise ValueError('Invalid host.')
 
             # Parameters and credentials
-            self.__client = MQTTClient("umqtt_client", hostname, user=username, password=password)
+            self.__client = MQTTClient("umqtt_client", hostname, user=username, password=password,
+                                       keepalive=keepalive)
             self.__client.set_callback(self._on_message)
             self.__client.connect()
-            self.loop_start()
+
+            # Socket stays blocking, the loop waits for incoming data with poll
+            self.__poller = uselect.poll()
+            self.__poller.register(self.__client.sock, uselect.POLLIN)
+            # Ping at half of the keepalive period, so broker never times out
+            if keepalive:
+                self.__ping_timer = timers.get_timers().add(keepalive * 500, self.call_soon,
+                                                            (self.__ping,), period=keepalive * 500)
         except ValueError:
             raise exceptions.UtimConnectionException
 
@@ -100,6 +129,8 @@ class UConnUMQTT(object):
         Disconnect from broker
         """
         self.loop_stop()
+        if self.__ping_timer:
+            self.__ping_timer.cancel()
         self.__client.disconnect()
 
     def subscribe(self, topic, cbobj, callback):
@@ -112,9 +143,61 @@ class UConnUMQTT(object):
         self.__cbobject = cbobj
         self.__message_callback = callback
         self.__client.subscribe(topic)
+        # The loop starts after the subscription is acknowledged, it would
+        # take the SUBACK the client waits for otherwise
+        if not self.thread_going:
+            self.loop_start()
 
-    def listen(self):
-        self.__client.check_msg()
+    def listen(self, timeout_ms=0):
+        """
+        Wait for data from broker and process incoming message
+
+        :param int timeout_ms: Milliseconds to wait for data
+        :return bool: True - if a message was processed, False - on timeout
+        """
+        if self.__poller.poll(timeout_ms):
+            self.__client.wait_msg()
+            return True
+
+        return False
+
+    def call_soon(self, function, args=()):
+        """
+        Run function in the loop thread or coroutine after it waited for
+        broker data. Timer callbacks use it as they must not block on the
+        socket, a call is dropped if too many of them are waiting
+
+        :param function: Function to call
+        :param tuple args: Arguments
+        """
+        self.__calls.put_nowait((function, args))
+
+    def __run_calls(self):
+        """
+        Run calls of call_soon()
+        """
+        try:
+            calls = self.__calls.get_many(_CALLS_MAXSIZE, False)
+        except queue.Empty:
+            return
+        for function, args in calls:
+            try:
+                function(*args)
+            except OSError:
+                raise
+            except Exception as ex:
+                logger.error('Loop call failed: {}'.format(ex))
+
+    def __ping(self):
+        """
+        Send keepalive ping, run by the loop on the ping timer
+        """
+        if not self.thread_going:
+            return
+        try:
+            self.__client.ping()
+        except OSError as er:
+            logger.error('Keepalive ping failed: {}'.format(er))
 
     def unsubscribe(self, topic):
         """
@@ -131,11 +214,11 @@ class UConnUMQTT(object):
         Publish
         :param str sender: Message sender
         :param str destination: Message destination (non empty string)
-        :param str message: The message to send
+        :param bytes|bytearray message: The message to send
         """
         try:
             if (not isinstance(destination, str) or not destination or
-                    not isinstance(message, bytes) or
+                    not isinstance(message, (bytes, bytearray)) or
                     not isinstance(sender, bytes)):
                 raise exceptions.UtimExchangeException
             msg = sender + b' ' + message
@@ -160,16 +243,31 @@ class UConnUMQTT(object):
 
     def loop(self):
         while self.thread_going:
-            self.listen()
+            try:
+                self.listen(_POLL_TIMEOUT_MS)
+                self.__run_calls()
+            except OSError as er:
+                logger.error('Connection to broker is lost: {}'.format(er))
+                self.thread_going = False
+
+    async def loop_async(self):
+        # Polling must not block the event loop, so the coroutine sleeps between checks
+        while self.thread_going:
+            try:
+                if not self.listen(0):
+                    await self.__runtime.sleep(_LISTEN_INTERVAL)
+                self.__run_calls()
+            except OSError as er:
+                logger.error('Connection to broker is lost: {}'.format(er))
+                self.thread_going = False
 
     def loop_start(self):
         self.thread_going = True
         logger.info('Starting THREAD_UMQTT_LOOP')
-        self.thread = _thread.start_new_thread(self.loop, ())
+        self.thread = self.__runtime.start(self.loop, self.loop_async)
 
     def loop_stop(self):
         # if self.thread is None:
         #     raise MQTTThreadException
         self.thread_going = False
-        if self.thread is not None:
-            self.thread.exit()
+        self.__runtime.stop(self.thread)
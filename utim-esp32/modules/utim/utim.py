@@ -20,11 +20,11 @@ Functionally this class does the following:
     by pulling single command from the SLS queue
 
     - Finally spawns serial_exchanger, uhost_process, and sls_process to run in the separate threads
-    in cycles.
+    in cycles, or as coroutines of a single event loop if the asyncio runtime is configured
+    (see utilities/runtime.py).
 
 """
 
-import _thread
 import event
 import logging
 import queue
@@ -37,11 +37,22 @@ from .utilities.address import Address
 from .utilities.data_indexes import ProcessorIndex
 from .utilities import process_item
 from .utilities import config
+from .utilities import runtime
+from .utilities import timers
+from .utilities import aggregator
+from .utilities import crypto_backend
+from .utilities.cryptography import CryptoLayer
+from .utilities.tag import Tag
 import ubinascii
 
 logger = logging.Logger('utim')
 _ProcessorIndex = ProcessorIndex()
 
+# Maximum number of items a stage takes from its queue in one wakeup
+_BATCH_SIZE = 16
+# Milliseconds to wait for the SRP handshake to complete before it is restarted
+_SRP_RETRY_MS = 30000
+
 
 class Utim(object):
     """
@@ -57,18 +68,25 @@ class Utim(object):
             self.__item_process = None
 
             self.__config = config.Config()
+            self.__runtime = runtime.get_runtime()
 
             # Uhost protocol
             self.__uhost_protocol = 'mqtt'
 
+            # Crypto primitives are installed before any crypto context exists
+            crypto_backend.select(**self.__config.crypto)
+
             # Session key and SLS name of this session
             self.__session_key = None
+            # Crypto context of the session key, replaced when the key changes
+            self.__crypto_layer = CryptoLayer(None)
 
             # SRP client
             self.__srp_client = None
             # Utim SRP auth step
             self.__srp_step = None
             self.__step_iterations = 10
+            self.__srp_timer = None
 
             # SLS id
             self.__sls_id = None
@@ -84,7 +102,11 @@ class Utim(object):
             # Test data
             self.__test_data = None
 
-            # Threads
+            # Batch of device data to the platform
+            self.__platform_batch = aggregator.Aggregator(
+                self.__send_platform_batch, **self.__config.aggregation)
+
+            # Threads (or tasks of the event loop runtime)
             self.__inbound_thread = None
             self.__outbound_thread = None
 
@@ -92,8 +114,10 @@ class Utim(object):
             self.__run_event = event.Event()
 
             # Queues
-            self.__inbound_queue = queue.Queue()
-            self.__outbound_queue = queue.Queue()
+            self.__inbound_queue = self.__runtime.priority_queue(
+                process_item.inbound_lane, **self.__config.queue)
+            self.__outbound_queue = self.__runtime.priority_queue(
+                process_item.outbound_lane, **self.__config.queue)
 
             # Name
             self.__utim_name = self.__config.utim_name.upper()
@@ -158,18 +182,18 @@ class Utim(object):
         self.__run_event.set()
 
         logger.info('Starting THREAD_UTIM_INBOUND_PROCESS')
-        self.__inbound_thread = _thread.start_new_thread(
+        self.__inbound_thread = self.__runtime.start(
             self.__inbound_process,
-            ()
+            self.__inbound_task
         )
         # name='THREAD_UTIM_INBOUND_PROCESS'
         # self.__inbound_thread.daemon = True
         # self.__inbound_thread.start()
 
         logger.info('Starting THREAD_UTIM_OUTBOUND_PROCESS')
-        self.__outbound_thread = _thread.start_new_thread(
+        self.__outbound_thread = self.__runtime.start(
             self.__outbound_process,
-            ()
+            self.__outbound_task
         )
         # name='THREAD_UTIM_OUTBOUND_PROCESS'
         # self.__outbound_thread.daemon = True
@@ -193,36 +217,59 @@ class Utim(object):
 
         while self.__run_event.is_set():
             if self.__connection:
-                data = self.__connection.receive()
-                if data:
-                    tag = data[_ProcessorIndex.address]
-                    body = data[_ProcessorIndex.body]
-                    if tag == DataType.DEVICE:
-                        while not self.__put_data([Address.ADDRESS_DEVICE, body]):
-                            pass
-                    elif tag == DataType.UHOST:
-                        while not self.__put_data([Address.ADDRESS_UHOST, body]):
-                            pass
-                    elif tag == DataType.PLATFORM:
-                        while not self.__put_data([Address.ADDRESS_PLATFORM, body]):
-                            pass
-                    else:
-                        logger.debug("Unknown inbound tag: {}: {}".format(tag, body))
-
-    def __put_data(self, data):
-        """
-        Put data
-
-        :param data:
-        :return bool:
+                items = self.__inbound_items(
+                    self.__connection.receive_many(_BATCH_SIZE, None))
+                if items:
+                    self.__inbound_queue.put_many_until(items, self.__run_event)
+
+    async def __inbound_task(self):
+        """
+        Inbound process coroutine
         """
 
-        try:
-            self.__inbound_queue.put_nowait(data)
-        except queue.Full:
-            return False
+        while self.__run_event.is_set():
+            items = self.__inbound_items(await self.__connection.receive_many_async(_BATCH_SIZE))
+            await self.__inbound_queue.aput_many(items)
+
+    @classmethod
+    def __inbound_items(cls, data):
+        """
+        Convert data received from connectivity to the inbound items
+
+        :param list data: List of [DataType, body]
+        :return list: List of [Address, body]
+        """
+
+        items = []
+        for data_item in data:
+            item = cls.__inbound_item(data_item)
+            if item:
+                items.append(item)
+
+        return items
+
+    @staticmethod
+    def __inbound_item(data):
+        """
+        Convert data received from connectivity to the inbound item
+
+        :param list data: [DataType, body]
+        :return list|None: [Address, body]
+        """
+
+        if data:
+            tag = data[_ProcessorIndex.address]
+            body = data[_ProcessorIndex.body]
+            if tag == DataType.DEVICE:
+                return [Address.ADDRESS_DEVICE, body]
+            elif tag == DataType.UHOST:
+                return [Address.ADDRESS_UHOST, body]
+            elif tag == DataType.PLATFORM:
+                return [Address.ADDRESS_PLATFORM, body]
+            else:
+                logger.debug("Unknown inbound tag: {}: {}".format(tag, body))
 
-        return True
+        return None
 
     def __outbound_process(self):
         """
@@ -232,20 +279,40 @@ class Utim(object):
         while self.__run_event.is_set():
             if self.__connection:
                 try:
-                    data = self.__outbound_queue.get_nowait()
-                    if data:
-                        tag = data[_ProcessorIndex.address]
-                        body = data[_ProcessorIndex.body]
-                        if tag == Address.ADDRESS_DEVICE:
-                            self.__connection.send([DataType.DEVICE, body])
-                        elif tag == Address.ADDRESS_UHOST:
-                            self.__connection.send([DataType.UHOST, body])
-                        elif tag == Address.ADDRESS_PLATFORM:
-                            self.__connection.send([DataType.PLATFORM, body])
-                        else:
-                            logger.debug("Unknown outbound tag: {}: {}".format(tag, body))
+                    items = self.__outbound_queue.get_many(_BATCH_SIZE)
                 except queue.Empty:
-                    pass
+                    continue
+
+                for data in items:
+                    self.__send_outbound(data)
+
+    async def __outbound_task(self):
+        """
+        Outbound process coroutine
+        """
+
+        while self.__run_event.is_set():
+            for data in await self.__outbound_queue.aget_many(_BATCH_SIZE):
+                self.__send_outbound(data)
+
+    def __send_outbound(self, data):
+        """
+        Send outbound item to connectivity
+
+        :param list data: [Address, body]
+        """
+
+        if data:
+            tag = data[_ProcessorIndex.address]
+            body = data[_ProcessorIndex.body]
+            if tag == Address.ADDRESS_DEVICE:
+                self.__connection.send([DataType.DEVICE, body])
+            elif tag == Address.ADDRESS_UHOST:
+                self.__connection.send([DataType.UHOST, body])
+            elif tag == Address.ADDRESS_PLATFORM:
+                self.__connection.send([DataType.PLATFORM, body])
+            else:
+                logger.debug("Unknown outbound tag: {}: {}".format(tag, body))
 
     def set_platform_config(self, config_string):
         """
@@ -262,6 +329,32 @@ class Utim(object):
         """
         return self.__platform_config
 
+    def aggregate_platform_data(self, data):
+        """
+        Add device data to the batch to the platform
+
+        :param bytes data: Device data
+        :return bytes|None: Data to send now, the batch or data itself if
+                            batching is disabled, None - if data is batched
+        """
+
+        if not self.__platform_batch.enabled():
+            return data
+
+        return self.__platform_batch.add(data)
+
+    def __send_platform_batch(self, batch):
+        """
+        Send batch to the platform, the batch linger timer callback
+        """
+
+        if not self.__run_event.is_set():
+            return
+        try:
+            self.__outbound_queue.put_nowait([Address.ADDRESS_PLATFORM, [batch, {}, '', False]])
+        except queue.Full:
+            logger.error('Batch of platform data is lost, outbound queue is full')
+
     def get_srp_step(self):
         """
         Get SRP step
@@ -275,6 +368,33 @@ class Utim(object):
         """
 
         self.__srp_step = step
+        # Step 1 is set when the handshake is started with Uhost, it is restarted
+        # if no session key is set in time
+        if step == 1:
+            if self.__srp_timer:
+                self.__srp_timer.cancel()
+            self.__srp_timer = timers.get_timers().add(_SRP_RETRY_MS, self.__srp_retry)
+
+    def __srp_retry(self):
+        """
+        Restart SRP handshake if it is not completed, the SRP retry timer callback
+        """
+
+        self.__srp_timer = None
+        if self.__session_key is not None or not self.__run_event.is_set():
+            return
+        if self.__step_iterations <= 0:
+            logger.error('SRP handshake is not completed, no retries left')
+            return
+
+        self.__step_iterations -= 1
+        logger.info('SRP handshake timed out, restarting...')
+        self.__srp_step = None
+        # Start the sequence as the device network ready message does
+        try:
+            self.__inbound_queue.put_nowait([Address.ADDRESS_DEVICE, Tag.INBOUND.NETWORK_READY])
+        except queue.Full:
+            logger.error('SRP handshake restart is lost, inbound queue is full')
 
     def get_srp_iterations(self):
         """
@@ -306,10 +426,23 @@ class Utim(object):
 
     def set_session_key(self, key):
         """
-        Set session key
+        Set session key and create its crypto context
         """
 
+        self.__crypto_layer = CryptoLayer(key)
         self.__session_key = key
+        if key is not None and self.__srp_timer:
+            self.__srp_timer.cancel()
+            self.__srp_timer = None
+
+    def get_crypto_layer(self):
+        """
+        Get crypto context of the session key
+
+        :return CryptoLayer:
+        """
+
+        return self.__crypto_layer
 
     def get_srp_client(self):
         """
@@ -330,6 +463,25 @@ class Utim(object):
 
         return self.__srp_client
 
+    def get_queue_stats(self):
+        """
+        Get statistics of Utim and connectivity queues and numbers of Uhost
+        messages rejected by their structure
+
+        :return dict: Statistics by queue name
+        """
+
+        stats = {
+            'inbound': self.__inbound_queue.stats(),
+            'outbound': self.__outbound_queue.stats()
+        }
+        if self.__connection:
+            stats['connection'] = self.__connection.get_queue_stats()
+        if self.__item_process:
+            stats['rejected'] = self.__item_process.get_reject_stats()
+
+        return stats
+
     def run(self):
         """
         Run Utim
@@ -343,6 +495,9 @@ class Utim(object):
         Stop Utim
         """
 
+        if self.__run_event:
+            self.__run_event.clear()
+
         # Stop item processing
         if self.__item_process:
             self.__item_process.stop()
@@ -351,13 +506,20 @@ class Utim(object):
         if self.__connection:
             self.__connection.stop()
 
-        if self.__run_event:
-            self.__run_event.clear()
+        # Wake the threads blocked on the queues
+        self.__inbound_queue.close()
+        self.__outbound_queue.close()
+
+        self.__runtime.stop(self.__inbound_thread)
+        self.__runtime.stop(self.__outbound_thread)
+
+        if self.__srp_timer:
+            self.__srp_timer.cancel()
+
+        self.__platform_batch.stop()
 
-        if self.__inbound_thread:
-            self.__inbound_thread.exit()
-        if self.__outbound_thread:
-            self.__outbound_thread.exit()
+        # The shared timers stop after their owners cancelled their own
+        timers.stop()
 
         logger.debug("Utim was stopped !!")
 
@@ -4,20 +4,24 @@ Device forward worker
 
 from ..utilities.address import Address
 from ..utilities.status import Status
-from ..utilities.data_indexes import SubprocessorIndex
-
-_SubprocessorIndex = SubprocessorIndex()
+from ..utilities import dispatch
+from ..utilities.tag import Tag
 
 
+@dispatch.DEVICE.command(Tag.INBOUND.DATA_TO_PLATFORM)
 def process(utim, data):
     """
     Run process
     """
 
-    device_data = data[_SubprocessorIndex.body][1:]
+    device_data = utim.aggregate_platform_data(data.body[1:])
+    if device_data is None:
+        # The reading waits in the batch
+        data.status = Status.STATUS_FINALIZED
+        return data
+
     platform_item = [device_data, {}, '', False]
-    outbound_item = [Address.ADDRESS_UTIM,
-                     Address.ADDRESS_PLATFORM,
-                     Status.STATUS_TO_SEND,
-                     platform_item]
-    return outbound_item
+    return data.set(Address.ADDRESS_UTIM,
+                    Address.ADDRESS_PLATFORM,
+                    Status.STATUS_TO_SEND,
+                    platform_item)
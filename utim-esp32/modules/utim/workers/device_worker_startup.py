@@ -2,73 +2,58 @@ import logging
 from ..utilities.tag import Tag
 from ..utilities.address import Address
 from ..utilities.status import Status
-from ..utilities.data_indexes import SubprocessorIndex
-
-_SubprocessorIndex = SubprocessorIndex()
+from ..utilities import dispatch
 
 logger = logging.Logger('workers.device_worker_startup')
 
 
+@dispatch.DEVICE.command(Tag.INBOUND.NETWORK_READY)
 def process(utim, data):
     """
     Run process
 
     :param Utim utim: Utim instance
-    :param list data: Data to process [source, destination, status, body]
-    :return list: [from, to, status, body]
+    :param Item data: Data to process
+    :return Item:
     """
 
-    source = data[_SubprocessorIndex.source]
-    destination = data[_SubprocessorIndex.destination]
-    status = data[_SubprocessorIndex.status]
-    body = data[_SubprocessorIndex.body]
-
-    if (source == Address.ADDRESS_DEVICE and destination == Address.ADDRESS_UTIM and
-            status == Status.STATUS_PROCESS):
-        tag = body[0:1]
-
-        if tag == Tag.INBOUND.NETWORK_READY:
-            # Get SRP step
-            srp_step = utim.get_srp_step()
-
-            if srp_step is None:
-                # Get SRP client
-                srp_client = utim.get_srp_client()
+    source = data.source
+    destination = data.destination
+    status = data.status
+    body = data.body
 
-                if srp_client is not None:
-                    # Init SRP session
-                    uname, a = srp_client.start_authentication()
-                    command = Tag.UCOMMAND.assemble_hello(a)
+    # Get SRP step
+    srp_step = utim.get_srp_step()
 
-                    # Set new SRP step value
-                    utim.set_srp_step(1)
+    if srp_step is None:
+        # Get SRP client
+        srp_client = utim.get_srp_client()
 
-                    # Set output parameters
-                    source = Address.ADDRESS_UTIM
-                    destination = Address.ADDRESS_UHOST
-                    status = Status.STATUS_PROCESS
-                    body = command
+        if srp_client is not None:
+            # Init SRP session
+            uname, a = srp_client.start_authentication()
+            command = Tag.UCOMMAND.assemble_hello(a)
 
-                    logger.info('Starting SRP sequence...')
+            # Set new SRP step value
+            utim.set_srp_step(1)
 
-                    # Return STATUS_TO_SEND result
-                    return [source, destination, status, body]
+            # Set output parameters
+            source = Address.ADDRESS_UTIM
+            destination = Address.ADDRESS_UHOST
+            status = Status.STATUS_PROCESS
+            body = command
 
-                else:
-                    logger.error("SRP client is None")
+            logger.info('Starting SRP sequence...')
 
-            else:
-                logger.error("Invalid SRP step: {}".format(str(srp_step)))
+            # Return STATUS_TO_SEND result
+            return data.set(source, destination, status, body)
 
         else:
-            logger.error("Invalid tag: {}".format(str(tag)))
+            logger.error("SRP client is None")
 
     else:
-        logger.error("Invalid metadata: source={}, destination={}, status={}".format(
-                     source,
-                     destination,
-                     status))
+        logger.error("Invalid SRP step: {}".format(str(srp_step)))
 
     # Return STATUS_FINALIZED result
     status = Status.STATUS_FINALIZED
-    return [source, destination, status, body]
+    return data.set(source, destination, status, body)
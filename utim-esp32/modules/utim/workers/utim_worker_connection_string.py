@@ -1,67 +1,58 @@
 import logging
 from ..utilities.tag import Tag
+from ..utilities.tlv import TLVReader
 from ..utilities.address import Address
 from ..utilities.status import Status
-from ..utilities.data_indexes import SubprocessorIndex
+from ..utilities import dispatch
 
-_SubprocessorIndex = SubprocessorIndex()
+_CONNECTION_STRING = ord(Tag.UCOMMAND.CONNECTION_STRING)
 
 logger = logging.Logger('workers.utim_worker_connection_string')
 
 
+@dispatch.UHOST.command(Tag.UCOMMAND.CONNECTION_STRING)
 def process(utim, data):
     """
     Run process
 
     :param Utim utim: Utim instance
-    :param list data: Data to process [source, destination, status, body]
-    :return list: [from, to, status, body]
+    :param Item data: Data to process
+    :return Item:
     """
 
-    source = data[_SubprocessorIndex.source]
-    destination = data[_SubprocessorIndex.destination]
-    status = data[_SubprocessorIndex.status]
-    body = data[_SubprocessorIndex.body]
+    source = data.source
+    destination = data.destination
+    status = data.status
+    body = data.body
 
-    if (source == Address.ADDRESS_UHOST and destination == Address.ADDRESS_UTIM and
-            status == Status.STATUS_PROCESS):
-        cs_tag = body[0:1]
-        cs_length_bytes = body[1:3]
-        cs_length = int.from_bytes(cs_length_bytes, 'big')
-        cs = body[3:3 + cs_length]
+    cs = TLVReader(body)
+    cs_tag = cs.tag if cs.read() else None
 
-        if cs_tag == Tag.UCOMMAND.CONNECTION_STRING:
-            # Parse platform tag
-            pl_tag = cs[0:1]
-            pl_length_bytes = cs[1:3]
-            pl_length = int.from_bytes(pl_length_bytes, 'big')
-            command = cs[3:3 + pl_length]
+    if cs_tag == _CONNECTION_STRING:
+        # Parse platform tag
+        pl = cs.nested()
+        pl_tag = pl.tag if pl.read() else None
 
-            if pl_tag in (Tag.UPLATFORM.PL_AZURE, Tag.UPLATFORM.PL_AWS):
+        if pl_tag in (ord(Tag.UPLATFORM.PL_AZURE), ord(Tag.UPLATFORM.PL_AWS)):
+            command = pl.value_bytes()
 
-                # Set output parameters
-                source = Address.ADDRESS_UHOST
-                destination = Address.ADDRESS_UTIM
-                status = Status.STATUS_PROCESS
-                body = command
+            # Set output parameters
+            source = Address.ADDRESS_UHOST
+            destination = Address.ADDRESS_UTIM
+            status = Status.STATUS_PROCESS
+            body = command
 
-                print('Connecting to cloud...')
+            print('Connecting to cloud...')
 
-                # Return STATUS_PROCESS result
-                return [source, destination, status, body]
-
-            else:
-                logger.error("Invalid pl_tag: {}".format(str(pl_tag)))
+            # Return STATUS_PROCESS result
+            return data.set(source, destination, status, body)
 
         else:
-            logger.error("Invalid cs_tag: {}".format(str(cs_tag)))
+            logger.error("Invalid pl_tag: {}".format(str(pl_tag)))
 
     else:
-        logger.error("Invalid metadata: source={}, destination={}, status={}".format(
-                     source,
-                     destination,
-                     status))
+        logger.error("Invalid cs_tag: {}".format(str(cs_tag)))
 
     # Return STATUS_FINALIZED result
     status = Status.STATUS_FINALIZED
-    return [source, destination, status, body]
+    return data.set(source, destination, status, body)
@@ -9,9 +9,6 @@ The Worker simply calls the Utim's Die() method which terminates the Utim's exec
 import logging
 # from ..utilities.address import Address
 from ..utilities.status import Status
-from ..utilities.data_indexes import SubprocessorIndex
-
-_SubprocessorIndex = SubprocessorIndex()
 
 logger = logging.Logger('workers.utim_worker_die')
 
@@ -25,10 +22,10 @@ def process(utim, data):
     """
 
     logger.debug("CommandWorkerDie process data: {}".format(
-        [x for x in data[_SubprocessorIndex.body]]))
+        [x for x in data.body]))
 
     utim.utim_die()
 
     res = data
-    res[_SubprocessorIndex.status] = Status.STATUS_FINALIZED
+    res.status = Status.STATUS_FINALIZED
     return res
@@ -11,13 +11,13 @@ then permanently discards the command.
 import logging
 # from ..utilities.address import Address
 from ..utilities.status import Status
-from ..utilities.data_indexes import SubprocessorIndex
-
-_SubprocessorIndex = SubprocessorIndex()
+from ..utilities import dispatch
+from ..utilities.tag import Tag
 
 logger = logging.Logger('workers.utim_worker_error')
 
 
+@dispatch.UHOST.command(Tag.UCOMMAND.ERROR)
 def process(utim, data):
     """
     Run process
@@ -26,11 +26,11 @@ def process(utim, data):
     :param Queue outbound_queue: queue to write in
     """
 
-    logger.debug("WorkerError process data: {}".format([x for x in data[_SubprocessorIndex.body]]))
+    logger.debug("WorkerError process data: {}".format([x for x in data.body]))
 
     # Allow start SRP authentication if error is 'hello', 'check' or 'trusted' type
     try:
-        uhost_data = data[_SubprocessorIndex.body]
+        uhost_data = data.body
         # tag = uhost_data[0:1]
         # length = uhost_data[1:3]
         value = uhost_data[3:]
@@ -41,5 +41,5 @@ def process(utim, data):
     except UnicodeDecodeError as ex:
         logger.error(ex)
     res = data
-    res[_SubprocessorIndex.status] = Status.STATUS_FINALIZED
+    res.status = Status.STATUS_FINALIZED
     return res
@@ -0,0 +1,28 @@
+"""
+Verify-then-decrypt worker
+"""
+
+import logging
+from ..utilities.address import Address
+from ..utilities.status import Status
+
+logger = logging.Logger('workers.utim_worker_open')
+
+
+def process(utim, data):
+    """
+    Run process, the package is verified and decrypted in one pass
+    """
+
+    res = None
+    try:
+        crypto = utim.get_crypto_layer()
+        logger.debug('Opening package {0}'.format(data.body))
+        res = crypto.open(data.body)
+        logger.debug('Opened message: {0}'.format(res))
+    except (ValueError, TypeError):
+        logger.error('Error appeared in opening package')
+    if res is None:
+        return data.set(Address.ADDRESS_UHOST, Address.ADDRESS_UTIM, Status.STATUS_FINALIZED, res)
+    else:
+        return data.set(Address.ADDRESS_UHOST, Address.ADDRESS_UTIM, Status.STATUS_PROCESS, res)
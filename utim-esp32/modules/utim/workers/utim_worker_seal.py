@@ -0,0 +1,40 @@
+"""
+Encrypt-then-sign worker
+"""
+
+import logging
+from ..utilities.cryptography import CryptoLayer
+from ..utilities.address import Address
+from ..utilities.status import Status
+from ..utilities import config
+
+logger = logging.Logger('workers.utim_worker_seal')
+
+# Crypto mode of messages to Uhost
+_config = config.Config()
+if _config.cipher == 'ctr':
+    MODE = CryptoLayer.CRYPTO_MODE_AES_CTR
+elif _config.compression:
+    # Messages are compressed before encryption if it makes them shorter
+    MODE = CryptoLayer.CRYPTO_MODE_AES_COMPRESSED
+else:
+    MODE = CryptoLayer.CRYPTO_MODE_AES
+
+
+def process(utim, data):
+    """
+    Run process, the message is encrypted and signed in one pass
+    """
+
+    res = None
+    try:
+        crypto = utim.get_crypto_layer()
+        logger.debug('Sealing message')
+        res = crypto.seal(MODE, data.body)
+        logger.debug('Sealed package: {}'.format(res))
+    except (ValueError, TypeError):
+        logger.error('Error appeared in sealing message')
+    if res is None:
+        return data.set(Address.ADDRESS_UTIM, Address.ADDRESS_UHOST, Status.STATUS_FINALIZED, res)
+    else:
+        return data.set(Address.ADDRESS_UTIM, Address.ADDRESS_UHOST, Status.STATUS_TO_SEND, res)
@@ -17,15 +17,18 @@ and puts it into the outbound queue.
 
 import logging
 from ..utilities.tag import Tag
+from ..utilities.tlv import TLVReader
 from ..utilities.address import Address
 from ..utilities.status import Status
-from ..utilities.data_indexes import SubprocessorIndex
+from ..utilities import dispatch
 
-_SubprocessorIndex = SubprocessorIndex()
+_TRY_FIRST = ord(Tag.UCOMMAND.TRY_FIRST)
+_TRY_SECOND = ord(Tag.UCOMMAND.TRY_SECOND)
 
 logger = logging.Logger('workers.utim_worker_try')
 
 
+@dispatch.UHOST.command(Tag.UCOMMAND.TRY_FIRST)
 def process(utim, data):
     """
     Run process
@@ -35,29 +38,22 @@ def process(utim, data):
     """
 
     packet = None
-    uhost_data = data[_SubprocessorIndex.body]
+    value1 = None
+    value2 = None
 
-    tag1 = uhost_data[0:1]
-    length_bytes1 = uhost_data[1:3]
-    length1 = int.from_bytes(length_bytes1, 'big')
-    value1 = uhost_data[3:3 + length1]
-
-    tag2 = uhost_data[3 + length1:4 + length1]
-    length_bytes2 = uhost_data[4 + length1: 6 + length1]
-    length2 = int.from_bytes(length_bytes2, 'big')
-    value2 = uhost_data[6 + length1:6 + length1 + length2]
+    # Only the values are copied, the SRP client needs them as bytes
+    reader = TLVReader(data.body)
+    if reader.read() and reader.tag == _TRY_FIRST:
+        value1 = reader.value_bytes()
+        if reader.read() and reader.tag == _TRY_SECOND:
+            value2 = reader.value_bytes()
 
     # Logging
-    logger.debug('Tag1: {}'.format(str(tag1)))
-    logger.debug('Length1: {}'.format(length1))
-    logger.debug('Value1: {}'.format([x for x in value1]))
-    logger.debug('Tag2: {}'.format(str(tag2)))
-    logger.debug('Length2: {}'.format(length2))
-    logger.debug('Value2: {}'.format([x for x in value2]))
-
-    # Check real data length
-    if (length1 == len(value1) and tag1 == Tag.UCOMMAND.TRY_FIRST and
-            length2 == len(value2) and tag2 == Tag.UCOMMAND.TRY_SECOND):
+    logger.debug('Value1: {}'.format(value1))
+    logger.debug('Value2: {}'.format(value2))
+
+    # Check both records are whole
+    if value1 is not None and value2 is not None:
         # Get SRP client
         srp_client = utim.get_srp_client()
         if srp_client is not None:
@@ -77,7 +73,8 @@ def process(utim, data):
                 packet = Tag.UCOMMAND.assemble_check(M)
         else:
             logger.debug('SRP client is None')
-            return [data[0], data[1], Status.STATUS_FINALIZED, data[3]]
+            data.status = Status.STATUS_FINALIZED
+            return data
 
     else:
         logger.debug('error try wrong_parameters')
@@ -87,4 +84,4 @@ def process(utim, data):
     # Put packet to the queue
     if packet is not None:
         logger.debug('put answer to outbound queue')
-        return [Address.ADDRESS_UTIM, Address.ADDRESS_UHOST, Status.STATUS_PROCESS, packet]
+        return data.set(Address.ADDRESS_UTIM, Address.ADDRESS_UHOST, Status.STATUS_PROCESS, packet)
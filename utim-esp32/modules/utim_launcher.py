@@ -1,74 +1,125 @@
 """Simplest realization of Utim"""
 import logging
-import queue
 from utim.connectivity.manager import ConnectivityConnectError
 from utim.utim import Utim
 from utim.connectivity.ttnd_manager import DataType
 from utim.connectivity.manager import ConnectivityManager
 from utim.utilities.tag import Tag
 from utim.utilities.exceptions import UtimConnectionException, UtimInitializationError
+from utim.utilities import config
+from utim.utilities import runtime
 
 logger = logging.Logger('launcher')
 
-def main():
+
+class _Session(object):
     """
-    Main function
+    Utim and the connectivity manager which waits for its session key
+
+    Both are stopped on exit and the errors of the session are reported, the
+    same way with either runtime
     """
 
-    concrete_utim = None
-    cm1 = None
-    session_key = None
+    def __init__(self, utim_runtime):
+        """
+        :param utim_runtime: Runtime of the session
+        """
+
+        self.__runtime = utim_runtime
+        self.manager = None
+        self.utim = None
+
+    def __enter__(self):
+        return self
+
+    def start(self):
+        """
+        Start Utim and report the network to it
+        """
+
+        buffer_size = config.Config().datalink['buffer_size']
+        logger.info("INIT rxQ")
+        rx_queue = self.__runtime.frame_queue(buffer_size)
+        logger.info("INIT txQ")
+        tx_queue = self.__runtime.frame_queue(buffer_size)
+
+        self.manager = ConnectivityManager(rx=tx_queue, tx=rx_queue)
+
+        self.utim = Utim(rx=rx_queue, tx=tx_queue)
+        self.utim.run()
+
+        self.manager.send([DataType.DEVICE, Tag.INBOUND.NETWORK_READY])
+
+    def finish(self, data):
+        """
+        Stop Utim once it has answered with the session key
 
-    logger.info("INIT rxQ")
-    rx_queue = queue.Queue()
-    logger.info("INIT txQ")
-    tx_queue = queue.Queue()
+        :param list data: [DataType, session key]
+        """
 
-    try:
-        cm1 = ConnectivityManager(rx=tx_queue, tx=rx_queue)
+        self.utim.stop()
+        print("RECEIVED SESSION KEY: {key}".format(key=data[1]))
 
-        concrete_utim = Utim(rx=rx_queue, tx=tx_queue)
-        concrete_utim.run()
+    def __exit__(self, exc_type, exc, tb):
+        if self.utim:
+            self.utim.stop()
 
-        data1 = [DataType.DEVICE, Tag.INBOUND.NETWORK_READY]
+        if self.manager:
+            self.manager.stop()
 
-        print("cm1 - send {0}".format(data1))
-        cm1.send(data1)
+        if exc_type is None:
+            return False
 
-        while True:
-            data = cm1.receive()
-            if data:
-                print("RECEIVED DATA: {0}".format(data))
-                session_key = data[1]
-                # with open(expanduser("~")+'/.bashrc', 'a') as f:
-                #     f.write('export UTIM_SESSION_KEY={}\n'.format(session_key))
-                #     print(subprocess.check_output('./source_bashrc.sh'.split()))
-                concrete_utim.stop()
-                break
+        if issubclass(exc_type, ConnectivityConnectError):
+            logging.error("Connectivity error")
+            print("Connectivity error")
 
-        print("RECEIVED SESSION KEY: {key}".format(key=session_key))
+        elif issubclass(exc_type, UtimConnectionException):
+            logging.error(exc)
 
-    except ConnectivityConnectError:
-        logging.error("Connectivity error")
-        print("Connectivity error")
+        elif issubclass(exc_type, UtimInitializationError):
+            logging.error(exc)
+            print('Invalid UTIM_MASTER_KEY')
 
-    except UtimConnectionException as er:
-        logging.error(er)
+        elif issubclass(exc_type, (KeyboardInterrupt, EOFError)):
+            logging.info('Program interrupted')
+            print('Program interrupted')
 
-    except UtimInitializationError as er:
-        logging.error(er)
-        print('Invalid UTIM_MASTER_KEY')
+        else:
+            return False
 
-    except (KeyboardInterrupt, EOFError):
-        logging.info('Program interrupted')
-        print('Program interrupted')
+        return True
 
-    finally:
-        if concrete_utim:
-            concrete_utim.stop()
 
-        if cm1:
-            cm1.stop()
+def main():
+    """
+    Main function
+    """
+
+    utim_runtime = runtime.get_runtime()
+    if utim_runtime.name == runtime.RUNTIME_ASYNCIO:
+        utim_runtime.run(main_async)
+        return
+
+    with _Session(utim_runtime) as session:
+        session.start()
+        data = None
+        while not data:
+            data = session.manager.receive(None)
+        session.finish(data)
+
+
+async def main_async():
+    """
+    Main coroutine of the event loop runtime
+    """
+
+    with _Session(runtime.get_runtime()) as session:
+        session.start()
+        data = None
+        while not data:
+            data = await session.manager.receive_async()
+        session.finish(data)
 
 
 if __name__ == '__main__':